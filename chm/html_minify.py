@@ -0,0 +1,229 @@
+"""
+html_minify.py
+
+Serialise a BeautifulSoup tree straight to minified HTML, for the CHM pages.
+
+mkdocs2chm.py used to serialise each page with str(soup), and pass the result through htmlmin,
+which parsed it all over again. This writes the minified HTML from the tree instead, following
+htmlmin's rules with the options the CHM build used (remove_comments, remove_empty_space and
+reduce_boolean_attributes):
+
+    - comments are dropped, bar conditional comments and those starting with "!"
+    - whitespace runs collapse to a single space, and whitespace-only text holding a line break
+      (i.e. the indentation between block elements) is dropped
+    - whitespace-only text is dropped altogether in <head>
+    - attributes are only quoted where needed, boolean and empty attributes are reduced to
+      their names, and void elements are written as <br>, not <br/>
+
+Unlike htmlmin, whitespace is also kept as it is in <code>, not only in <pre>: inline code
+is APL, where spacing matters.
+"""
+import re
+from typing import List, Optional
+
+from bs4 import BeautifulSoup, Tag
+from bs4.element import (
+    AttributeValueWithCharsetSubstitution,
+    CData,
+    Comment,
+    Declaration,
+    Doctype,
+    NavigableString,
+    ProcessingInstruction,
+)
+
+HTML_SPACE_RE = re.compile("[\x20\x09\x0a\x0c\x0d]+")
+HTML_ALL_SPACE_RE = re.compile("^[\x20\x09\x0a\x0c\x0d]+$")
+
+# Whitespace is kept in these
+KEEP_SPACE_TAGS = {"pre", "textarea", "script", "style", "code"}
+# The text of these isn't escaped
+RAW_TEXT_TAGS = {"script", "style"}
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "command", "embed", "hr", "img", "input", "keygen", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+
+# http://www.w3.org/TR/html51/index.html#attributes-1
+BOOLEAN_ATTRIBUTES = {
+    "audio": {"autoplay", "controls", "hidden", "loop", "muted"},
+    "button": {"autofocus", "disabled", "formnovalidate", "hidden"},
+    "command": {"checked", "disabled", "hidden"},
+    "dialog": {"hidden", "open"},
+    "fieldset": {"disabled", "hidden"},
+    "form": {"hidden", "novalidate"},
+    "iframe": {"hidden", "seamless"},
+    "img": {"hidden", "ismap"},
+    "input": {
+        "autofocus", "checked", "disabled", "formnovalidate", "hidden", "multiple", "readonly",
+        "required",
+    },
+    "keygen": {"autofocus", "disabled", "hidden"},
+    "object": {"hidden", "typesmustmatch"},
+    "ol": {"hidden", "reversed"},
+    "optgroup": {"disabled", "hidden"},
+    "option": {"disabled", "hidden", "selected"},
+    "script": {"async", "defer", "hidden"},
+    "select": {"autofocus", "disabled", "hidden", "multiple", "required"},
+    "style": {"hidden", "scoped"},
+    "textarea": {"autofocus", "disabled", "hidden", "readonly", "required"},
+    "track": {"default", "hidden"},
+    "video": {"autoplay", "controls", "hidden", "loop", "muted"},
+    "*": {"hidden"},
+}
+
+# An ampersand that a browser could read as the start of a character reference
+AMBIGUOUS_AMPERSAND_RE = re.compile(r"&(?=[A-Za-z0-9]+;|#)")
+CHARS_TO_QUOTE_RE = re.compile("[\x20\x09\x0a\x0c\x0d=><`]")
+
+
+def escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def attribute(name: str, value: str) -> tuple[str, bool]:
+    """
+    Write an attribute with as little quoting as possible. Returns the attribute, and whether
+    it ends in a quote.
+    """
+    value = AMBIGUOUS_AMPERSAND_RE.sub("&amp;", value)
+    double_quotes = value.count('"')
+    single_quotes = value.count("'")
+    if double_quotes > single_quotes:
+        return f"{name}='{value.replace(chr(39), '&#39;')}'", True
+    if single_quotes:
+        return f'{name}="{value.replace(chr(34), "&#34;")}"', True
+    if CHARS_TO_QUOTE_RE.search(value):
+        return f'{name}="{value}"', True
+    return f"{name}={value}", False
+
+
+class _Minifier:
+    def __init__(self) -> None:
+        self.out: List[str] = []
+        self.keep_space = 0
+        self.raw_text = 0
+        self.in_head = False
+        self.in_title = False
+        self.after_doctype = False
+        self.text: List[str] = []  # Adjacent strings, written as one
+
+    def start_tag(self, tag: Tag, lang: Optional[str]) -> str:
+        bool_attrs = BOOLEAN_ATTRIBUTES.get(tag.name, BOOLEAN_ATTRIBUTES["*"])
+        attrs = []
+        last_quoted = last_no_slash = -1
+        # Sorted, as BeautifulSoup writes them
+        for name, value in sorted(tag.attrs.items()):
+            if isinstance(value, list):  # Multi-valued, e.g. class
+                value = " ".join(value)
+            elif isinstance(value, AttributeValueWithCharsetSubstitution):  # <meta charset>
+                value = value.substitute_encoding("utf-8")
+            if name == "lang" and value == lang:
+                continue  # Inherited
+            if not value or name in bool_attrs:
+                attrs.append(name)
+                last_quoted = len(attrs) - 1
+                continue
+            attr, quoted = attribute(name, value)
+            attrs.append(attr)
+            if quoted:
+                last_quoted = len(attrs) - 1
+            elif not attr.endswith("/"):
+                last_no_slash = len(attrs) - 1
+
+        # An unquoted value ending in "/" would be read as closing the tag: move an attribute
+        # not ending in one last, if there is one, else add a space.
+        space = ""
+        if attrs and attrs[-1].endswith("/"):
+            i = last_quoted if last_quoted != -1 else last_no_slash
+            if i == -1:
+                space = " "
+            else:
+                attrs.append(attrs.pop(i))
+
+        return f"<{tag.name}{' ' if attrs else ''}{' '.join(attrs)}{space}>"
+
+    def flush_text(self) -> None:
+        if not self.text:
+            return
+        text = "".join(self.text)
+        self.text = []
+        if self.raw_text:
+            self.out.append(text)
+            return
+        text = escape_text(text)
+        if self.keep_space:
+            self.out.append(text)
+            return
+        if self.in_title:
+            self.out.append(HTML_SPACE_RE.sub(" ", text).strip("\x20\x09\x0a\x0c\x0d"))
+            return
+        if HTML_ALL_SPACE_RE.match(text) and (
+            self.in_head or self.after_doctype or "\n" in text or "\r" in text
+        ):
+            return
+        text = HTML_SPACE_RE.sub(" ", text)
+        # Don't write two spaces in a row, e.g. around a dropped comment
+        if text.startswith(" ") and self.out and self.out[-1].endswith(" "):
+            text = text[1:]
+        if text:
+            self.out.append(text)
+
+    def node(self, node, lang: Optional[str]) -> None:
+        if isinstance(node, Tag):
+            self.flush_text()
+            self.tag(node, lang)
+        elif isinstance(node, Comment):
+            self.flush_text()
+            if node.startswith("!") or re.match(r"\[if\s", node):
+                self.out.append(f"<!--{node[1:] if node.startswith('!') else node}-->")
+        elif isinstance(node, Doctype):
+            self.flush_text()
+            if len(self.out) == 1 and HTML_SPACE_RE.match(self.out[0][0]):
+                self.out = []
+            self.out.append(f"<!DOCTYPE {node}>")
+            self.after_doctype = True
+        elif isinstance(node, (CData, Declaration, ProcessingInstruction)):
+            self.flush_text()
+            self.out.append(node.output_ready())
+        elif isinstance(node, NavigableString):
+            self.text.append(str(node))
+
+    def tag(self, tag: Tag, lang: Optional[str]) -> None:
+        self.after_doctype = False
+        self.out.append(self.start_tag(tag, lang))
+        if tag.name in VOID_ELEMENTS and not tag.contents:
+            return
+        lang = tag.get("lang", lang)
+
+        name = tag.name
+        self.in_head |= name == "head"
+        self.in_title |= self.in_head and name == "title"
+        self.keep_space += name in KEEP_SPACE_TAGS
+        self.raw_text += name in RAW_TEXT_TAGS
+        for child in tag.contents:
+            self.node(child, lang)
+        self.flush_text()
+        self.raw_text -= name in RAW_TEXT_TAGS
+        self.keep_space -= name in KEEP_SPACE_TAGS
+        if name == "title":
+            self.in_title = False
+        elif name == "head":
+            self.in_head = False
+
+        self.out.append(f"</{name}>")
+
+    def minify(self, root: Tag) -> str:
+        children = root.contents if isinstance(root, BeautifulSoup) else [root]
+        for child in children:
+            self.node(child, None)
+        self.flush_text()
+        return "".join(self.out)
+
+
+def minify(root: Tag) -> str:
+    """
+    Minified HTML of a document, or of an element.
+    """
+    return _Minifier().minify(root)
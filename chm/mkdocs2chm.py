@@ -35,6 +35,11 @@ You need the tool "chmcmd" installed, which is part of Free Pascal. See
 You also need 'pygments' to highlight code.
 
 If a directory 'assets' is found, any .css and .ttf files discovered will be included.
+
+Next to the CHM file, an input manifest, dyalog.manifest.json, records hashes of everything the build
+read. A later run skips the build if the manifest still matches (unless --force is given), and
+otherwise says what changed. The build date and git info are not counted as inputs: a skipped CHM
+keeps the stamps of the build that made it.
 """
 
 import argparse
@@ -45,7 +50,6 @@ import logging
 import os
 from csscompressor import compress as css_compress
 import cssutils
-from htmlmin import minify as html_minify
 import re
 import shutil
 from subprocess import Popen
@@ -59,6 +63,23 @@ from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
 import markdown
 from ruamel.yaml import YAML
 
+from html_minify import minify as html_minify
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "pdf"))
+from build_manifest import (  # Shared with mkdocs2pdf.py
+    build_manifest,
+    check_manifest,
+    list_files,
+    write_manifest,
+)
+from source_transforms import (  # Shared with mkdocs2pdf.py
+    FRONTMATTER_PATTERN,
+    MACRO_PATTERN,
+    SourceTransforms,
+    expand_macro,
+    strip_frontmatter,
+)
+
 warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
 
 cssutils.log.setLevel(logging.CRITICAL)
@@ -335,29 +356,12 @@ def find_source_files(topdir: str, subdirs: List[str]) -> Tuple[List[str], List[
     return markdown_files, image_files
 
 
-def expand_macros(data: str, macros: dict) -> str:
-    """
-    The mkdocs macro extension makes use of templates of the type {{ macro-id }} where
-    the substitution value is stored in the "extra:" section in the mkdocs.yml file.
-    """
-
-    def replace(match):
-        key = match.group(1).strip()
-        value = macros.get(key)
-        return str(value) if not isinstance(value, dict) else match.group(0)
-
-    return re.sub(r"\{\{\s*(.*?)\s*}}", replace, data)
-
-
-def purge_css(css: str, html_content: str) -> str:
+def purge_css(css: str, soup: BeautifulSoup) -> str:
     """
     Simple CSS purger that removes unused selectors.
-    Uses cssutils for parsing CSS and BeautifulSoup for HTML.
+    Uses cssutils for parsing CSS, and the parsed HTML of the page.
     Preserves selectors for important HTML structure elements.
     """
-    # Parse the HTML to find all class names and IDs
-    soup = BeautifulSoup(html_content, "html.parser")
-
     # Find all class names in use
     classes_in_use = set()
     for tag in soup.find_all(class_=True):
@@ -466,39 +470,17 @@ def purge_css(css: str, html_content: str) -> str:
     return new_stylesheet.cssText.decode("utf-8")
 
 
-def parse_frontmatter(content: str) -> Tuple[dict, str]:
-    """
-    Parse YAML frontmatter from markdown content.
-    Returns (frontmatter_dict, content_without_frontmatter)
-    """
-    frontmatter_pattern = r'^\s*---\n(.*?)\n---\n+'
-    match = re.match(frontmatter_pattern, content, flags=re.DOTALL)
-    
-    if match:
-        yaml = YAML()
-        try:
-            frontmatter = yaml.load(match.group(1))
-            if frontmatter is None:
-                frontmatter = {}
-        except:
-            frontmatter = {}
-        content_without = re.sub(frontmatter_pattern, '', content, count=1, flags=re.DOTALL)
-        return frontmatter, content_without
-    return {}, content
-
-
 def convert_to_html(
     filenames: List[str],
     css: str,
-    macros: dict,
-    transforms: List[Callable[[str], str]],
+    transforms: SourceTransforms,
     project: str,
     top_level_files: List[str],
 ) -> Tuple[List[str], List[str]]:
     """
     Convert each Markdown file and convert to HTML, using the same rendering library as
-    mkdocs, with the same set of extensions. We expand the mkdocs-macro {{ templates }}
-    and optionally provide means for applying a set of transformations. Currently, we add
+    mkdocs, with the same set of extensions. The source is first rewritten by `transforms`,
+    which expand the mkdocs-macro {{ templates }} and strip the front matter. Currently, we add
     all the CSS in the header - this is required as the HTML engine in the Windows CHM
     viewer does not understand <link ...>.
 
@@ -509,14 +491,18 @@ def convert_to_html(
     converted: List[str] = []
     excluded: List[str] = []
 
-    head_template = """
+    page_template = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
+    <title></title>
+    <style></style>
+</head>
+<body></body>
+</html>
 """
 
     for file in filenames:
@@ -538,21 +524,17 @@ def convert_to_html(
         with open(file, "r", encoding="utf-8") as f:
             md = f.read()
 
-        # Parse frontmatter and check for search exclusion
-        frontmatter, md = parse_frontmatter(md)
-        if frontmatter.get('search', {}).get('exclude', False):
-            excluded.append(file)
-
-        # Macros are defined in the "extra:" section in the mkdocs.yml file. In the Markdown
-        # source, they are templates of the type
+        # Rewrite the source Markdown in a single pass before it's converted to HTML. Macros
+        # are defined in the "extra:" section in the mkdocs.yml file. In the Markdown source,
+        # they are templates of the type
         #
         #    {{ macro-name }}
-        md = expand_macros(md, macros)
+        page: dict = {}
+        md = transforms.apply(md, page)
 
-        # Hook point for transforms we may want to apply to the source Markdown before it's
-        # converted to HTML.
-        for fun in transforms:
-            md = fun(md)
+        # Check the front matter for search exclusion
+        if page.get("frontmatter", {}).get("search", {}).get("exclude", False):
+            excluded.append(file)
 
         # Convert Markdown to HTML, using the same extensions as used by our mkdocs setup.
         body = markdown.markdown(
@@ -570,13 +552,16 @@ def convert_to_html(
 
         body = body.replace("``", "")  # Empty code blocks aren't rendered correctly
 
-        body = fix_links_html(body)
-        body = remove_footnote_links(body)
-        body = fix_external_links(body)
+        # Parse the page once: the rewrites below all work on this tree, which is then
+        # written out minified.
+        soup = BeautifulSoup(body, "html.parser")
+        fix_links_html(soup)
+        remove_footnote_links(soup)
+        fix_external_links(soup)
 
         # Extract the H1 content for use in the title tag, setting for_title=True
         # to only extract the name part (excluding command span)
-        title = extract_h1(body, for_title=True)
+        title = extract_h1(soup, for_title=True)
 
         # Use a default title if no H1 is found
         if not title:
@@ -589,27 +574,19 @@ def convert_to_html(
             if file.endswith("welcome.md"):
                 title = "Welcome to Dyalog APL"
 
-        # Format the head with the title
-        head = head_template.format(title=title)
-
         # Optimise CSS specifically for this page: only use selectors referring to
         # ids, classes and tags on the actual page.
-        optimised_css = purge_css(css, body)
+        optimised_css = purge_css(css, soup)
 
         # Minimise the CSS
         optimised_css = css_compress(optimised_css)
 
         # Construct and minimise the HTML
-        final_html = (
-            f"{head}<style>{optimised_css}</style></head><body>{body}</body></html>"
-        )
-        final_html = html_minify(
-            final_html,
-            remove_comments=True,
-            remove_empty_space=True,
-            remove_all_empty_space=False,
-            reduce_boolean_attributes=True,
-        )
+        page = BeautifulSoup(page_template, "html.parser")
+        page.title.string = title
+        page.style.string = optimised_css
+        page.body.append(soup)
+        final_html = html_minify(page)
 
         with open(realpath_newname, "w", encoding="utf-8") as f:
             f.write(final_html)
@@ -669,11 +646,11 @@ def static_assets(
     return assets, css, css_files
 
 
-def extract_h1(data: str, for_title: bool = False) -> str:
+def extract_h1(data: str | BeautifulSoup, for_title: bool = False) -> str:
     """
     Extract text from the first h1 tag, handling special styling with spans.
     """
-    soup = BeautifulSoup(data, "html.parser")
+    soup = data if isinstance(data, BeautifulSoup) else BeautifulSoup(data, "html.parser")
     if h1 := soup.find("h1"):
         if name_span := h1.find("span", class_="name"):
             # If for_title is True, return only the name
@@ -884,7 +861,12 @@ def generate_hfp(
         f.write(doc.toprettyxml(indent="  "))
 
 
-def table_captions(body: str) -> str:
+# Table captions, "Table: caption_text {: #anchor_name }", and references, "[](#anchor_name)"
+CAPTION_PATTERN = r"Table:\s*(.*?)\s*\{:\s*#(\S+)\s*\}"
+TABLE_REF_PATTERN = r"\[\]\(#(\S+)\)"
+
+
+def table_caption(match: re.Match, state: dict) -> str:
     """
     Find table captions and references. Adapt for use with
 
@@ -903,49 +885,54 @@ def table_captions(body: str) -> str:
         _table-X
 
     so we need to rewrite our ids to theirs. Also, flywire/caption has
-    no automatic renumbering of table _references_, so fill that out.
+    no automatic renumbering of table _references_, so fill that out (see
+    table_reference).
+    """
+    idx = state["table_count"] = state.get("table_count", 0) + 1  # ⎕IO ← 1
+    caption_text, anchor_name = match.groups()
+    state.setdefault("tables", {})[anchor_name] = idx
+    return f"Table: {caption_text}"
+
+
+def table_reference(match: re.Match, state: dict) -> Callable[[], str]:
     """
-    anchors = {}
-    idx_list = []
-
-    def replace_table_captions(match, idx_list):
-        idx = len(idx_list) + 1  # ⎕IO ← 1
-        caption_text, anchor_name = match.groups()
-        idx_list.append(idx)
-        anchors[anchor_name] = idx
-        return f"Table: {caption_text}"
-
-    # Update table references
-    def replace_table_refs(match):
-        anchor_name = match.group(1)
+    A reference may precede its caption, so resolve it once the whole page is scanned.
+    """
+    anchor_name = match.group(1)
+
+    def resolve() -> str:
+        anchors = state.get("tables", {})
         if anchor_name in anchors:
             idx = anchors[anchor_name]
             return f"[Table {idx}](#_table-{idx})"
         return match.group(0)  # Return the original match if not in anchors
 
-    # Rework caption ids.
-    body = re.sub(
-        r"Table:\s*(.*?)\s*\{:\s*#(\S+)\s*\}",
-        lambda match: replace_table_captions(match, idx_list),
-        body,
+    return resolve
+
+
+def page_transforms(macros: dict) -> SourceTransforms:
+    """
+    The source rewrites applied to each page, compiled once per run.
+    """
+    transforms = SourceTransforms()
+    transforms.register("macros", MACRO_PATTERN, expand_macro(macros), in_code=True)
+    transforms.register(
+        "frontmatter", FRONTMATTER_PATTERN, strip_frontmatter, flags=re.DOTALL, at_start=True
     )
-    return re.sub(
-        r"\[\]\(#(\S+)\)", replace_table_refs, body
-    )  # Update table references
+    transforms.register("captions", CAPTION_PATTERN, table_caption)
+    transforms.register("table-refs", TABLE_REF_PATTERN, table_reference)
+    return transforms
 
 
-def fix_links_html(html: str) -> str:
+def fix_links_html(soup: BeautifulSoup) -> None:
     """
-    Applies the link transformations to an HTML document:
+    Applies the link transformations to an HTML document, in place:
     1. Links with targets ending in ".md" are changed to ".htm".
     2. Links without extensions and leading "../" are lifted one relative level, and suffixed with ".htm".
     3. Off-site links starting with "http" remain unchanged.
 
     Parameters:
-        html (str): The HTML content as a string.
-
-    Returns:
-        str: The modified HTML content.
+        soup (BeautifulSoup): The parsed HTML content.
     """
 
     def transform_link(href: str) -> str:
@@ -970,32 +957,21 @@ def fix_links_html(html: str) -> str:
         # Something else; leave unchanged
         return href
 
-    # Parse the HTML
-    soup = BeautifulSoup(html, "html.parser")
-
     # Find and transform all <a> tags with href attributes
     for a_tag in soup.find_all("a", href=True):
         original_href = a_tag["href"]
         a_tag["href"] = transform_link(original_href)
 
-    # Return the modified HTML as a string
-    return str(soup)
-
 
-def remove_footnote_links(html: str) -> str:
+def remove_footnote_links(soup: BeautifulSoup) -> None:
     """
-    Remove linking aspects from footnotes:
+    Remove linking aspects from footnotes, in place:
     1. Convert footnote reference links to plain superscript text
     2. Remove backlinks from footnote text
     
     Parameters:
-        html (str): The HTML content as a string.
-        
-    Returns:
-        str: The modified HTML content.
+        soup (BeautifulSoup): The parsed HTML content.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    
     # Find all footnote reference links and replace with plain superscript text
     for a_tag in soup.find_all("a", class_="footnote-ref"):
         # Get the footnote number/text
@@ -1010,32 +986,23 @@ def remove_footnote_links(html: str) -> str:
     for a_tag in soup.find_all("a", class_="footnote-backref"):
         # Simply remove the backlink
         a_tag.decompose()
-    
-    return str(soup)
 
 
-def fix_external_links(html: str) -> str:
+def fix_external_links(soup: BeautifulSoup) -> None:
     """
-    Fix external links for CHM compatibility.
+    Fix external links for CHM compatibility, in place.
     The Windows CHM viewer can open external links with target="_blank".
     This function adds the target attribute to all external HTTP/HTTPS links.
     
     Parameters:
-        html (str): The HTML content as a string.
-        
-    Returns:
-        str: The modified HTML content.
+        soup (BeautifulSoup): The parsed HTML content.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    
     # Find all external links
     for a_tag in soup.find_all("a", href=True):
         href = a_tag.get("href")
         if href and href.startswith(("http://", "https://")):
             # Add target="_blank" to open in external browser
             a_tag["target"] = "_blank"
-    
-    return str(soup)
 
 
 def find_image_references_in_markdown(md_files: List[str]) -> set:
@@ -1271,6 +1238,11 @@ if __name__ == "__main__":
         default=65001,
         help="CodePage to use (default: 65001 for UTF-8)",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the input manifest is unchanged",
+    )
 
     args = parser.parse_args()
 
@@ -1335,6 +1307,34 @@ if __name__ == "__main__":
     # Modify nav to include welcome page at the start
     yml_data["nav"].insert(0, "welcome.md")
 
+    # Skip the build if nothing it reads has changed since the last one
+    chm_name = "dyalog.chm"
+    manifest_file = os.path.join(
+        args.project_dir, os.path.splitext(chm_name)[0] + ".manifest.json"
+    )
+    manifest = build_manifest(
+        __file__,
+        root=os.path.dirname(os.path.abspath(args.mkdocs_yml)),
+        nav_files=[os.path.abspath(args.mkdocs_yml)]
+        + [
+            os.path.abspath(os.path.join(os.path.dirname(args.mkdocs_yml), d))
+            for d in included_dirs
+        ],
+        pages=md_files,
+        images=image_files,
+        assets=list_files(args.assets_dir),
+        macros=yml_data.get("extra", {}),
+        settings={"codepage": args.codepage, "exclude": excludes},
+    )
+    if not args.force:
+        up_to_date, reason = check_manifest(
+            manifest_file, manifest, [os.path.join(args.project_dir, chm_name)]
+        )
+        if up_to_date:
+            print(f"--> {chm_name}: {reason}, skipping")
+            sys.exit(0)
+        print(f"--> {chm_name}: rebuilding, {reason}")
+
     # Copy images and other static assets into the project
     assets, css, css_files = static_assets(args.assets_dir, args.project_dir)
 
@@ -1353,8 +1353,7 @@ if __name__ == "__main__":
     html_files, excluded_files = convert_to_html(
         md_files,
         css,
-        macros=macros,
-        transforms=[table_captions],
+        transforms=page_transforms(macros),
         project=args.project_dir,
         top_level_files=standalone_files_abs,
     )
@@ -1377,7 +1376,6 @@ if __name__ == "__main__":
     print(f"Converted {len(md_files)} Markdown files to HTML.")
 
     # Generate the CHM project config file
-    chm_name = "dyalog.chm"
     generate_hfp(
         args.project_dir,
         chm_name,
@@ -1390,4 +1388,7 @@ if __name__ == "__main__":
 
     # Run the compiler
     output = Popen(["chmcmd", "dyalog.hfp"], cwd=args.project_dir)
-    output.wait()
+    if output.wait() != 0:
+        sys.exit("--> chmcmd failed")
+
+    write_manifest(manifest_file, manifest)
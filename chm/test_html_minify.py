@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for html_minify module.
+"""
+
+import pytest
+from bs4 import BeautifulSoup
+from html_minify import minify
+
+try:
+    import htmlmin
+except ImportError:  # Only needed to compare against
+    htmlmin = None
+
+PAGE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>
+        Rho   &amp; Reshape
+    </title>
+    <style>h1>span.name{color:red}</style>
+</head>
+<body>
+<!-- A comment -->
+<div style="display: none;">
+  &amp;
+</div>
+<h1 class="heading"><span class="name">Reshape</span> <span class="command">R←X⍴Y</span></h1>
+<p>Some   text,
+spread over   lines &amp; with <em>inline</em>  markup.</p>
+<div class="admonition note">
+    <p class="admonition-title">Note</p>
+    <p>a <!-- dropped --> b &lt;c&gt;</p>
+</div>
+<pre><code>      2 3⍴⍳6
+1 2 3
+4 5 6
+</code></pre>
+<table>
+    <tr><td align="right">1</td><td data-x='say "hi"'>2</td></tr>
+</table>
+<p><a href="../other/page.htm" target="_blank">A link</a><br/><img src="img/x.png" alt=""></p>
+<p><a href="a/b/" class="x y">Slash</a> <a href="a/b/">Only slash</a></p>
+<input type="checkbox" checked="checked" disabled>
+<p lang="en">Inherited lang</p>
+</body>
+</html>
+"""
+
+
+def htmlmin_minify(html: str) -> str:
+    return htmlmin.minify(
+        html,
+        remove_comments=True,
+        remove_empty_space=True,
+        remove_all_empty_space=False,
+        reduce_boolean_attributes=True,
+    )
+
+
+class TestMinify:
+    """Test minified serialisation."""
+
+    def test_inline_code_whitespace_kept(self):
+        """Test that whitespace in inline code is kept."""
+        soup = BeautifulSoup("<p>Try   <code>1  2\n3</code>  now.</p>", "html.parser")
+        assert minify(soup) == "<p>Try <code>1  2\n3</code> now.</p>"
+
+    def test_modified_tree(self):
+        """Test that adjacent strings, as left by tree edits, are written as one."""
+        soup = BeautifulSoup("<p>a <sup>1</sup>\n</p>", "html.parser")
+        soup.sup.replace_with("x ")
+        assert minify(soup) == "<p>a x </p>"
+
+    def test_ambiguous_ampersand(self):
+        """Test that attribute values are only escaped where a browser would misread them."""
+        soup = BeautifulSoup(
+            '<a href="?a=1&amp;b=2" title="&amp;amp;">x</a>', "html.parser"
+        )
+        assert minify(soup) == '<a href="?a=1&b=2" title=&amp;amp;>x</a>'
+
+
+@pytest.mark.skipif(htmlmin is None, reason="htmlmin not installed")
+class TestSameAsHtmlmin:
+    """Test minified serialisation against htmlmin, which it replaced."""
+
+    def test_same_as_htmlmin(self):
+        """Test that a page without inline code minifies as htmlmin does."""
+        soup = BeautifulSoup(PAGE, "html.parser")
+        assert minify(soup) == htmlmin_minify(str(soup))
+
+    def test_element(self):
+        """Test minifying an element, rather than a document."""
+        soup = BeautifulSoup(PAGE, "html.parser")
+        table = soup.find("table")
+        assert minify(table) == htmlmin_minify(str(table))
+
+    def test_inline_code_collapsed(self):
+        """Test that htmlmin collapses the whitespace in inline code that minify keeps."""
+        soup = BeautifulSoup("<p>Try   <code>1  2\n3</code>  now.</p>", "html.parser")
+        assert htmlmin_minify(str(soup)) == "<p>Try <code>1 2 3</code> now.</p>"
+
+    def test_modified_tree(self):
+        """Test that a tree with adjacent strings minifies as htmlmin does."""
+        soup = BeautifulSoup("<p>a <sup>1</sup>\n</p>", "html.parser")
+        soup.sup.replace_with("x ")
+        assert minify(soup) == htmlmin_minify(str(soup))
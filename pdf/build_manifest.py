@@ -0,0 +1,144 @@
+"""
+build_manifest.py
+
+Input manifests, shared by mkdocs2pdf.py and mkdocs2chm.py.
+
+A manifest records hashes of everything a build reads -- the nav files, pages, images and assets,
+the macros and settings, and the code of the builder itself -- so that a later build can tell
+whether its artifact is still current, and if not, say what changed:
+
+    manifest = build_manifest(__file__, root, nav_files, pages, images, assets, macros, settings)
+    up_to_date, reason = check_manifest(manifest_file, manifest, [artifact])
+    if not up_to_date:
+        ...  # build
+        write_manifest(manifest_file, manifest)
+
+The builder's code is every module beside the builder script and beside this one (the modules
+shared from pdf/), tests aside: an edit to any of them can change the output.
+"""
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+
+def list_files(directory: str) -> List[str]:
+    """
+    All files below a directory, in a stable order.
+    """
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, file) for file in files)
+    return sorted(paths)
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_files(paths: Iterable[str], root: str) -> Dict[str, str]:
+    return {
+        os.path.relpath(path, root): file_digest(path)
+        for path in paths
+        if os.path.isfile(path)
+    }
+
+
+def builder_files(script: str) -> List[str]:
+    """
+    The modules making up a builder: the Python files beside the script, and beside this module.
+    """
+    dirs = {os.path.dirname(os.path.abspath(script)), os.path.dirname(os.path.abspath(__file__))}
+    return sorted(
+        path
+        for directory in dirs
+        for path in glob.glob(os.path.join(directory, "*.py"))
+        if not os.path.basename(path).startswith("test_")
+    )
+
+
+def build_manifest(
+    script: str,
+    root: str,
+    nav_files: Iterable[str],
+    pages: Iterable[str],
+    images: Iterable[str],
+    assets: Iterable[str],
+    macros: dict,
+    settings: dict,
+) -> dict:
+    """
+    Record everything a build reads, so that a later build can tell if its artifact is still current.
+    The build stamps are left out of the macros: they change on every commit, but not the content.
+    """
+    # Keyed by paths such as pdf/source_transforms.py
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return {
+        "builder": hash_files(builder_files(script), repo_root),
+        "nav": hash_files(nav_files, root),
+        "pages": hash_files(pages, root),
+        "images": hash_files(images, root),
+        "assets": hash_files(assets, root),
+        "macros": {
+            str(key): str(value)
+            for key, value in macros.items()
+            if key not in {"git_info", "build_date"}
+        },
+        "settings": json.loads(json.dumps(settings, default=str)),
+    }
+
+
+def manifest_changes(old: dict, new: dict) -> List[str]:
+    """
+    Describe the differences between two manifests, one entry per category, naming what changed.
+    """
+    changes = []
+    for category in sorted(old.keys() | new.keys()):
+        before, after = old.get(category), new.get(category)
+        if before == after:
+            continue
+        if isinstance(before, dict) and isinstance(after, dict):
+            changed = sorted(
+                key for key in before.keys() | after.keys() if before.get(key) != after.get(key)
+            )
+            shown = ", ".join(changed[:3])
+            if len(changed) > 3:
+                shown += f" (+{len(changed) - 3} more)"
+            changes.append(f"{category}: {shown}")
+        else:
+            changes.append(category)
+    return changes
+
+
+def check_manifest(
+    manifest_file: str, manifest: dict, artifacts: List[str]
+) -> Tuple[bool, str]:
+    """
+    Compare a manifest with the one written by the previous build.
+
+    Returns: (up_to_date, reason)
+    """
+    for artifact in artifacts:
+        if not os.path.isfile(artifact):
+            return False, f"{os.path.basename(artifact)} missing"
+
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False, "no previous manifest"
+
+    if changes := manifest_changes(previous, manifest):
+        return False, "changed " + "; ".join(changes)
+
+    return True, "inputs unchanged"
+
+
+def write_manifest(manifest_file: str, manifest: dict) -> None:
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
@@ -15,24 +15,37 @@ Optional switches:
 
     --document language-reference-guide  Use instead of --config for single doc
     --exclude list-of-files.json         Exclude files present in source mkdocs.yml
+    --only 'Section>Sub-section' file.md Render only the given nav sections or source files
     --disable-toc                        Disable print-style table of contents listing
     --disable-link-rewriting             Disable print-style section numbering of links
     --disable-syntax-highlighting        Disable syntax highlighting
     --disable-section-numbers            Disable print-style section numbers
     --screen                             Make screen-oriented PDF (no ToC, no section numbers)
     --html-only                          Generate unified HTML-file, but not PDF-conversion
+    --force                              Rebuild even if the input manifest is unchanged
     --verbose                            Show verbose Weasyprint output 
 
 The results will end up as
 
     <project-dir>/<document>.[htm|pdf]
 
+together with an input manifest, <project-dir>/<document>.manifest.json, recording hashes of everything
+the build read. A later run skips the document if its manifest still matches, and otherwise says what
+changed. The build date and git info stamps are not inputs: a skipped PDF keeps the stamps of the
+build that made it.
+
 
 NOTES:
 
 The PDF table of contents is generated entirely in paged-media CSS. It ignores the mkdocs.yml navigation titles, relying entirely on the headings in the markdown files: CSS for obvious reasons doesn't see the mkdocs.yml file.
 
 For anyone tempted to change how the ToC is generated, remember Chesterton's Fence. You break it, you own it -- and break it you will.
+
+The --only switch (which requires --document) renders a subset of a document, for quick previews. Nav
+sections are given as '>'-separated key paths, e.g. 'Primitive Operators>Primitive Operators (A-Z)',
+and source files as their path relative to docs/, e.g. 'primitive-functions/add.md'. Section numbers
+are still computed from the full nav, so they match the complete PDF, and links into pages left out
+are rendered as plain section references.
 """
 
 import argparse
@@ -43,13 +56,23 @@ import re
 import shutil
 from subprocess import Popen, run, CalledProcessError
 import sys
-from typing import Callable, Dict, Generator, Iterator, List, Tuple, Union
+from typing import Dict, Generator, Iterator, List, Optional, Set, Tuple, Union
 
 from bs4 import BeautifulSoup
 import markdown
 from markdown.extensions.toc import slugify_unicode
 from ruamel.yaml import YAML
 
+from build_manifest import build_manifest, check_manifest, list_files, write_manifest
+from print_extension import PrintExtension
+from source_transforms import (
+    FRONTMATTER_PATTERN,
+    MACRO_PATTERN,
+    SourceTransforms,
+    expand_macro,
+    strip_frontmatter,
+)
+
 NavItem = Union[str, List["NavItem"]]
 NavDict = Dict[str, NavItem]
 NavType = Union[List[NavDict], NavDict]
@@ -187,35 +210,6 @@ def get_build_date():
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def shift_headings(soup: BeautifulSoup, n: int, article_id: str) -> None:
-    # Find all heading tags
-    headings = soup.find_all(re.compile("^h[1-6]$"))
-
-    delta = 0  # The first heading is considered to be the "h1" -- the rest must be at least one deeper.
-
-    # Modify each heading tag
-    for tag in headings:
-        current_level = int(tag.name[1])  # Extract the current heading level
-        new_level = min(
-            max(current_level + n + delta, 1), 6
-        )  # Ensure new level is between 1 and 6
-        tag.name = f"h{new_level}"
-        if delta == 0:
-            tag.attrs["id"] = f"{article_id}-header"
-        delta = 1
-
-
-def clean_img_src(soup: BeautifulSoup) -> None:
-    """
-    Find all image tags in the given HTML content and remove any leading dots and slashes
-    """
-    for img_tag in soup.find_all("img"):
-        src = img_tag.get("src")
-        if src:
-            new_src = src.lstrip("./")
-            img_tag["src"] = new_src
-
-
 def remove_paths(data: Union[dict, list], paths: List[List[str]]) -> Union[dict, list]:
     if isinstance(data, dict):
         for key in list(
@@ -311,58 +305,43 @@ def find_source_files(
         yield current_path, nav
 
 
-def expand_macros(data: str, macros: dict) -> str:
+def parse_only(only: List[str]) -> List[Union[str, List[str]]]:
     """
-    The mkdocs macro extension makes use of templates of the type {{ macro-id }} where
-    the substitution value is stored in the "extra:" section in the mkdocs.yml file.
+    Source files are given as-is; nav sections as '>'-separated key paths.
     """
-
-    def replace(match):
-        key = match.group(1).strip()
-        value = macros.get(key)
-        return str(value) if not isinstance(value, dict) else match.group(0)
-
-    return re.sub(r"\{\{\s*(.*?)\s*}}", replace, data)
-
-
-def slug(text: str) -> str:
-    return re.sub(r"\W+", "-", text).lower()
+    specs = []
+    for item in only:
+        if item.endswith(".md"):
+            specs.append(item)
+        else:
+            specs.append([part.strip() for part in item.split(">")])
+    return specs
 
 
-def print_footnotes(soup: BeautifulSoup) -> None:
+def select_entries(
+    entries: List[Tuple[List[str], str]], only: List[Union[str, List[str]]]
+) -> Set[Tuple[str, ...]]:
     """
-    Convert to CSS-only footnotes style.
+    Find the key paths of the nav entries to render for a subset of a document: those matching
+    a source file or falling under a nav section in `only`, plus the sections enclosing them.
     """
-    footnote_defs = {}
-
-    # Find all footnote definitions
-    for footnote in soup.select("div.footnote ol li"):
-        footnote_id = footnote.get("id")
-        if footnote_id and footnote_id.startswith("fn:"):
-            # Extract the text from the footnote definition
-            p_tag = footnote.find("p")
-            footnote_text = "".join(
-                str(c)
-                for c in p_tag.contents
-                if not (c.name == "a" and "footnote-backref" in c.get("class", []))
-            )
-            footnote_defs[footnote_id] = footnote_text.strip()
+    selected = set()
+    for keypath, file in entries:
+        for spec in only:
+            if isinstance(spec, str):
+                matched = file == spec
+            else:
+                matched = keypath[: len(spec)] == spec
+            if matched:
+                for i in range(1, len(keypath) + 1):
+                    selected.add(tuple(keypath[:i]))
+                break
 
-    # Find all footnote references
-    footnote_refs = soup.find_all("sup", id=lambda x: x and x.startswith("fnref:"))
+    return selected
 
-    # Replace footnote references with inlined footnotes
-    for ref in footnote_refs:
-        footnote_id = ref.find("a").get("href", "").lstrip("#")
-        if footnote_id in footnote_defs:
-            new_span = soup.new_tag("span", **{"class": "footnote"})
-            new_span.string = footnote_defs[footnote_id]
-            ref.replace_with(new_span)
 
-    # Remove the original footnote definitions section
-    footnote_div = soup.find("div", class_="footnote")
-    if footnote_div:
-        footnote_div.decompose()
+def slug(text: str) -> str:
+    return re.sub(r"\W+", "-", text).lower()
 
 
 def add_caption(soup, table, caption_text, table_seq) -> None:
@@ -415,14 +394,6 @@ def caption_tables(soup: BeautifulSoup) -> Dict[str, int]:
     return table_refs
 
 
-def convert_examples(soup: BeautifulSoup) -> None:
-    headers = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"], class_="example")
-    for header in headers:
-        p_tag = soup.new_tag("p", **{"class": "example"})
-        p_tag.string = header.string
-        header.replace_with(p_tag)
-
-
 def update_seq_stack(seq_stack, s):
     for i in range(s + 1, len(seq_stack)):
         seq_stack[i] = 0
@@ -433,22 +404,27 @@ def convert_to_html(
     filenames: Iterator[str],
     prefix: str,
     title: str,
-    macros: dict,
-    transforms: List[Callable[[str], str]],
+    transforms: SourceTransforms,
     create_toc: bool = True,
     enumerate_sections: bool = True,
     syntax_hilite: bool = True,
     git_info="",
     build_date="",
+    selected: Optional[Set[Tuple[str, ...]]] = None,
 ) -> Tuple[Dict[str, str], str, Dict[str, str]]:
     """
     Markdown to HTML, using the same markdown extensions as our mkdocs site. Concatenate all converted files
     into a single HTML file, wrapping into <section>s of <article>s.
+
+    If `selected` is given, only the nav entries with those key paths are rendered. All entries are still
+    numbered, and entered into the section map and the path-to-id mapping, so that numbering matches
+    the full document.
     """
 
-    def process_markdown(file_path, article_id, remove_first_heading=False):
+    def process_markdown(file_path, article_id, remove_first_heading=False, shift_headings=-1):
         """
-        Convert Markdown to HTML, using the same extensions as used by our mkdocs setup.
+        Convert Markdown to HTML, using the same extensions as used by our mkdocs setup, plus
+        our own print transforms, which act on the Markdown tree.
         """
         extensions = [
             "admonition",  # https://python-markdown.github.io/extensions/admonition/
@@ -458,6 +434,11 @@ def convert_to_html(
             "markdown_tables_extended",  # https://github.com/fumbles/tables_extended
             "pymdownx.details",  # https://facelessuser.github.io/pymdown-extensions/extensions/details/
             "toc",  # https://python-markdown.github.io/extensions/toc/
+            PrintExtension(  # print_extension.py
+                article_id=article_id,
+                remove_first_heading=remove_first_heading,
+                shift_headings=shift_headings,
+            ),
         ]
         if syntax_hilite:
             extensions.append("pymdownx.superfences")
@@ -472,28 +453,13 @@ def convert_to_html(
         with open(file_path, "r", encoding="utf-8") as f:
             md = f.read()
 
-        # Apply macros and any pre-html transforms
-        md = expand_macros(md, macros)
-        for fun in transforms:
-            md = fun(md)
+        # Expand macros and apply any other pre-html transforms, in a single pass
+        md = transforms.apply(md)
 
         # Convert to HTML
-        body = markdown.markdown(
+        return markdown.markdown(
             md, extensions=extensions, extension_configs=extension_configs
         )
-        soup = BeautifulSoup(body, "html.parser")
-
-        # Optionally remove the first h1 heading
-        if remove_first_heading:
-            if h1 := soup.find("h1"):
-                h1.decompose()
-
-        # Apply standard processing
-        print_footnotes(soup)
-        clean_img_src(soup)
-        convert_examples(soup)
-
-        return str(soup).replace("``", "")
 
     # Initialise TOC and articles content
     toc = """
@@ -503,23 +469,42 @@ def convert_to_html(
 """
     articles = ""
     section_stack = []
+    rendered_stack = []  # Whether each open section was written out
     chapter_number = 0
     front_matter = ' class="front-matter"'
     section_map = {}
     seq_stack = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
     path_to_id = {}  # New mapping from file paths to article IDs
 
+    def seed_counter(number: str, counter: Optional[str] = None) -> str:
+        """
+        Section and ToC numbers are CSS counters, which would restart from 1 in a partial render.
+        Seed them with counter-set (applied before the increment) to match the full document.
+        """
+        if selected is None or not number:
+            return ""
+        parts = number.split(".")
+        if counter is None:
+            if len(parts) > 3:  # Only h1-h3 are numbered
+                return ""
+            counter = f"h{len(parts)}counter"
+        return f' style="counter-set: {counter} {int(parts[-1]) - 1}"'
+
     # Process all files
     for keypath, file in filenames:
         # Close any sections that need to be closed
         while section_stack and len(section_stack[-1]) >= len(keypath):
             section_stack.pop()
-            toc += "</ul></li>\n"
-            articles += "</section>\n"
+            if rendered_stack.pop():
+                toc += "</ul></li>\n"
+                articles += "</section>\n"
+
+        render = selected is None or tuple(keypath) in selected
 
         # Case 1: Directory/Section entry
         if file == "":
             section_stack.append(keypath)
+            rendered_stack.append(render)
             heading_level = len(section_stack)
             heading_text = keypath[-1]
             section_id = "-".join(slug(part) for part in keypath)
@@ -532,11 +517,12 @@ def convert_to_html(
             if heading_level == 1:
                 chapter_number += 1
                 front_matter = ""
-                articles += f'<section id="{section_id}" data-chapter-seq="{chapter_number}">\n<h1 id="{section_id}-header" class="chapter">{heading_text}</h1>\n'
-                toc += f'<li class="toc-chapter"><a href="#{section_id}-header" class="toc"></a><ul class="first-level">\n'
-            else:
-                articles += f'<section id="{section_id}">\n<h{heading_level} id="{section_id}-header">{heading_text}</h{heading_level}>\n'
-                toc += f'<li{front_matter}><a href="#{section_id}-header" class="toc"></a><ul>\n'
+                if render:
+                    articles += f'<section id="{section_id}" data-chapter-seq="{chapter_number}"{seed_counter(section_map[section_id])}>\n<h1 id="{section_id}-header" class="chapter">{heading_text}</h1>\n'
+                    toc += f'<li class="toc-chapter"{seed_counter(section_map[section_id], "toc-item")}><a href="#{section_id}-header" class="toc"></a><ul class="first-level">\n'
+            elif render:
+                articles += f'<section id="{section_id}"{seed_counter(section_map[section_id])}>\n<h{heading_level} id="{section_id}-header">{heading_text}</h{heading_level}>\n'
+                toc += f'<li{front_matter or seed_counter(section_map[section_id], "toc-item")}><a href="#{section_id}-header" class="toc"></a><ul>\n'
             continue
 
         # Case 2: Top-level file (treat as chapter)
@@ -550,16 +536,16 @@ def convert_to_html(
             # Create section for this chapter
             section_id = slug(heading_text)
             heading_id = f"{section_id}-header"
-            articles += (
-                f'<section id="{section_id}" data-chapter-seq="{chapter_number}">\n'
-            )
-            articles += f'<h1 id="{heading_id}" class="chapter">{heading_text}</h1>\n'
+            if render:
+                articles += f'<section id="{section_id}" data-chapter-seq="{chapter_number}"{seed_counter(str(chapter_number))}>\n'
+                articles += f'<h1 id="{heading_id}" class="chapter">{heading_text}</h1>\n'
 
-            # Add to TOC
-            toc += f'<li class="toc-chapter"><a href="#{heading_id}" class="toc"></a><ul class="first-level">\n'
+                # Add to TOC
+                toc += f'<li class="toc-chapter"{seed_counter(str(chapter_number), "toc-item")}><a href="#{heading_id}" class="toc"></a><ul class="first-level">\n'
 
             # Update section stack and numbering
             section_stack.append(keypath)
+            rendered_stack.append(render)
             update_seq_stack(seq_stack, 0)
             section_map[section_id] = str(chapter_number)
         elif front_matter == "":
@@ -578,24 +564,27 @@ def convert_to_html(
         section_map[article_id] = ".".join(str(c) for c in seq_stack if c > 0)
         path_to_id[file] = article_id  # Map file path to article ID
 
+        if not render:
+            continue
+
         # Add to TOC (except for top-level file articles since they're already in TOC)
         if not is_top_level:
-            toc += f'<li{front_matter}><a href="#{article_id}-header" class="toc"></a></li>\n'
+            toc += f'<li{front_matter or seed_counter(section_map[article_id], "toc-item")}><a href="#{article_id}-header" class="toc"></a></li>\n'
 
         # Process and add article content
-        articles += f'<article id="{article_id}">\n'
+        if is_top_level:
+            articles += f'<article id="{article_id}">\n'
+        else:
+            articles += f'<article id="{article_id}"{seed_counter(section_map[article_id])}>\n'
+        # Top-level files lose their first heading (the chapter heading stands in for it); the
+        # headings of the rest are shifted to their depth in the document.
         html_content = process_markdown(
             os.path.join(prefix, file),
             article_id,  # Pass article_id to process_markdown
             remove_first_heading=is_top_level,
+            shift_headings=-1 if is_top_level else len(section_stack),
         )
 
-        # For non-top-level files, handle headings
-        if not is_top_level:
-            soup = BeautifulSoup(html_content, "html.parser")
-            shift_headings(soup, len(section_stack), article_id)
-            html_content = str(soup)
-
         articles += html_content
         articles += "\n</article>\n"
 
@@ -606,8 +595,9 @@ def convert_to_html(
     # Close any remaining open sections
     while section_stack:
         section_stack.pop()
-        toc += "</ul></li>\n"
-        articles += "</section>\n"
+        if rendered_stack.pop():
+            toc += "</ul></li>\n"
+            articles += "</section>\n"
 
     # Finish TOC
     toc += """
@@ -665,7 +655,12 @@ def static_assets(src_dir="assets", project="project") -> None:
     shutil.copytree(src_dir, dest_dir)
 
 
-def fix_links(b: str) -> str:
+# Markdown links, excluding images (which start with !). The lookbehind follows the "[" so that
+# the scan can skip ahead to it; see source_transforms.py.
+LINK_PATTERN = r"\[(?<!!\[)([^]]*)]\(([^)]+)\)"
+
+
+def fix_link(match: re.Match, state: dict) -> str:
     """
     Links in the mkdocs source are "clean URLs" -- the renderer will remove the .md extensions
     on link targets. We have to do that transformation ourselves -- or rather, change to .htm.
@@ -681,43 +676,51 @@ def fix_links(b: str) -> str:
 
     3. Off-site links start with "http" -- return those unchanged.
     """
+    link_text = match.group(1)
+    link_target = match.group(2)
+
+    # Links referencing tables are empty, and expected to be
+    # filled out by the captioning plugin. We have to do this
+    # as a post-conversion step. Peel off any page reference
+    # prior to the id. We're now dealing with a single page.
+    # Let's hope table ids are unique.
+    if link_text == "":
+        return f"[TABLE-REFERENCE]({re.sub(r'^[^#]+', '', link_target)})"
+
+    if link_target.startswith("http"):  # Off-site link: return unchanged
+        return f"[{link_text}]({link_target})"
 
-    def link_transform(match: re.Match) -> str:
-        link_text = match.group(1)
-        link_target = match.group(2)
-
-        # Links referencing tables are empty, and expected to be
-        # filled out by the captioning plugin. We have to do this
-        # as a post-conversion step. Peel off any page reference
-        # prior to the id. We're now dealing with a single page.
-        # Let's hope table ids are unique.
-        if link_text == "":
-            return f"[TABLE-REFERENCE]({re.sub(r'^[^#]+', '', link_target)})"
+    # If the link contains an internal anchor (#), return unchanged
+    if "#" in link_target:
+        return f"[{link_text}]({link_target})"
 
-        if link_target.startswith("http"):  # Off-site link: return unchanged
-            return f"[{link_text}]({link_target})"
+    path, name = os.path.split(link_target)
+    base, ext = os.path.splitext(name)
+    htm_target = f"{os.path.join(path, base)}.htm"
 
-        # If the link contains an internal anchor (#), return unchanged
-        if "#" in link_target:
-            return f"[{link_text}]({link_target})"
+    if ext == ".md":  # Intra-doc link: change extension to ".htm"
+        return f"[{link_text}]({htm_target})"
 
-        path, name = os.path.split(link_target)
-        base, ext = os.path.splitext(name)
-        htm_target = f"{os.path.join(path, base)}.htm"
+    if ext == "":  # Inter-doc link: make absolute, change extension
+        # Replace any number of leading ../ with a single /
+        no_slashdot = re.sub(r"^[/.]+", "/", htm_target)
+        return f"[{link_text}]({no_slashdot})"
 
-        if ext == ".md":  # Intra-doc link: change extension to ".htm"
-            return f"[{link_text}]({htm_target})"
+    # Something else; leave alone
+    return f"[{link_text}]({link_target})"
 
-        if ext == "":  # Inter-doc link: make absolute, change extension
-            # Replace any number of leading ../ with a single /
-            no_slashdot = re.sub(r"^[/.]+", "/", htm_target)
-            return f"[{link_text}]({no_slashdot})"
 
-        # Something else; leave alone
-        return f"[{link_text}]({link_target})"
-
-    # Exclude markdown images (which start with !)
-    return re.sub(r"(?<!!)\[([^]]*)]\(([^)]+)\)", link_transform, b)
+def page_transforms(macros: dict) -> SourceTransforms:
+    """
+    The source rewrites applied to each page, compiled once per document.
+    """
+    transforms = SourceTransforms()
+    transforms.register("macros", MACRO_PATTERN, expand_macro(macros), in_code=True)
+    transforms.register(
+        "frontmatter", FRONTMATTER_PATTERN, strip_frontmatter, flags=re.DOTALL, at_start=True
+    )
+    transforms.register("links", LINK_PATTERN, fix_link)
+    return transforms
 
 
 def normalise_links(
@@ -819,7 +822,22 @@ def normalise_links(
                             .replace(".htm", ".md")
                             .replace(".html", ".md")
                         )
-                        if target_rel_path in path_to_id:
+                        if (
+                            target_rel_path in path_to_id
+                            and path_to_id[target_rel_path] not in article_ids
+                        ):
+                            # Target left out of a partial render: stub the reference
+                            target_id = path_to_id[target_rel_path]
+                            new_tag = soup.new_tag("i", **{"class": "stub-reference"})
+                            new_tag.string = a_text
+                            if rewrite_links and not in_table(a_tag):
+                                if reference := section_map.get(target_id):
+                                    if "." in reference:
+                                        new_tag.string = f"Section {reference}"
+                                    else:
+                                        new_tag.string = f"Chapter {reference}"
+                            a_tag.replace_with(new_tag)
+                        elif target_rel_path in path_to_id:
                             target_id = path_to_id[target_rel_path]
                             if anchor:
                                 new_href = f"#{target_id}-{anchor}"
@@ -859,29 +877,6 @@ def normalise_links(
                     print(f'--> Warning: no parent article found for link "{href}"')
 
 
-def toc_friendly_headings(soup: BeautifulSoup) -> None:
-    # Find all headings with class "heading"
-    for heading in soup.find_all(class_="heading"):
-        # Ensure it has the specific structure we're looking for
-        name_span = heading.find("span", class_="name")
-        command_span = heading.find("span", class_="command")
-
-        if name_span and command_span:
-            # Create the new structure
-            heading_container = soup.new_tag("div", **{"class": "heading-container"})
-            new_heading = soup.new_tag(heading.name, **heading.attrs)
-            new_heading.string = name_span.text
-            command_div = soup.new_tag("div", **{"class": "command"})
-            command_div.string = command_span.text
-
-            # Assemble the new structure
-            heading_container.append(new_heading)
-            heading_container.append(command_div)
-
-            # Replace the old heading with the new structure
-            heading.replace_with(heading_container)
-
-
 def toplevel_docs(nav: List[Dict[str, str]]) -> Dict[str, str]:
     result = {}
     for entry in nav:
@@ -938,30 +933,79 @@ def process_document(document_path):
     yml_data = parse_mkdocs_yml(doc_mkdocs_file, remove=excludes)
 
     # Find all source Markdown files in depth-first traversal order
-    md_files = find_source_files(os.path.dirname(doc_mkdocs_file), yml_data["nav"])
+    md_files = list(
+        find_source_files(os.path.dirname(doc_mkdocs_file), yml_data["nav"])
+    )
 
-    # Copy img dir for this document
+    # For a partial render, work out which nav entries to keep. Numbering still uses the full nav.
+    selected = None
+    if only:
+        selected = select_entries(md_files, only)
+        if not selected:
+            sys.exit(f"--> nothing in {doc_mkdocs_file} matches --only")
+
+    source = f"{args.project_dir}/{document_path}.htm"
+    output_filename = (
+        doc_metadata.get("filename", f"{document_path}.pdf")
+        if doc_metadata
+        else f"{document_path}.pdf"
+    )
     img_src_dir = str(os.path.join(os.path.dirname(doc_mkdocs_file), "docs", "img"))
+    prefix = os.path.join(os.path.dirname(doc_mkdocs_file), "docs")
+
+    # Skip the build if nothing it reads has changed since the last one
+    manifest_file = os.path.join(args.project_dir, f"{document_path}.manifest.json")
+    manifest = build_manifest(
+        __file__,
+        root=os.path.dirname(os.path.abspath(args.mkdocs_yml)),
+        nav_files=[os.path.abspath(args.mkdocs_yml), doc_mkdocs_file],
+        pages=[os.path.join(prefix, file) for _, file in md_files if file],
+        images=list_files(img_src_dir),
+        assets=list_files(args.assets_dir),
+        macros=top_mkdocs_data.get("extra", {}),
+        settings={
+            "toc": args.toc,
+            "link_rewrite": args.link_rewrite,
+            "syntax_hilite": args.syntax_hilite,
+            "enumerate_sections": args.enumerate_sections,
+            "screen": args.screen,
+            "html_only": args.html_only,
+            "only": args.only,
+            "exclude": excludes,
+            "metadata": doc_metadata,
+        },
+    )
+    artifacts = [source]
+    if not args.html_only:
+        artifacts.append(os.path.join(args.project_dir, output_filename))
+
+    if not args.force:
+        up_to_date, reason = check_manifest(manifest_file, manifest, artifacts)
+        if up_to_date:
+            print(f"--> {document_path}: {reason}, skipping")
+            return
+        print(f"--> {document_path}: rebuilding, {reason}")
+
+    # Copy img dir for this document
     img_dest_dir = str(os.path.join(args.project_dir, "img"))
-    
+
     if os.path.exists(img_src_dir):
         if os.path.exists(img_dest_dir):
             shutil.rmtree(img_dest_dir)
         copy_directory(img_src_dir, img_dest_dir)
 
     # Convert each Markdown file to HTML, and concatenate to a single string
-    source = f"{args.project_dir}/{document_path}.htm"
     section_map, html_content, path_to_id = convert_to_html(  # Receive path_to_id
         md_files,
-        prefix=os.path.join(os.path.dirname(doc_mkdocs_file), "docs"),
+        prefix=prefix,
         title=yml_data["site_name"],
-        macros=top_mkdocs_data.get("extra", {}),
-        transforms=[fix_links],
+        transforms=page_transforms(top_mkdocs_data.get("extra", {})),
         create_toc=args.toc,
         enumerate_sections=args.enumerate_sections,
         syntax_hilite=args.syntax_hilite,
         git_info=git_info,
         build_date=build_date,
+        selected=selected,
     )
 
     # Global transforms on the unified HTML-file.
@@ -1006,7 +1050,6 @@ def process_document(document_path):
         path_to_id,
         rewrite_links=args.link_rewrite,
     )  # Pass path_to_id
-    toc_friendly_headings(soup)
 
     # Insert link to title page CSS
     css_link = soup.new_tag(
@@ -1020,18 +1063,16 @@ def process_document(document_path):
         f.write(html_content)
 
     if not args.html_only:
-        output_filename = (
-            doc_metadata.get("filename", f"{document_path}.pdf")
-            if doc_metadata
-            else f"{document_path}.pdf"
-        )
-
         cmd = ["weasyprint", f"{document_path}.htm", output_filename]
         if not args.verbose:
             cmd.append("--quiet")
 
         output = Popen(cmd, cwd=args.project_dir)
-        output.wait()
+        if output.wait() != 0:
+            print(f"--> weasyprint failed for {document_path}")
+            return
+
+    write_manifest(manifest_file, manifest)
 
 
 if __name__ == "__main__":
@@ -1066,6 +1107,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--exclude", type=str, help="Name of json file with ToC exclusions"
     )
+    parser.add_argument(
+        "--only",
+        type=str,
+        nargs="+",
+        help="Render only these nav sections ('Section>Sub-section') or source files (path/to/file.md)",
+    )
     parser.add_argument(
         "--disable-toc",
         action="store_false",
@@ -1100,6 +1147,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Generate unified HTML-file, but not PDF-conversion",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the input manifest is unchanged",
+    )
 
     args = parser.parse_args()
 
@@ -1107,6 +1159,9 @@ if __name__ == "__main__":
     if bool(args.document) == bool(args.config):
         sys.exit("Error: Exactly one of --document or --config must be specified")
 
+    if args.only and not args.document:
+        sys.exit("Error: --only requires --document")
+
     if args.screen:
         args.toc = False
         args.link_rewrite = False
@@ -1168,6 +1223,8 @@ if __name__ == "__main__":
         with open(args.exclude, "r", encoding="utf-8") as file:
             excludes = json.load(file)
 
+    only = parse_only(args.only) if args.only else []
+
     # Prepare static assets (done once for all documents)
     os.makedirs(args.project_dir, exist_ok=True)
     static_assets(args.assets_dir, args.project_dir)
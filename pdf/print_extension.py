@@ -0,0 +1,299 @@
+"""
+print_extension.py
+
+Python-Markdown extension applying the print-specific rewrites of mkdocs2pdf.py to each article
+while it is rendered, on Markdown's own ElementTree, instead of re-parsing the rendered HTML:
+
+    - resolve raw HTML headings, such as <h1 class="heading">, into the tree
+    - optionally remove the first h1 (top-level files, whose chapter heading comes from the nav)
+    - inline footnotes as CSS footnotes
+    - strip leading dots and slashes from image sources
+    - turn "example" headings into paragraphs, so they stay out of the ToC
+    - shift heading levels to the article's depth in the document
+    - split "name command" headings so that the ToC shows the name only
+    - drop empty code spans
+
+The treeprocessors run after "toc" (which assigns the heading ids), and before "unescape".
+"""
+import copy
+from html.parser import HTMLParser
+import re
+from typing import Dict, Optional
+import xml.etree.ElementTree as etree
+
+from markdown import Markdown
+from markdown.extensions import Extension
+from markdown.extensions.footnotes import NBSP_PLACEHOLDER
+from markdown.postprocessors import Postprocessor
+from markdown.treeprocessors import Treeprocessor
+
+HEADING_RE = re.compile(r"^h[1-6]$")
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"
+}
+
+
+def has_class(el: etree.Element, name: str) -> bool:
+    return name in el.get("class", "").split()
+
+
+def text_of(el: etree.Element) -> str:
+    return "".join(el.itertext())
+
+
+def string_of(el: etree.Element) -> Optional[str]:
+    """
+    The text of an element with a single string descendant, else None. BeautifulSoup's .string.
+    """
+    if len(el) == 0:
+        return el.text
+    if len(el) == 1 and not el.text and not el[0].tail:
+        return string_of(el[0])
+    return None
+
+
+def parent_map(root: etree.Element) -> Dict[etree.Element, etree.Element]:
+    return {child: parent for parent in root.iter() for child in parent}
+
+
+def remove(parent: etree.Element, el: etree.Element) -> None:
+    """
+    Remove el, keeping its tail.
+    """
+    if el.tail:
+        idx = list(parent).index(el)
+        if idx:
+            parent[idx - 1].tail = (parent[idx - 1].tail or "") + el.tail
+        else:
+            parent.text = (parent.text or "") + el.tail
+    parent.remove(el)
+
+
+def replace(parent: etree.Element, old: etree.Element, new: etree.Element) -> None:
+    new.tail = old.tail
+    parent[list(parent).index(old)] = new
+
+
+class _FragmentParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = etree.Element("div")
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        el = etree.SubElement(self.stack[-1], tag, {k: v or "" for k, v in attrs})
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(el)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        # Close up to the matching open tag, if any
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        parent = self.stack[-1]
+        if len(parent):
+            parent[-1].tail = (parent[-1].tail or "") + data
+        else:
+            parent.text = (parent.text or "") + data
+
+
+def parse_heading(html: str) -> Optional[etree.Element]:
+    """
+    Parse a raw HTML block consisting of a single heading element, else None.
+    """
+    parser = _FragmentParser()
+    parser.feed(html)
+    parser.close()
+    root = parser.root
+    if len(root) != 1 or (root.text or "").strip() or (root[0].tail or "").strip():
+        return None
+    heading = root[0]
+    if not HEADING_RE.match(heading.tag):
+        return None
+    heading.tail = None
+    return heading
+
+
+class RawHeadingTreeprocessor(Treeprocessor):
+    """
+    Raw HTML blocks are stashed, and only appear in the tree as placeholder paragraphs. Replace
+    the placeholders of blocks holding a heading by the parsed heading, so that the following
+    treeprocessors see it like any other. Other blocks are left to the raw HTML postprocessor.
+    """
+
+    def run(self, root: etree.Element) -> None:
+        placeholders = {
+            self.md.htmlStash.get_placeholder(i): i
+            for i in range(self.md.htmlStash.html_counter)
+        }
+        for parent, el in [(p, c) for p in root.iter() for c in p]:
+            if el.tag != "p" or len(el) or el.text not in placeholders:
+                continue
+            html = self.md.htmlStash.rawHtmlBlocks[placeholders[el.text]]
+            if isinstance(html, str) and (heading := parse_heading(html)) is not None:
+                replace(parent, el, heading)
+
+
+class RemoveFirstHeadingTreeprocessor(Treeprocessor):
+    def run(self, root: etree.Element) -> None:
+        parents = parent_map(root)
+        if (h1 := next(root.iter("h1"), None)) is not None:
+            remove(parents[h1], h1)
+
+
+class FootnoteTreeprocessor(Treeprocessor):
+    """
+    Convert to CSS-only footnotes style: each reference is replaced by the text of its footnote,
+    in a <span class="footnote">, and the footnote list is removed.
+    """
+
+    def run(self, root: etree.Element) -> None:
+        parents = parent_map(root)
+        footnote_defs: Dict[str, etree.Element] = {}
+
+        # Find all footnote definitions
+        footnote_div = next((el for el in root.iter("div") if has_class(el, "footnote")), None)
+        if footnote_div is None:
+            return
+        for li in footnote_div.iter("li"):
+            footnote_id = li.get("id", "")
+            p_tag = next(li.iter("p"), None)
+            if not footnote_id.startswith("fn:") or p_tag is None:
+                continue
+            # Take the content of the first paragraph, less the link back to the reference
+            span = etree.Element("span", {"class": "footnote"})
+            span.text = p_tag.text
+            for child in p_tag:
+                if not (child.tag == "a" and has_class(child, "footnote-backref")):
+                    span.append(copy.deepcopy(child))
+            if len(span):
+                span[-1].tail = (span[-1].tail or "").replace(NBSP_PLACEHOLDER, "\xa0").rstrip()
+            else:
+                span.text = (span.text or "").replace(NBSP_PLACEHOLDER, "\xa0").rstrip()
+            span.text = (span.text or "").lstrip()
+            footnote_defs[footnote_id] = span
+
+        # Replace footnote references with inlined footnotes
+        for sup in [el for el in root.iter("sup") if el.get("id", "").startswith("fnref:")]:
+            a_tag = sup.find("a")
+            footnote_id = a_tag.get("href", "").lstrip("#") if a_tag is not None else ""
+            if footnote_id in footnote_defs:
+                replace(parents[sup], sup, copy.deepcopy(footnote_defs[footnote_id]))
+
+        # Remove the original footnote definitions section
+        remove(parents[footnote_div], footnote_div)
+
+
+class ImageSrcTreeprocessor(Treeprocessor):
+    """
+    Remove any leading dots and slashes from image sources.
+    """
+
+    def run(self, root: etree.Element) -> None:
+        for img in root.iter("img"):
+            if src := img.get("src"):
+                img.set("src", src.lstrip("./"))
+
+
+class ExampleTreeprocessor(Treeprocessor):
+    """
+    Headings marked as examples become paragraphs.
+    """
+
+    def run(self, root: etree.Element) -> None:
+        for parent, el in [(p, c) for p in root.iter() for c in p]:
+            if HEADING_RE.match(el.tag) and has_class(el, "example"):
+                p_tag = etree.Element("p", {"class": "example"})
+                p_tag.text = string_of(el)
+                replace(parent, el, p_tag)
+
+
+class ShiftHeadingsTreeprocessor(Treeprocessor):
+    """
+    The first heading is the article's heading: shift it n levels down, and give it the id the ToC
+    links to. The rest must be at least one deeper.
+    """
+
+    def __init__(self, md: Markdown, n: int, article_id: str) -> None:
+        super().__init__(md)
+        self.n = n
+        self.article_id = article_id
+
+    def run(self, root: etree.Element) -> None:
+        delta = 0
+        for tag in [el for el in root.iter() if HEADING_RE.match(el.tag)]:
+            current_level = int(tag.tag[1])
+            tag.tag = f"h{min(max(current_level + self.n + delta, 1), 6)}"
+            if delta == 0:
+                tag.set("id", f"{self.article_id}-header")
+            delta = 1
+
+
+class TocFriendlyHeadingTreeprocessor(Treeprocessor):
+    """
+    Headings of the form <span class="name">...</span> <span class="command">...</span> are split
+    into the heading proper, holding the name only, and a div holding the command, so that the
+    command stays out of the ToC.
+    """
+
+    def run(self, root: etree.Element) -> None:
+        parents = parent_map(root)
+        for heading in [el for el in root.iter() if has_class(el, "heading")]:
+            spans = [el for el in heading.iter("span") if el is not heading]
+            name_span = next((s for s in spans if has_class(s, "name")), None)
+            command_span = next((s for s in spans if has_class(s, "command")), None)
+            if name_span is None or command_span is None:
+                continue
+
+            heading_container = etree.Element("div", {"class": "heading-container"})
+            new_heading = etree.SubElement(heading_container, heading.tag, dict(heading.attrib))
+            new_heading.text = text_of(name_span)
+            command_div = etree.SubElement(heading_container, "div", {"class": "command"})
+            command_div.text = text_of(command_span)
+            replace(parents[heading], heading, heading_container)
+
+
+class EmptyCodePostprocessor(Postprocessor):
+    """
+    Empty code blocks aren't rendered correctly.
+    """
+
+    def run(self, text: str) -> str:
+        return text.replace("``", "")
+
+
+class PrintExtension(Extension):
+    def __init__(self, **kwargs) -> None:
+        self.config = {
+            "article_id": ["", "Id of the article being rendered"],
+            "remove_first_heading": [False, "Remove the first h1"],
+            # Not None for "leave them": Markdown would take a number for a boolean
+            "shift_headings": [-1, "Levels to shift the headings down by, or -1 to leave them"],
+        }
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md: Markdown) -> None:
+        md.registerExtension(self)
+        processors = [(RawHeadingTreeprocessor(md), "print_raw_headings")]
+        if self.getConfig("remove_first_heading"):
+            processors.append((RemoveFirstHeadingTreeprocessor(md), "print_remove_first_heading"))
+        processors += [
+            (FootnoteTreeprocessor(md), "print_footnotes"),
+            (ImageSrcTreeprocessor(md), "print_img_src"),
+            (ExampleTreeprocessor(md), "print_examples"),
+        ]
+        if (n := self.getConfig("shift_headings")) >= 0:
+            shift = ShiftHeadingsTreeprocessor(md, n, self.getConfig("article_id"))
+            processors.append((shift, "print_shift_headings"))
+        processors.append((TocFriendlyHeadingTreeprocessor(md), "print_toc_friendly_headings"))
+
+        # In this order, between "toc" (5) and "unescape" (0)
+        for i, (processor, name) in enumerate(processors):
+            md.treeprocessors.register(processor, name, 4 - i / len(processors))
+        md.postprocessors.register(EmptyCodePostprocessor(md), "print_empty_code", 0)
@@ -0,0 +1,223 @@
+"""
+source_transforms.py
+
+Single-pass rewriting of Markdown source, shared by mkdocs2pdf.py and mkdocs2chm.py.
+
+Each builder rewrites the Markdown of every page before rendering it: macros are expanded,
+links fixed up, table captions renumbered and front matter stripped. Rather than running one
+regex substitution per rewrite, the rewrites are registered as rules with a SourceTransforms
+instance, which compiles them all into a single alternation once, and then rewrites a page in
+one scan:
+
+    transforms = SourceTransforms()
+    transforms.register("macros", MACRO_PATTERN, expand_macro(macros), in_code=True)
+    transforms.register(
+        "frontmatter", FRONTMATTER_PATTERN, strip_frontmatter, flags=re.DOTALL, at_start=True
+    )
+
+    state = {}
+    md = transforms.apply(md, state)
+
+A handler is called with the match of its own pattern and a per-page state dict, and returns
+the replacement text. It may instead return a callable taking no arguments, which is called
+once the whole page has been scanned. This is how a rule can refer forward, e.g. a table
+reference preceding its caption.
+
+Fenced code blocks are skipped, except by rules registered with in_code=True (macros: the
+mkdocs-macros plugin expands them in code, too). Such rules are also applied to the text
+matched by other rules before their handlers see it, so a macro inside a link text is
+expanded as it would be if run as a separate pass. A rule registered with at_start=True
+(front matter) is only tried at the start of the page, and takes no part in the scan.
+
+The patterns are combined as they are, so rules may not share group names, and must not use
+numbered backreferences. Give any flags as `flags` rather than inline. Start each pattern
+with a literal character -- put any lookbehind after it, as in LINK_PATTERN in mkdocs2pdf.py.
+The regex engine then jumps from one possible first character to the next, and the per-page
+cost stays flat as rules are added; a single pattern that does not will slow the whole scan.
+"""
+from dataclasses import dataclass
+import re
+from typing import Callable, List, Optional, Union
+
+from ruamel.yaml import YAML
+
+Handler = Callable[[re.Match, dict], Union[str, Callable[[], str]]]
+
+# Fenced code blocks, ``` or ~~~, possibly indented (inside admonitions and lists), closed by
+# the same fence on a line of its own. An unclosed fence runs to the end of the page. The
+# patterns start at the fence itself; that it starts a line is checked separately.
+FENCE_PATTERNS = [
+    rf"{fence}(?P<{name}>{char}*)(?ms:[^\n]*(?:\n(?![ \t]*{fence}(?P={name})[ \t]*$)[^\n]*)*"
+    rf"(?:\n[ \t]*{fence}(?P={name})[ \t]*$)?)"
+    for fence, char, name in [("```", "`", "_backticks"), ("~~~", "~", "_tildes")]
+]
+
+MACRO_PATTERN = r"\{\{\s*(.*?)\s*}}"
+
+FRONTMATTER_PATTERN = r"\s*---\n(.*?)\n---\n+"
+
+_SCOPED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+
+
+@dataclass
+class Rule:
+    name: str
+    regex: re.Pattern
+    handler: Handler
+    in_code: bool = False
+    at_start: bool = False
+
+
+class SourceTransforms:
+    def __init__(self) -> None:
+        self.rules: List[Rule] = []
+        self._scanner: Optional[re.Pattern] = None
+        self._inner: Optional[re.Pattern] = None
+
+    def register(
+        self,
+        name: str,
+        pattern: str,
+        handler: Handler,
+        flags: int = 0,
+        in_code: bool = False,
+        at_start: bool = False,
+    ) -> None:
+        """
+        Add a rule. Where two rules could match at the same position, the one registered
+        first wins.
+        """
+        if any(rule.name == name for rule in self.rules):
+            raise ValueError(f"source transform '{name}' already registered")
+        unsupported = flags & ~sum(_SCOPED_FLAGS)
+        if unsupported:
+            raise ValueError(f"source transform '{name}': unsupported flags {unsupported}")
+        self.rules.append(Rule(name, re.compile(pattern, flags), handler, in_code, at_start))
+        self._scanner = None
+
+    def rule(self, name: str, pattern: str, **kwargs):
+        """
+        Decorator form of register().
+        """
+
+        def decorate(handler: Handler) -> Handler:
+            self.register(name, pattern, handler, **kwargs)
+            return handler
+
+        return decorate
+
+    def _compile(self) -> None:
+        def alternative(rule: Rule) -> str:
+            flags = "".join(c for f, c in _SCOPED_FLAGS.items() if rule.regex.flags & f)
+            return f"(?{flags}:{rule.regex.pattern})" if flags else rule.regex.pattern
+
+        scanned = [rule for rule in self.rules if not rule.at_start]
+        inner = [alternative(rule) for rule in scanned if rule.in_code]
+        try:
+            self._scanner = re.compile(
+                "|".join(FENCE_PATTERNS + [alternative(rule) for rule in scanned])
+            )
+            self._inner = re.compile("|".join(inner)) if inner else None
+        except re.error as e:
+            raise ValueError(f"cannot combine source transforms: {e}") from e
+
+    def _substitute(
+        self, scanner: re.Pattern, text: str, pos: int, state: dict, pieces: list
+    ) -> None:
+        in_code = scanner is self._inner
+        done = pos  # Text before this is in pieces
+        while m := scanner.search(text, pos):
+            start, pos = m.span()
+            if not in_code and (
+                m.group("_backticks") is not None or m.group("_tildes") is not None
+            ):
+                line_start = text.rfind("\n", 0, start) + 1
+                if text[line_start:start].strip(" \t"):
+                    # Not at the start of a line, e.g. inline code: not a fence. Continue the
+                    # scan after the fence characters.
+                    pos = start + 3
+                    continue
+                pieces.append(text[done:start])
+                if self._inner:
+                    self._substitute(self._inner, m.group(), 0, state, pieces)
+                else:
+                    pieces.append(m.group())
+                done = pos
+                continue
+
+            # Find the rule that matched, and with it the rule's own groups: the first rule to
+            # match here, as in the alternation.
+            for rule in self.rules:
+                if rule.at_start or (in_code and not rule.in_code):
+                    continue
+                match = rule.regex.match(text, start)
+                if match and match.end() == pos:
+                    break
+            if self._inner and not rule.in_code:
+                matched = m.group()
+                expanded = self.apply_inner(matched, state)
+                if expanded != matched:
+                    match = rule.regex.fullmatch(expanded) or match
+            pieces.append(text[done:start])
+            pieces.append(rule.handler(match, state))
+            done = pos
+            if pos == start:  # Empty match: make progress
+                pos += 1
+        pieces.append(text[done:])
+
+    def apply_inner(self, text: str, state: dict) -> str:
+        """
+        Apply only the in_code rules to a fragment of text.
+        """
+        if self._scanner is None:
+            self._compile()
+        if not self._inner:
+            return text
+        pieces: list = []
+        self._substitute(self._inner, text, 0, state, pieces)
+        return "".join(p() if callable(p) else p for p in pieces)
+
+    def apply(self, text: str, state: Optional[dict] = None) -> str:
+        """
+        Rewrite a page in a single scan. Handlers share `state`, which the caller can inspect
+        afterwards (e.g. for front matter).
+        """
+        if self._scanner is None:
+            self._compile()
+        if state is None:
+            state = {}
+        pieces: list = []
+        pos = 0
+        for rule in self.rules:
+            if rule.at_start and (m := rule.regex.match(text)):
+                pieces.append(rule.handler(m, state))
+                pos = m.end()
+                break
+        self._substitute(self._scanner, text, pos, state, pieces)
+        return "".join(p() if callable(p) else p for p in pieces)
+
+
+def expand_macro(macros: dict) -> Handler:
+    """
+    The mkdocs macro extension makes use of templates of the type {{ macro-id }} where
+    the substitution value is stored in the "extra:" section in the mkdocs.yml file.
+    """
+
+    def replace(match: re.Match, state: dict) -> str:
+        key = match.group(1).strip()
+        value = macros.get(key)
+        return str(value) if not isinstance(value, dict) else match.group(0)
+
+    return replace
+
+
+def strip_frontmatter(match: re.Match, state: dict) -> str:
+    """
+    Remove YAML front matter, keeping it as state["frontmatter"].
+    """
+    try:
+        frontmatter = YAML().load(match.group(1))
+    except Exception:
+        frontmatter = None
+    state["frontmatter"] = frontmatter if isinstance(frontmatter, dict) else {}
+    return ""
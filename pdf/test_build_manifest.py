@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for build_manifest module.
+"""
+
+import json
+import os
+
+import pytest
+
+import build_manifest as manifests
+from build_manifest import build_manifest, check_manifest, manifest_changes, write_manifest
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """
+    A repo laid out like this one: a chm builder, importing a module beside it and one from pdf/,
+    with the pages it reads. build_manifest is made to live in the pdf/ of this repo.
+    """
+    root = str(tmp_path)
+    write(os.path.join(root, "pdf", "build_manifest.py"), "# Shared\n")
+    write(os.path.join(root, "pdf", "source_transforms.py"), "RULES = []\n")
+    write(os.path.join(root, "pdf", "test_source_transforms.py"), "# A test\n")
+    write(os.path.join(root, "chm", "mkdocs2chm.py"), "import caption\n")
+    write(os.path.join(root, "chm", "caption.py"), "CAPTION = 'Table'\n")
+    write(os.path.join(root, "docs", "mkdocs.yml"), "nav:\n  - index.md\n")
+    write(os.path.join(root, "docs", "docs", "index.md"), "# Index\n")
+    monkeypatch.setattr(manifests, "__file__", os.path.join(root, "pdf", "build_manifest.py"))
+    return root
+
+
+def manifest_of(root, settings=None):
+    docs = os.path.join(root, "docs")
+    return build_manifest(
+        os.path.join(root, "chm", "mkdocs2chm.py"),
+        root=docs,
+        nav_files=[os.path.join(docs, "mkdocs.yml")],
+        pages=[os.path.join(docs, "docs", "index.md")],
+        images=[],
+        assets=[],
+        macros={"version_majmin": "20.0", "build_date": "2026-10-19"},
+        settings=settings or {"codepage": 1252},
+    )
+
+
+class TestBuildManifest:
+    """Test recording the inputs of a build."""
+
+    def test_builder(self, repo):
+        """Test that the builder's code is every module beside it and in pdf/, tests aside."""
+        manifest = manifest_of(repo)
+        assert sorted(manifest["builder"]) == [
+            os.path.join("chm", "caption.py"),
+            os.path.join("chm", "mkdocs2chm.py"),
+            os.path.join("pdf", "build_manifest.py"),
+            os.path.join("pdf", "source_transforms.py"),
+        ]
+        assert manifest["pages"] == manifest_of(repo)["pages"]
+        assert list(manifest["pages"]) == [os.path.join("docs", "index.md")]
+        assert manifest["macros"] == {"version_majmin": "20.0"}
+
+    @pytest.mark.parametrize("module", [("chm", "caption.py"), ("pdf", "source_transforms.py")])
+    def test_module_edited(self, repo, module):
+        """Test that editing a module the builder imports invalidates the manifest."""
+        manifest_file = os.path.join(repo, "dyalog.manifest.json")
+        artifact = os.path.join(repo, "dyalog.chm")
+        write(artifact, "")
+        write_manifest(manifest_file, manifest_of(repo))
+        assert check_manifest(manifest_file, manifest_of(repo), [artifact]) == (True, "inputs unchanged")
+
+        with open(os.path.join(repo, *module), "a", encoding="utf-8") as f:
+            f.write("# Edited\n")
+        assert check_manifest(manifest_file, manifest_of(repo), [artifact]) == (
+            False, f"changed builder: {os.path.join(*module)}"
+        )
+
+
+class TestManifestChanges:
+    """Test describing the differences between manifests."""
+
+    def test_changes(self):
+        """Test that changed, added and removed entries are named, by category, at most three each."""
+        old = {
+            "pages": {"a.md": "1", "b.md": "2", "c.md": "3", "d.md": "4", "e.md": "5"},
+            "images": {"x.png": "1"},
+            "settings": {"toc": True},
+            "nav": {"mkdocs.yml": "1"},
+        }
+        new = {
+            "pages": {"a.md": "9", "b.md": "9", "c.md": "9", "d.md": "9", "f.md": "6"},
+            "images": {},
+            "settings": {"toc": False},
+            "nav": {"mkdocs.yml": "1"},
+            "builder": {"mkdocs2chm.py": "1"},
+        }
+        assert manifest_changes(old, new) == [
+            "builder",  # New: named alone
+            "images: x.png",
+            "pages: a.md, b.md, c.md (+3 more)",
+            "settings: toc",
+        ]
+        assert manifest_changes(new, new) == []
+
+    def test_not_dicts(self):
+        """Test that a category that isn't a dict on both sides is named alone."""
+        assert manifest_changes({"version": 1}, {"version": 2}) == ["version"]
+
+
+class TestCheckManifest:
+    """Test comparing a manifest with the previous build's."""
+
+    def test_check(self, tmp_path):
+        """Test the reasons for rebuilding: a missing artifact, no or a broken manifest, changed inputs."""
+        manifest_file = str(tmp_path / "doc.manifest.json")
+        artifact = str(tmp_path / "doc.pdf")
+        manifest = {"pages": {"a.md": "1"}, "settings": {"toc": True}}
+
+        assert check_manifest(manifest_file, manifest, [artifact]) == (False, "doc.pdf missing")
+        write(artifact, "%PDF")
+        assert check_manifest(manifest_file, manifest, [artifact]) == (False, "no previous manifest")
+        write(manifest_file, "{")
+        assert check_manifest(manifest_file, manifest, [artifact]) == (False, "no previous manifest")
+
+        write_manifest(manifest_file, manifest)
+        assert check_manifest(manifest_file, manifest, [artifact]) == (True, "inputs unchanged")
+        changed = dict(manifest, pages={"a.md": "2"})
+        assert check_manifest(manifest_file, changed, [artifact]) == (False, "changed pages: a.md")
+
+    def test_write(self, tmp_path):
+        """Test that a manifest is written as sorted, indented JSON, and read back the same."""
+        manifest_file = str(tmp_path / "doc.manifest.json")
+        manifest = {"pages": {"b.md": "2", "a.md": "1"}, "builder": {}}
+        write_manifest(manifest_file, manifest)
+        with open(manifest_file, encoding="utf-8") as f:
+            text = f.read()
+        assert json.loads(text) == manifest
+        assert text == json.dumps(manifest, indent=2, sort_keys=True)
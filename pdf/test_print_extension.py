@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Tests for print_extension module: the print transforms, applied on the Markdown tree, must give
+the HTML the BeautifulSoup post-processing they replaced gave. That post-processing is kept here,
+as it was in mkdocs2pdf.py, as the reference.
+"""
+
+import re
+
+import markdown
+import pytest
+from bs4 import BeautifulSoup
+from markdown.extensions.toc import slugify_unicode
+
+from mkdocs2pdf import caption_tables
+from print_extension import PrintExtension
+
+# Representative articles: headings of each kind, tables with captions, footnotes, admonitions,
+# internal links, images and code
+ARTICLES = {
+    "reference": """\
+<h1 class="heading"><span class="name">Reshape</span> <span class="command">R←X⍴Y</span></h1>
+
+`Y` may be any array. See [Shape](shape.md#monadic) and [Rank](#rank).[^1]
+
+<h2 class="example">Examples</h2>
+```apl
+      2 3⍴⍳6
+```
+
+## Rank
+
+!!! note "Migration Level"
+    If `⎕ML≥2`, see [Enlist](enlist.md).[^ml]
+
+Table: Reshape arguments {: #reshape-args }
+
+| X | Y | R |
+|---|---|---|
+| 2 | 3 | 2 3 |
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+![Reshape](../img/reshape.png) and ![Local](./img/local.png)
+
+[^1]: Also known as restructure.
+[^ml]: Migration level, as set by ⎕ML.
+""",
+    "guide": """\
+# Getting Started
+
+Some text with ``empty`` code and a [link](../other/page.md).
+
+## Details
+
+??? info "Expandable"
+    Inside [details](details.md).
+
+### Deeper
+
+<h2 class="example">Example</h2>
+
+#### Deepest
+
+<h1 class="heading"><span class="name">Second</span> <span class="command">⎕SE</span></h1>
+""",
+    "footnote_code": """\
+# Footnotes
+
+Text.[^code]
+
+[^code]: Uses `M` and `N`.
+""",
+}
+
+EXTENSIONS = [
+    "admonition",
+    "attr_list",
+    "footnotes",
+    "md_in_html",
+    "markdown_tables_extended",
+    "pymdownx.details",
+    "toc",
+    "fenced_code",
+]
+
+
+# The post-processing replaced by print_extension.py, as it was in mkdocs2pdf.py
+
+
+def shift_headings(soup: BeautifulSoup, n: int, article_id: str) -> None:
+    headings = soup.find_all(re.compile("^h[1-6]$"))
+    delta = 0
+    for tag in headings:
+        current_level = int(tag.name[1])
+        new_level = min(max(current_level + n + delta, 1), 6)
+        tag.name = f"h{new_level}"
+        if delta == 0:
+            tag.attrs["id"] = f"{article_id}-header"
+        delta = 1
+
+
+def clean_img_src(soup: BeautifulSoup) -> None:
+    for img_tag in soup.find_all("img"):
+        src = img_tag.get("src")
+        if src:
+            img_tag["src"] = src.lstrip("./")
+
+
+def print_footnotes(soup: BeautifulSoup) -> None:
+    footnote_defs = {}
+    for footnote in soup.select("div.footnote ol li"):
+        footnote_id = footnote.get("id")
+        if footnote_id and footnote_id.startswith("fn:"):
+            p_tag = footnote.find("p")
+            footnote_text = "".join(
+                str(c)
+                for c in p_tag.contents
+                if not (c.name == "a" and "footnote-backref" in c.get("class", []))
+            )
+            footnote_defs[footnote_id] = footnote_text.strip()
+    for ref in soup.find_all("sup", id=lambda x: x and x.startswith("fnref:")):
+        footnote_id = ref.find("a").get("href", "").lstrip("#")
+        if footnote_id in footnote_defs:
+            new_span = soup.new_tag("span", **{"class": "footnote"})
+            new_span.string = footnote_defs[footnote_id]
+            ref.replace_with(new_span)
+    footnote_div = soup.find("div", class_="footnote")
+    if footnote_div:
+        footnote_div.decompose()
+
+
+def convert_examples(soup: BeautifulSoup) -> None:
+    for header in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"], class_="example"):
+        p_tag = soup.new_tag("p", **{"class": "example"})
+        p_tag.string = header.string
+        header.replace_with(p_tag)
+
+
+def toc_friendly_headings(soup: BeautifulSoup) -> None:
+    for heading in soup.find_all(class_="heading"):
+        name_span = heading.find("span", class_="name")
+        command_span = heading.find("span", class_="command")
+        if name_span and command_span:
+            heading_container = soup.new_tag("div", **{"class": "heading-container"})
+            new_heading = soup.new_tag(heading.name, **heading.attrs)
+            new_heading.string = name_span.text
+            command_div = soup.new_tag("div", **{"class": "command"})
+            command_div.string = command_span.text
+            heading_container.append(new_heading)
+            heading_container.append(command_div)
+            heading.replace_with(heading_container)
+
+
+def render(md: str, article_id: str, extensions: list) -> str:
+    def custom_slugify(value, separator):
+        return article_id + "-" + slugify_unicode(value, separator)
+
+    return markdown.markdown(
+        md, extensions=EXTENSIONS + extensions, extension_configs={"toc": {"slugify": custom_slugify}}
+    )
+
+
+def render_before(md: str, article_id: str, top_level: bool, depth: int) -> BeautifulSoup:
+    """An article as the BeautifulSoup post-processing made it."""
+    soup = BeautifulSoup(render(md, article_id, []), "html.parser")
+    if top_level:
+        if h1 := soup.find("h1"):
+            h1.decompose()
+    print_footnotes(soup)
+    clean_img_src(soup)
+    convert_examples(soup)
+    html = str(soup).replace("``", "")
+    if not top_level:
+        soup = BeautifulSoup(html, "html.parser")
+        shift_headings(soup, depth, article_id)
+        html = str(soup)
+    soup = BeautifulSoup(f'<section data-chapter-seq="1">{html}</section>', "html.parser")
+    toc_friendly_headings(soup)
+    return soup
+
+
+def render_after(md: str, article_id: str, top_level: bool, depth: int) -> BeautifulSoup:
+    """An article as print_extension.py makes it."""
+    extension = PrintExtension(
+        article_id=article_id,
+        remove_first_heading=top_level,
+        shift_headings=-1 if top_level else depth,
+    )
+    html = render(md, article_id, [extension])
+    return BeautifulSoup(f'<section data-chapter-seq="1">{html}</section>', "html.parser")
+
+
+def normalise(soup: BeautifulSoup) -> str:
+    """The HTML, with the whitespace between elements, which doesn't render, dropped."""
+    caption_tables(soup)
+    return re.sub(r">\s+<", "><", str(BeautifulSoup(str(soup), "html.parser"))).strip()
+
+
+class TestPrintExtension:
+    """Test that the print transforms give the same HTML as before."""
+
+    @pytest.mark.parametrize("name", ["reference", "guide"])
+    @pytest.mark.parametrize("top_level,depth", [(True, 0), (False, 1), (False, 3)])
+    def test_equivalent(self, name, top_level, depth):
+        """Test that an article renders as it did with the BeautifulSoup post-processing."""
+        before = render_before(ARTICLES[name], name, top_level, depth)
+        after = render_after(ARTICLES[name], name, top_level, depth)
+        assert normalise(after) == normalise(before)
+
+    def test_transforms(self):
+        """Test that the transforms being compared did apply."""
+        soup = render_after(ARTICLES["reference"], "reference", False, 1)
+        caption_tables(soup)
+        assert soup.find("div", class_="heading-container").find("h2").get("id") == "reference-header"
+        assert soup.find("div", class_="command").text == "R←X⍴Y"
+        assert [p.text for p in soup.find_all("p", class_="example")] == ["Examples"]
+        assert [span.text for span in soup.find_all("span", class_="footnote")] == [
+            "Also known as restructure.", "Migration level, as set by ⎕ML."
+        ]
+        assert soup.find("div", class_="footnote") is None
+        assert [img["src"] for img in soup.find_all("img")] == ["img/reshape.png", "img/local.png"]
+        assert soup.find("div", class_="admonition").find("a")["href"] == "enlist.md"
+        assert [table.get("id") for table in soup.find_all("table")] == ["reshape-args", None]
+        assert soup.find("caption").text == "Table 1-1: Reshape arguments"
+
+    def test_footnote_code(self):
+        """
+        Test the one documented difference: markup in a footnote used to be escaped into its
+        text, and is now kept.
+        """
+        before = render_before(ARTICLES["footnote_code"], "fn", True, 0)
+        after = render_after(ARTICLES["footnote_code"], "fn", True, 0)
+        assert before.find("span", class_="footnote").decode_contents() == (
+            "Uses &lt;code&gt;M&lt;/code&gt; and &lt;code&gt;N&lt;/code&gt;."
+        )
+        assert after.find("span", class_="footnote").decode_contents() == (
+            "Uses <code>M</code> and <code>N</code>."
+        )
+        for span in before.find_all("span", class_="footnote") + after.find_all("span", class_="footnote"):
+            span.clear()
+        assert normalise(after) == normalise(before)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for source_transforms module.
+"""
+
+import re
+
+import pytest
+
+from source_transforms import (
+    FRONTMATTER_PATTERN,
+    MACRO_PATTERN,
+    SourceTransforms,
+    expand_macro,
+    strip_frontmatter,
+)
+
+LINK_PATTERN = r"\[(?<!!\[)([^]]*)]\(([^)]+)\)"
+
+
+def upper_link(match, state):
+    return f"[{match.group(1).upper()}]({match.group(2)})"
+
+
+def transforms(macros=None):
+    """Macros, links and front matter, as the builders register them."""
+    transforms = SourceTransforms()
+    transforms.register("macros", MACRO_PATTERN, expand_macro(macros or {"v": "20.0"}), in_code=True)
+    transforms.register("links", LINK_PATTERN, upper_link)
+    transforms.register(
+        "frontmatter", FRONTMATTER_PATTERN, strip_frontmatter, flags=re.DOTALL, at_start=True
+    )
+    return transforms
+
+
+class TestFences:
+    """Test that fenced code is left to the in_code rules."""
+
+    @pytest.mark.parametrize("fence", ["```", "~~~", "````"])
+    def test_fenced(self, fence):
+        """Test that links in backtick and tilde fences are kept, and rules resume after the fence."""
+        md = f"[a](a.md)\n\n{fence}apl\n[b](b.md)\n{fence}\n\n[c](c.md)\n"
+        assert transforms().apply(md) == f"[A](a.md)\n\n{fence}apl\n[b](b.md)\n{fence}\n\n[C](c.md)\n"
+
+    def test_indented(self):
+        """Test that a fence indented inside an admonition or list is code too."""
+        md = "!!! note\n    ```\n    [b](b.md)\n    ```\n    [c](c.md)\n"
+        assert transforms().apply(md) == "!!! note\n    ```\n    [b](b.md)\n    ```\n    [C](c.md)\n"
+
+    def test_other_fence(self):
+        """Test that a fence is only closed by the same fence: ~~~ inside ``` is code."""
+        md = "```\n~~~\n[b](b.md)\n~~~\n```\n[c](c.md)\n"
+        assert transforms().apply(md) == "```\n~~~\n[b](b.md)\n~~~\n```\n[C](c.md)\n"
+
+    def test_unclosed(self):
+        """Test that an unclosed fence runs to the end of the page."""
+        md = "[a](a.md)\n```\n[b](b.md)\n\n[c](c.md)\n"
+        assert transforms().apply(md) == "[A](a.md)\n```\n[b](b.md)\n\n[c](c.md)\n"
+
+    def test_inline_code(self):
+        """Test that backticks within a line are not a fence."""
+        md = "Use ```x``` or [a](a.md).\n[b](b.md)\n"
+        assert transforms().apply(md) == "Use ```x``` or [A](a.md).\n[B](b.md)\n"
+
+
+class TestInCode:
+    """Test the rules that apply in code, too."""
+
+    def test_macros_in_fences(self):
+        """Test that macros are expanded inside fences, where other rules are not."""
+        md = "{{ v }}\n```\n{{ v }} [b](b.md)\n```\n"
+        assert transforms().apply(md) == "20.0\n```\n20.0 [b](b.md)\n```\n"
+
+    def test_inside_matches(self):
+        """Test that macros inside another rule's match are expanded before its handler sees it."""
+        md = "[version {{ v }}](v{{ v }}.md)\n"
+        assert transforms().apply(md) == "[VERSION 20.0](v20.0.md)\n"
+
+    def test_unknown_macro(self):
+        """Test that a macro with a dict value is left as it is, and one with no value becomes "None", as before."""
+        md = "{{ nope }} {{ d }}"
+        assert transforms({"d": {"a": 1}}).apply(md) == "None {{ d }}"
+
+
+class TestFrontMatter:
+    """Test rules only tried at the start of the page."""
+
+    def test_at_start(self):
+        """Test that front matter is stripped and kept in the state."""
+        state = {}
+        md = "---\nsearch:\n  exclude: true\n---\n\n# Title {{ v }}\n"
+        assert transforms().apply(md, state) == "# Title 20.0\n"
+        assert state["frontmatter"] == {"search": {"exclude": True}}
+
+    def test_not_at_start(self):
+        """Test that a later --- block is left alone."""
+        state = {}
+        md = "# Title\n\n---\nkey: value\n---\n"
+        assert transforms().apply(md, state) == md
+        assert "frontmatter" not in state
+
+
+class TestHandlers:
+    """Test the handlers' state, and deferred replacements."""
+
+    def test_forward_reference(self):
+        """Test that a callable replacement is resolved once the whole page is scanned."""
+        transforms = SourceTransforms()
+
+        @transforms.rule("ref", r"@ref\((\w+)\)")
+        def ref(match, state):
+            return lambda: f"Table {state['tables'][match.group(1)]}"
+
+        @transforms.rule("caption", r"@caption\((\w+)\)")
+        def caption(match, state):
+            tables = state.setdefault("tables", {})
+            tables[match.group(1)] = len(tables) + 1
+            return f"Table {tables[match.group(1)]}:"
+
+        md = "See @ref(b) and @ref(a).\n\n@caption(a)\n\n@caption(b)\n"
+        assert transforms.apply(md) == "See Table 2 and Table 1.\n\nTable 1:\n\nTable 2:\n"
+
+    def test_first_registered_wins(self):
+        """Test that where two rules match at the same position, the first registered applies."""
+        transforms = SourceTransforms()
+        transforms.register("long", r"ab+", lambda m, s: "<long>")
+        transforms.register("short", r"a", lambda m, s: "<short>")
+        assert transforms.apply("ab a") == "<long> <short>"
+
+    def test_flags(self):
+        """Test that a rule's flags apply to its own pattern only."""
+        transforms = SourceTransforms()
+        transforms.register("any", r"x", lambda m, s: "y", flags=re.IGNORECASE)
+        transforms.register("lower", r"q", lambda m, s: "r")
+        assert transforms.apply("xXqQ") == "yyrQ"
+
+
+class TestRegister:
+    """Test the checks made when rules are registered."""
+
+    def test_duplicate_name(self):
+        """Test that a name may only be registered once."""
+        transforms = SourceTransforms()
+        transforms.register("links", LINK_PATTERN, upper_link)
+        with pytest.raises(ValueError, match="already registered"):
+            transforms.register("links", r"x", upper_link)
+
+    @pytest.mark.parametrize("flags", [re.ASCII, re.LOCALE | re.IGNORECASE])
+    def test_unsupported_flags(self, flags):
+        """Test that only flags which can be scoped to a rule's pattern are accepted."""
+        transforms = SourceTransforms()
+        with pytest.raises(ValueError, match="unsupported flags"):
+            transforms.register("x", r"x", upper_link, flags=flags)
+
+    def test_conflicting_groups(self):
+        """Test that rules sharing a group name can't be combined."""
+        transforms = SourceTransforms()
+        transforms.register("a", r"a(?P<x>1)", upper_link)
+        transforms.register("b", r"b(?P<x>2)", upper_link)
+        with pytest.raises(ValueError, match="cannot combine"):
+            transforms.apply("a1")
@@ -1,23 +1,451 @@
 #!/usr/bin/env python3
 """
 Spider the deployed Dyalog documentation and verify that all internal links work.
+
+The crawl is breadth first, from the pages in the home page's navigation: a pool
+of worker tasks takes pages from a bounded queue, checks their links, and adds
+the pages they link to to the frontier, down to --max-depth links away.
+
+Links are checked with HEAD requests, falling back to GET where the server
+doesn't allow HEAD. Each URL's status and validators (ETag, Last-Modified), and
+the links found in each page, are kept in a cache file between runs, and requests
+are made conditional on the URL having changed, so that a crawl of an unchanged
+site downloads next to nothing.
+
+Links are extracted with lxml where it's installed (see --parser), and only from
+the parts of each page that matter: the navigation and the main content.
+
+The ids of the elements of each page are collected as its links are extracted,
+and once the crawl is done, the #fragment of each link to a page crawled is
+checked against them, without any further requests.
+
+With --sitemap, the crawl is seeded from the site's sitemap too (sitemap.xml.gz or
+sitemap.xml, streamed and parsed as it arrives), so that every page is checked,
+and the pages in the sitemap that no link leads to, and those linked to but
+missing from the sitemap, are reported.
+
+The state of the crawl is checkpointed to a file every so often, and when the
+crawl is interrupted; --resume continues from it, reusing the results so far.
+
+With --site-dir, a site built locally is checked instead, without any requests,
+as if it were deployed at the base URL.
+
+Pages are parsed in a pool of --workers processes, leaving the event loop to the
+--max-concurrent requests.
+
+With --external, the links to other sites found in the pages are checked too,
+once the crawl is done, politely: see check_external_links.py.
+
+Each request's time, time to first byte, size and retries (see --retries) are
+recorded, and summarised at the end: latency percentiles per subsite, the slowest
+and largest pages, and the requests per second achieved. --telemetry exports the
+requests to a CSV or JSON file.
 """
 
 import argparse
 import asyncio
+import csv
+import hashlib
+import json
+import math
+import os
+import posixpath
+import time
+import zlib
 import aiohttp
-from urllib.parse import urljoin, urlparse, urlunparse
-from bs4 import BeautifulSoup
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urljoin, urlparse, urlunparse
 from collections import defaultdict
 from datetime import datetime
+from typing import NamedTuple, Optional, Union
 import sys
 
+# Add the utils directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from doc_utils import HTMLLinkExtractor, LinkScope
+from check_external_links import USER_AGENT, ExternalLinkChecker, is_external_link
+
+
+class CheckpointError(Exception):
+    """A checkpoint that can't be resumed from."""
+
+
+class ProbeCache:
+    """
+    What was learned about each URL on earlier runs: its status, the validators
+    (ETag, Last-Modified) to make conditional requests with, and for pages, the
+    links found in them. Kept in a JSON file between runs.
+    """
+
+    # Bump when link extraction changes, so that cached links are found again
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data["urls"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def put(self, url, status, headers, **extra):
+        """
+        Record a full response to url. What was learned from earlier responses is
+        kept if the validators show it's the same version of the resource.
+        """
+        entry = {"status": status}
+        if "ETag" in headers:
+            entry["etag"] = headers["ETag"]
+        if "Last-Modified" in headers:
+            entry["last_modified"] = headers["Last-Modified"]
+        old = self.entries.get(url)
+        if old and len(entry) > 1 and all(
+            old.get(key) == entry.get(key) for key in ("status", "etag", "last_modified")
+        ):
+            entry = old
+        entry.update(extra)
+        self.entries[url] = entry
+
+    def conditional_headers(self, url, need=None):
+        """
+        Headers making a request for url conditional on it having changed, if it
+        was seen before (and what was learned includes `need`).
+        """
+        entry = self.entries.get(url)
+        if not entry or (need and need not in entry):
+            return {}
+        headers = {}
+        if "etag" in entry:
+            headers["If-None-Match"] = entry["etag"]
+        if "last_modified" in entry:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def save(self):
+        temp_file = f"{self.path}.{os.getpid()}"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "urls": self.entries}, f)
+        os.replace(temp_file, self.path)
+
+
+class SiteDir:
+    """
+    A built site on disk, standing in for the deployed one. URLs under the base
+    URL map to its files, a directory's URL to its index.html.
+
+    The directory may be a plain mkdocs build of the base URL, or a checkout of the
+    site deployed with mike, holding a directory per version and versions.json: the
+    base URL then ends with a version or one of its aliases, such as "latest".
+    """
+
+    def __init__(self, path, base_url):
+        self.path = os.path.abspath(path)
+        base_path = urlparse(base_url).path.rstrip("/")
+        self.aliases = {}
+        try:
+            with open(os.path.join(self.path, "versions.json"), "r", encoding="utf-8") as f:
+                for version in json.load(f):
+                    self.aliases[version["version"]] = version["version"]
+                    for alias in version.get("aliases", []):
+                        self.aliases[alias] = version["version"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        # The URL path of the directory
+        if self.aliases and base_path.rsplit("/", 1)[-1] in self.aliases:
+            self.url_path = base_path.rsplit("/", 1)[0] + "/"
+        else:
+            self.url_path = base_path + "/"
+
+    def resolve(self, url):
+        """The file a URL is served from, or None if there is none."""
+        path = unquote(urlparse(url).path)
+        if path + "/" == self.url_path:
+            path += "/"
+        if not path.startswith(self.url_path):
+            return None
+        parts = [part for part in path[len(self.url_path):].split("/") if part]
+        if parts and parts[0] in self.aliases:
+            parts[0] = self.aliases[parts[0]]
+        if ".." in parts:
+            return None
+        file_path = os.path.join(self.path, *parts)
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, "index.html")
+        return file_path if os.path.isfile(file_path) else None
+
+
+class RequestRecord(NamedTuple):
+    """A request made, as kept by Telemetry."""
+    url: str
+    method: str
+    status: Union[int, str]  # The status, or the error the request failed with
+    started: float  # Seconds into the crawl
+    seconds: float  # Until the response was read
+    ttfb: Optional[float]  # Until the response headers arrived
+    size: int  # Bytes of the body read
+    retries: int  # Attempts before this one
+
+
+class Telemetry:
+    """
+    The timings and sizes of the requests made, for a report of how the site
+    performed under the crawl.
+    """
+
+    PERCENTILES = (50, 90, 99)
+    FIELDS = RequestRecord._fields + ("subsite",)
+
+    def __init__(self, base_url, is_page=None):
+        self.base_url = base_url.rstrip("/")
+        # Whether a URL is of a page, rather than a file; by default, all are
+        self.is_page = is_page or (lambda url: True)
+        self.start()
+
+    def start(self):
+        """Start (again) with no requests."""
+        self.requests = []
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, url, method, status, started, ttfb, size, retries):
+        """Record a request that began at started (by time.monotonic) and has just ended."""
+        now = time.monotonic()
+        self.requests.append(RequestRecord(
+            url, method, status, started - self.started, now - started, ttfb, size, retries
+        ))
+
+    def stop(self):
+        self.finished = time.monotonic()
+
+    def subsite(self, url):
+        """The subsite a URL is in: the first directory under the base URL, or root."""
+        if not url.startswith(self.base_url + "/"):
+            return urlparse(url).netloc
+        parts = url[len(self.base_url) + 1:].split("/", 1)
+        return parts[0] if len(parts) > 1 else "root"
+
+    @staticmethod
+    def percentile(values, p):
+        """The p-th percentile of sorted values, by nearest rank."""
+        return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+    def summary(self, top=10):
+        """The requests, summarised; times are in seconds, sizes in bytes."""
+        elapsed = (self.finished or time.monotonic()) - self.started
+        by_subsite = defaultdict(list)
+        for request in self.requests:
+            by_subsite[self.subsite(request.url)].append(request)
+        subsites = {}
+        for name, requests in sorted(by_subsite.items()):
+            seconds = sorted(request.seconds for request in requests)
+            ttfbs = sorted(request.ttfb for request in requests if request.ttfb is not None)
+            stats = {"requests": len(requests)}
+            for p in self.PERCENTILES:
+                stats[f"p{p}"] = self.percentile(seconds, p)
+            stats["max"] = seconds[-1]
+            stats["ttfb_p50"] = self.percentile(ttfbs, 50) if ttfbs else None
+            subsites[name] = stats
+        # Pages are the GETs whose bodies were read
+        pages = {}
+        for request in self.requests:
+            if request.method == "GET" and request.size and self.is_page(request.url):
+                pages[request.url] = request
+        return {
+            "requests": len(self.requests),
+            "seconds": elapsed,
+            "requests_per_second": len(self.requests) / elapsed if elapsed else 0.0,
+            "bytes": sum(request.size for request in self.requests),
+            "retries": sum(request.retries for request in self.requests),
+            "errors": sum(isinstance(request.status, str) for request in self.requests),
+            "subsites": subsites,
+            "slowest": [
+                {"url": request.url, "seconds": request.seconds}
+                for request in sorted(pages.values(), key=lambda r: -r.seconds)[:top]
+            ],
+            "largest": [
+                {"url": request.url, "size": request.size}
+                for request in sorted(pages.values(), key=lambda r: -r.size)[:top]
+            ],
+        }
+
+    def print_report(self, top=10, file=sys.stderr):
+        summary = self.summary(top)
+        print(
+            f"\n[{datetime.now().strftime('%H:%M:%S')}] Requests: {summary['requests']} in "
+            f"{summary['seconds']:.1f}s ({summary['requests_per_second']:.1f}/s), "
+            f"{summary['bytes'] / 1024:.0f} KiB, {summary['retries']} retries, "
+            f"{summary['errors']} errors",
+            file=file,
+        )
+        if not summary["requests"]:
+            return
+        columns = [f"p{p}" for p in self.PERCENTILES] + ["max", "ttfb_p50"]
+        width = max(len(name) for name in summary["subsites"])
+        print(
+            f"  {'Latency (ms)':<{width}} {'requests':>8} "
+            + " ".join(f"{column:>8}" for column in columns),
+            file=file,
+        )
+        for name, stats in summary["subsites"].items():
+            times = " ".join(
+                f"{stats[column] * 1000:8.0f}" if stats[column] is not None else f"{'-':>8}"
+                for column in columns
+            )
+            print(f"  {name:<{width}} {stats['requests']:>8} {times}", file=file)
+        print("  Slowest pages:", file=file)
+        for page in summary["slowest"]:
+            print(f"    {page['seconds'] * 1000:8.0f} ms  {page['url']}", file=file)
+        print("  Largest pages:", file=file)
+        for page in summary["largest"]:
+            print(f"    {page['size'] / 1024:8.1f} KiB {page['url']}", file=file)
+
+    def export(self, path):
+        """Write the requests to path: JSON, with the summary, if it ends in .json, else CSV."""
+        rows = [dict(request._asdict(), subsite=self.subsite(request.url))
+                for request in self.requests]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if path.lower().endswith(".json"):
+                json.dump({"summary": self.summary(), "requests": rows}, f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+
+
+class Response(NamedTuple):
+    """What LinkChecker.request keeps of a response."""
+    status: int
+    headers: dict
+    content_type: str
+    charset: Optional[str]
+    body: Optional[bytes]  # None unless read
+
+
+class SitemapParser:
+    """
+    An incremental parser of a sitemap, or a sitemap index, gzipped or not: feed
+    it the bytes as they arrive, and the URLs it lists are collected, without
+    keeping the whole document.
+    """
+
+    def __init__(self):
+        self.decompressor = None
+        self.head = b""  # The first bytes, until it's known whether they're gzipped
+        self.parser = ElementTree.XMLPullParser(events=("end",))
+        self.loc = None
+        self.urls = []  # Pages listed
+        self.sitemaps = []  # Sitemaps listed, by a sitemap index
+
+    def feed(self, data):
+        if self.head is not None:
+            data = self.head + data
+            if len(data) < 2:
+                self.head = data
+                return
+            self.head = None
+            if data[:2] == b"\x1f\x8b":
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self.decompressor:
+            data = self.decompressor.decompress(data)
+        self.parser.feed(data)
+        self.read_events()
+
+    def close(self):
+        if self.head:
+            self.parser.feed(self.head)
+        if self.decompressor:
+            self.parser.feed(self.decompressor.flush())
+        self.parser.close()
+        self.read_events()
+
+    def read_events(self):
+        for _, element in self.parser.read_events():
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "loc":
+                self.loc = (element.text or "").strip()
+            elif tag in ("url", "sitemap"):
+                if self.loc:
+                    (self.urls if tag == "url" else self.sitemaps).append(self.loc)
+                self.loc = None
+                element.clear()
+
+
+def _extract_hrefs(parser, kind, html=None, file_path=None):
+    """
+    The hrefs of a page, and the ids of its elements (see LinkChecker.extract_hrefs),
+    given its HTML, or the file of a SiteDir it is in. Runs in a worker process.
+    """
+    if html is None:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+    return LinkChecker.extract_hrefs(kind, html, parser)
+
 
 class LinkChecker:
-    def __init__(self, base_url, max_concurrent=5, output_file="broken_links.txt"):
+    # Pages waiting for a worker; the rest of the frontier waits as URLs
+    QUEUE_SIZE = 100
+    # Statuses of requests worth retrying
+    RETRY_STATUSES = (429, 502, 503, 504)
+    # Seconds before the first retry; doubled for each after it
+    RETRY_DELAY = 0.5
+    # Bump when the checkpointed state changes
+    CHECKPOINT_VERSION = 2
+    # Seconds between checkpoints
+    CHECKPOINT_INTERVAL = 30
+    # Extensions of pages to crawl, as well as directory URLs
+    PAGE_EXTENSIONS = ("", ".html", ".htm")
+    # Where the links to pages are: the navigation, and the first <main>, or
+    # failing that, the first div.md-content
+    NAV_SCOPES = (
+        LinkScope(frozenset({"nav", "div"}), frozenset({"md-nav", "md-sidebar"})),
+        LinkScope(frozenset({"main"}), first=True),
+        LinkScope(frozenset({"div"}), frozenset({"md-content"}), first=True),
+    )
+    # Where the links to check are: the first <article>, <main> or div.md-content,
+    # in that order of preference, or the whole page
+    CONTENT_SCOPES = (
+        LinkScope(frozenset({"article"}), first=True),
+        LinkScope(frozenset({"main"}), first=True),
+        LinkScope(frozenset({"div"}), frozenset({"md-content"}), first=True),
+        LinkScope(),
+    )
+
+    def __init__(
+        self,
+        base_url,
+        max_concurrent=5,
+        output_file="broken_links.txt",
+        cache_file=None,
+        site_dir=None,
+        workers=None,
+        max_depth=None,
+        parser=None,
+        sitemap=None,
+        retries=0,
+        checkpoint_file=None,
+        resume=False,
+        external=None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.max_concurrent = max_concurrent
-        self.pages = set()  # All pages found in navigation
+        self.pages = set()  # All pages found, to crawl
+        # How many content links from the navigation to follow; None for no limit
+        self.max_depth = max_depth
+        # Pages found and not yet queued for a worker, as (url, depth)
+        self.frontier = deque()
+        # Pages queued for or being processed by a worker, as (url, depth)
+        self.pages_in_flight = set()
+        self.frontier_changed = None
+        self.last_progress = 0
         self.checked_links = {}  # Map of link -> (is_valid, status)
         self.broken_links = defaultdict(
             set
@@ -29,6 +457,48 @@ class LinkChecker:
         self.problematic_pages = set()  # Pages with broken links
         # Open file for immediate writing
         self.output_handle = None
+        # Results of earlier runs, for conditional requests
+        self.cache = ProbeCache(cache_file) if cache_file else None
+        # A built site to check instead of the deployed one
+        self.site = SiteDir(site_dir, self.base_url) if site_dir else None
+        # How many processes to parse pages in, apart from the requests
+        # (max_concurrent): None for one per CPU, 0 to parse in the event loop
+        self.workers = workers
+        self.executor = None
+        # The HTML parser backend; see HTMLLinkExtractor
+        self.parser = parser
+        # Map of (kind, hash of a page) -> its (hrefs, ids), to parse identical
+        # pages once, as shared by the checkers of the versions of a site; or None
+        self.parsed = None
+        self.parses_reused = 0
+        self.label = None  # Shown with the progress, if set
+        # The sitemap to seed the crawl from: a URL, "auto" for the site's own, or None
+        self.sitemap = sitemap
+        self.sitemap_pages = None  # Pages listed in the sitemap, once read
+        self.sitemap_outside = 0  # URLs in the sitemap outside the base URL
+        self.linked_pages = set()  # Pages found by following links
+        self.good_pages = set()  # Pages processed without failing
+        # How many times to retry a request that failed for want of a response
+        # (or with a status in RETRY_STATUSES)
+        self.retries = retries
+        self.telemetry = Telemetry(self.base_url, self.is_page_url)
+        # Where to checkpoint the crawl, and whether to resume from the checkpoint
+        self.checkpoint_file = checkpoint_file
+        self.resume = resume
+        self.resumed = False
+        self.last_checkpoint = 0
+        self.crawl_started = False
+        self.crawl_complete = False
+        # The ExternalLinkChecker to check links to other sites with, or None not to
+        self.external = external
+        self.external_links = defaultdict(set)  # Map of external link -> pages with it
+        self.external_results = {}  # Map of external link -> (is_valid, status)
+        self.page_ids = {}  # Map of page fetched -> ids its fragments can be
+        # Map of (link, fragment) -> pages linking to it, and of links with a
+        # fragment that names nothing in the page -> pages linking to them
+        self.fragment_links = defaultdict(set)
+        self.broken_fragments = defaultdict(set)
+        self.unverified_fragments = 0  # Of links to pages not fetched
 
     def normalize_url(self, url):
         """Normalise a URL by removing fragments and ensuring consistent format."""
@@ -45,92 +515,84 @@ class LinkChecker:
         """Check if a URL is internal to the documentation site."""
         return url.startswith(self.base_url)
 
-    def extract_navigation_pages(self, html):
-        """Extract all pages from the MkDocs navigation structure."""
-        soup = BeautifulSoup(html, "html.parser")
-        pages = set()
-
-        # Find all navigation links
-        nav_areas = soup.find_all(["nav", "div"], class_=["md-nav", "md-sidebar"])
-
-        for nav in nav_areas:
-            # Find all links within navigation
-            for link in nav.find_all("a", href=True):
-                href = link["href"]
-                if not href.startswith(("#", "javascript:", "mailto:", "tel:")):
-                    absolute_url = urljoin(self.base_url + "/", href)
-                    if self.is_internal_link(absolute_url):
-                        normalized = self.normalize_url(absolute_url)
-                        pages.add(normalized)
-
-        # Also get links from the main content area to catch any we missed
-        content = soup.find("main") or soup.find("div", class_="md-content")
-        if content and hasattr(content, "find_all"):
-            for link in content.find_all("a", href=True):
-                href = link["href"]
-                if not href.startswith(("#", "javascript:", "mailto:", "tel:")):
-                    absolute_url = urljoin(self.base_url + "/", href)
-                    if self.is_internal_link(absolute_url):
-                        normalized = self.normalize_url(absolute_url)
-                        pages.add(normalized)
-
-        return pages
-
-    def extract_all_links(self, url, html):
-        """Extract all links from an HTML page."""
-        soup = BeautifulSoup(html, "html.parser")
-        links = set()
-
-        # Find the main content area (skip navigation)
-        content = (
-            soup.find("article")
-            or soup.find("main")
-            or soup.find("div", class_="md-content")
+    @classmethod
+    def extract_hrefs(cls, kind, html, parser=None):
+        """
+        The hrefs of the links in a page that matter to kind (see extract_links),
+        and the ids of its elements, with the given HTML parser backend.
+        """
+        if kind == "nav":
+            # All pages from the MkDocs navigation structure
+            (nav_links, main_links, content_links), ids = (
+                HTMLLinkExtractor.extract_scoped_links_and_ids(html, cls.NAV_SCOPES, parser)
+            )
+            # Also get links from the main content area to catch any we missed
+            if main_links is None:
+                main_links = content_links
+            return (nav_links or []) + (main_links or []), ids
+        # Links in the main content area (skip navigation), or failing that, the whole page
+        scoped_links, ids = HTMLLinkExtractor.extract_scoped_links_and_ids(
+            html, cls.CONTENT_SCOPES, parser
         )
+        return next(links for links in scoped_links if links is not None), ids
 
-        if not content:
-            # Fallback to the whole page
-            content = soup
-
-        # Find all anchor tags in the content area only
-        if hasattr(content, "find_all"):
-            for tag in content.find_all("a", href=True):
-                href = tag["href"]
+    def resolve_links(self, kind, url, hrefs):
+        """The links of the given kind (see extract_links) with hrefs, in the page at url."""
+        if kind == "nav":
+            return self.internal_urls(self.base_url + "/", hrefs)
+        return self.internal_urls(url, hrefs, external=kind == "all", fragments=True)
 
-                # Skip fragments-only links
-                if href.startswith("#"):
-                    continue
+    def internal_urls(self, url, hrefs, external=False, fragments=False):
+        """
+        The normalised absolute URLs of the internal links among hrefs, relative to
+        url, and of the links to other sites if external. Internal links keep their
+        fragments if fragments is set, links to the same page included.
+        """
+        urls = set()
+        for href in hrefs:
+            # Skip fragment-only links, unless keeping fragments, and special protocols
+            if href.startswith(("javascript:", "mailto:", "tel:")) or (
+                href.startswith("#") and not (fragments and len(href) > 1)
+            ):
+                continue
 
-                # Skip special protocols
-                if href.startswith(("javascript:", "mailto:", "tel:")):
-                    continue
+            # Convert relative URLs to absolute
+            absolute_url = urljoin(url, href)
 
-                # Convert relative URLs to absolute
-                absolute_url = urljoin(url, href)
+            # Only process internal links, unless external
+            if self.is_internal_link(absolute_url):
+                fragment = urlparse(absolute_url).fragment if fragments else ""
+                urls.add(self.normalize_url(absolute_url) + (f"#{fragment}" if fragment else ""))
+            elif external and is_external_link(absolute_url):
+                urls.add(self.normalize_url(absolute_url))
+        return urls
 
-                # Only process internal links
-                if self.is_internal_link(absolute_url):
-                    normalized = self.normalize_url(absolute_url)
-                    links.add(normalized)
-
-        return links
+    def extract_links(self, kind, url, html):
+        """
+        The links of a page, and the ids of its elements: "nav" for the navigation
+        pages, "links" for the internal links, with their fragments, "all" for
+        those and the links to other sites.
+        """
+        hrefs, ids = self.extract_hrefs(kind, html, self.parser)
+        return self.resolve_links(kind, url, hrefs), ids
 
     async def check_url(self, session, url):
-        """Check if a URL is accessible."""
+        """
+        Check if a URL is accessible. Asks for the headers only, unless the server
+        doesn't allow HEAD, and only for a URL that has changed since it was last
+        checked, if the cache knows it.
+        """
         # Return cached result if we already checked this URL
         if url in self.checked_links:
             return url, self.checked_links[url][0], self.checked_links[url][1]
 
         async with self.semaphore:
             try:
-                # First try GET (more reliable than HEAD for some servers)
-                async with session.get(
-                    url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=5)
-                ) as response:
-                    # Consider any 2xx or 3xx status as valid (including redirects)
-                    is_valid = response.status < 400
-                    self.checked_links[url] = (is_valid, response.status)
-                    return url, is_valid, response.status
+                status = await self.probe(session, url)
+                # Consider any 2xx or 3xx status as valid (including redirects)
+                is_valid = status < 400
+                self.checked_links[url] = (is_valid, status)
+                return url, is_valid, status
             except asyncio.TimeoutError:
                 self.checked_links[url] = (False, "Timeout")
                 return url, False, "Timeout"
@@ -139,63 +601,236 @@ class LinkChecker:
                 self.checked_links[url] = (False, error_msg)
                 return url, False, error_msg
 
-    async def process_page(self, session, page_url):
-        """Fetch a page and check all its links."""
+    async def probe(self, session, url):
+        """The status of a URL, following redirects: HEAD first, then GET if need be."""
+        if self.site:
+            return 200 if self.site.resolve(url) else 404
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+        response = await self.request(session, "HEAD", url, 5, headers)
+        if response.status in (405, 501):
+            # HEAD not allowed or not implemented: the status of a GET, unread
+            response = await self.request(session, "GET", url, 5, headers)
+        status, response_headers = response.status, response.headers
+
+        if self.cache:
+            if status == 304 and headers:
+                return self.cache.get(url)["status"]
+            self.cache.put(url, status, response_headers)
+        return status
+
+    async def fetch_links(self, session, url, kind, timeout):
+        """
+        GET a page and extract its links of the given kind (see extract_links), or
+        reuse the links extracted last time, if the page hasn't changed since.
+        Returns (status, links); links is None for a failed request. The ids of
+        the page's elements are kept in page_ids.
+        """
+        if self.site:
+            file_path = self.site.resolve(url)
+            if file_path is None:
+                return 404, None
+            links, self.page_ids[url] = await self.parse_links(kind, url, file_path=file_path)
+            return 200, links
+
+        key = kind
+        headers = self.cache.conditional_headers(url, need=key) if self.cache else {}
+        async with self.semaphore:
+            response = await self.request(
+                session, "GET", url, timeout, headers,
+                read=lambda response: response.status < 400 and "html" in response.content_type,
+            )
+        if response.status == 304 and headers:
+            cached = self.cache.get(url)
+            self.page_ids[url] = set(cached["ids"])
+            return cached["status"], set(cached[key])
+        if response.status >= 400:
+            return response.status, None
+        if response.body is None:
+            # A file linked to, such as a PDF: no links to follow
+            return response.status, set()
+        html = response.body.decode(response.charset or "utf-8", errors="replace")
+        status, response_headers = response.status, response.headers
+
+        # Parse outside the semaphore: requests needn't wait for it
+        links, self.page_ids[url] = await self.parse_links(kind, url, html=html)
+        if self.cache:
+            self.cache.put(
+                url, status, response_headers,
+                **{key: sorted(links), "ids": sorted(self.page_ids[url])},
+            )
+        return status, links
+
+    async def request(self, session, method, url, timeout, headers=None, read=None):
+        """
+        Make a request, following redirects, and retrying it if it fails for want
+        of a response, or with a status worth retrying, up to self.retries times.
+        The body is read only if read(response) says so. Each attempt is recorded
+        in self.telemetry.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+            started = time.monotonic()
+            try:
+                async with session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    allow_redirects=True,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as response:
+                    ttfb = time.monotonic() - started
+                    body = await response.read() if read and read(response) else None
+                    self.telemetry.record(
+                        url, method, response.status, started, ttfb,
+                        len(body) if body is not None else 0, attempt,
+                    )
+                    if response.status in self.RETRY_STATUSES and attempt < self.retries:
+                        continue
+                    return Response(
+                        response.status, response.headers, response.content_type,
+                        response.charset, body,
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.telemetry.record(
+                    url, method, type(e).__name__, started, None, 0, attempt
+                )
+                if attempt == self.retries:
+                    raise
+
+    async def parse_links(self, kind, url, html=None, file_path=None):
+        """
+        Extract the links of a page, and the ids of its elements (see
+        extract_links), from its HTML or file.
+        """
+        hrefs, ids = await self.parse_hrefs(kind, html, file_path)
+        return self.resolve_links(kind, url, hrefs), ids
+
+    async def parse_hrefs(self, kind, html=None, file_path=None):
+        """
+        The hrefs and ids of a page (see extract_hrefs), from its HTML or file,
+        parsed in the process pool, so that the event loop is free for requests
+        meanwhile; without a pool, in the event loop. A page identical to one
+        parsed before, by any checker sharing self.parsed, isn't parsed again.
+        """
+        key = None
+        if self.parsed is not None:
+            if html is None:
+                with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                    html = f.read()
+            key = (kind, hashlib.sha1(html.encode("utf-8", errors="replace")).digest())
+            if key in self.parsed:
+                self.parses_reused += 1
+                return self.parsed[key]
+        args = (self.parser, kind, html, file_path)
+        if self.executor is None:
+            result = _extract_hrefs(*args)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, _extract_hrefs, *args
+            )
+        if key is not None:
+            self.parsed[key] = result
+        return result
+
+    def is_page_url(self, url):
+        """Whether an internal URL is of a page to crawl, rather than a file."""
+        return posixpath.splitext(urlparse(url).path)[1].lower() in self.PAGE_EXTENSIONS
+
+    def add_pages(self, urls, depth, linked=True):
+        """
+        Add the pages at urls not seen before to the frontier, unless too deep.
+        linked is whether they were found by following links.
+        """
+        if linked:
+            self.linked_pages.update(url for url in urls if self.is_page_url(url))
+        if self.max_depth is not None and depth > self.max_depth:
+            return
+        for url in sorted(urls):
+            if url not in self.pages and self.is_page_url(url):
+                self.pages.add(url)
+                self.frontier.append((url, depth))
+        self.frontier_changed.set()
+
+    async def process_page(self, session, page_url, depth=0):
+        """
+        Fetch a page and check all its links. The pages it links to that exist
+        are added to the frontier, one level deeper.
+        """
         try:
-            async with session.get(
-                page_url, timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status < 400:
-                    html = await response.text()
-
-                    # Extract links from this page
-                    links = self.extract_all_links(page_url, html)
-
-                    # Check each link
-                    link_tasks = []
-                    for link in links:
-                        # Only check internal links we haven't checked before
-                        if link not in self.checked_links:
-                            link_tasks.append(self.check_url(session, link))
-
-                    # Check all links for this page
-                    if link_tasks:
-                        results = await asyncio.gather(
-                            *link_tasks, return_exceptions=True
-                        )
-                        for result in results:
-                            if isinstance(result, Exception):
-                                continue
-                            if isinstance(result, tuple) and len(result) == 3:
-                                url, is_valid, status = result
-                                if not is_valid and url in links:
-                                    self.broken_links[url].add(page_url)
-
-                    # Also record any previously checked broken links
-                    for link in links:
-                        if (
-                            link in self.checked_links
-                            and not self.checked_links[link][0]
-                        ):
-                            self.broken_links[link].add(page_url)
-
-                    self.pages_processed += 1
-                    broken_count = len([l for l in links if l in self.broken_links])
-                    if broken_count > 0:
-                        self.problematic_pages.add(page_url)
-                        # Write immediately to file
-                        if self.output_handle:
-                            self.output_handle.write(f"{page_url}\n")
-                            self.output_handle.flush()
-                    return True
-                else:
-                    self.pages_failed += 1
+            # Extract links from this page
+            status, links = await self.fetch_links(
+                session, page_url, "all" if self.external else "links", timeout=10
+            )
+            if links is not None:
+                # The page was just fetched: links to it, from itself or later pages, need no HEAD
+                self.checked_links.setdefault(page_url, (True, status))
+            if links is not None and self.external:
+                # Links to other sites are checked once the crawl is done
+                for link in links:
+                    if not self.is_internal_link(link):
+                        self.external_links[link].add(page_url)
+                links = {link for link in links if self.is_internal_link(link)}
+            if links is not None:
+                # Fragments are checked once the crawl is done, and the pages known
+                targets = set()
+                for link in links:
+                    target, _, fragment = link.partition("#")
+                    targets.add(target)
+                    if fragment:
+                        self.fragment_links[(target, fragment)].add(page_url)
+                links = targets
+                # Check each link
+                link_tasks = []
+                for link in links:
+                    # Only check internal links we haven't checked before
+                    if link not in self.checked_links:
+                        link_tasks.append(self.check_url(session, link))
+
+                # Check all links for this page
+                if link_tasks:
+                    results = await asyncio.gather(
+                        *link_tasks, return_exceptions=True
+                    )
+                    for result in results:
+                        if isinstance(result, Exception):
+                            continue
+                        if isinstance(result, tuple) and len(result) == 3:
+                            url, is_valid, status = result
+                            if not is_valid and url in links:
+                                self.broken_links[url].add(page_url)
+
+                # Also record any previously checked broken links
+                for link in links:
+                    if (
+                        link in self.checked_links
+                        and not self.checked_links[link][0]
+                    ):
+                        self.broken_links[link].add(page_url)
+
+                self.add_pages(
+                    [link for link in links if self.checked_links.get(link, (False,))[0]],
+                    depth + 1,
+                )
+
+                self.pages_processed += 1
+                self.good_pages.add(page_url)
+                broken_count = len([l for l in links if l in self.broken_links])
+                if broken_count > 0:
                     self.problematic_pages.add(page_url)
-                    # Write failed pages too
+                    # Write immediately to file
                     if self.output_handle:
                         self.output_handle.write(f"{page_url}\n")
                         self.output_handle.flush()
-                    return False
+                return True
+            else:
+                self.pages_failed += 1
+                self.problematic_pages.add(page_url)
+                # Write failed pages too
+                if self.output_handle:
+                    self.output_handle.write(f"{page_url}\n")
+                    self.output_handle.flush()
+                return False
         except Exception:
             self.pages_failed += 1
             self.problematic_pages.add(page_url)
@@ -206,79 +841,379 @@ class LinkChecker:
             return False
 
     async def spider(self):
-        """Spider the documentation starting from the base URL."""
-        # Open output file for writing
-        self.output_handle = open(self.output_file, "w")
+        """
+        Spider the documentation starting from the base URL, or carry on from the
+        checkpoint, if resuming. Raises CheckpointError for a checkpoint of another crawl.
+        """
+        if self.resume and self.checkpoint_file:
+            self.resumed = self.load_checkpoint()
+            if not self.resumed:
+                print(
+                    f"[{datetime.now().strftime('%H:%M:%S')}] No checkpoint to resume from, starting afresh",
+                    file=sys.stderr,
+                )
+        # Open output file for writing, after the pages written before if resuming
+        self.output_handle = open(self.output_file, "a" if self.resumed else "w")
 
+        self.telemetry.start()
+        # Pages are parsed in a pool of processes, unless there are to be none
+        if self.workers != 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
         try:
+            if self.site:
+                # No requests: pages are read from disk
+                await self.run(None)
+                return
+
             # Create a session with custom headers
             connector = aiohttp.TCPConnector(limit=100)
-            headers = {
-                "User-Agent": "Mozilla/5.0 (compatible; Dyalog Documentation Link Checker)"
-            }
-
             async with aiohttp.ClientSession(
-                connector=connector, headers=headers
+                connector=connector, headers={"User-Agent": USER_AGENT}
             ) as session:
-                # First, get the home page and extract all navigation pages
-                start_url = self.base_url
-                if not start_url.endswith("/"):
-                    start_url += "/"
+                await self.run(session)
+        finally:
+            self.telemetry.stop()
+            if self.executor:
+                self.executor.shutdown()
+                self.executor = None
+            # Always close the file
+            if self.output_handle:
+                self.output_handle.close()
+            # Keep what was learned, even from an interrupted run
+            if self.cache:
+                self.cache.save()
+            if self.checkpoint_file:
+                if self.crawl_complete:
+                    if os.path.exists(self.checkpoint_file):
+                        os.remove(self.checkpoint_file)
+                elif self.crawl_started:
+                    self.save_checkpoint()
 
-                # Fetch navigation structure
-                print(
-                    f"[{datetime.now().strftime('%H:%M:%S')}] Fetching navigation structure...",
-                    file=sys.stderr,
-                )
-                try:
-                    async with session.get(
-                        start_url, timeout=aiohttp.ClientTimeout(total=30)
-                    ) as response:
-                        if response.status >= 400:
-                            print(
-                                f"ERROR: Could not fetch home page: {response.status}",
-                                file=sys.stderr,
-                            )
-                            return
-                        html = await response.text()
-                except Exception as e:
-                    print(f"ERROR: Could not fetch home page: {e}", file=sys.stderr)
-                    return
-
-                # Extract all pages from navigation
-                self.pages = self.extract_navigation_pages(html)
+    async def run(self, session):
+        """Crawl the site, then check the external links found, if asked to."""
+        await self.crawl(session)
+        await self.check_external()
+
+    async def check_external(self):
+        """Check the links to other sites found in the pages crawled, if asked to."""
+        if not self.external or not self.crawl_complete or not self.external_links:
+            return
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Checking {len(self.external_links)} external links...",
+            file=sys.stderr,
+        )
+        self.external_results = await self.external.check_all(self.external_links)
+        # Pages with broken external links are problematic too
+        for link, (is_valid, _) in sorted(self.external_results.items()):
+            if is_valid:
+                continue
+            for page_url in sorted(self.external_links[link] - self.problematic_pages):
+                self.problematic_pages.add(page_url)
+                if self.output_handle:
+                    self.output_handle.write(f"{page_url}\n")
+            if self.output_handle:
+                self.output_handle.flush()
+
+    def checkpoint_state(self):
+        """The state of the crawl, to carry on from: see load_checkpoint."""
+        return {
+            "version": self.CHECKPOINT_VERSION,
+            "base_url": self.base_url,
+            # Pages being processed are processed again
+            "frontier": sorted(self.pages_in_flight, key=lambda page: (page[1], page[0]))
+            + list(self.frontier),
+            "pages": sorted(self.pages),
+            "checked_links": self.checked_links,
+            "broken_links": {link: sorted(pages) for link, pages in self.broken_links.items()},
+            "problematic_pages": sorted(self.problematic_pages),
+            "pages_processed": self.pages_processed,
+            "pages_failed": self.pages_failed,
+            "linked_pages": sorted(self.linked_pages),
+            "good_pages": sorted(self.good_pages),
+            "sitemap_pages": sorted(self.sitemap_pages) if self.sitemap_pages is not None else None,
+            "sitemap_outside": self.sitemap_outside,
+            "external_links": {link: sorted(pages) for link, pages in self.external_links.items()},
+            "page_ids": {url: sorted(ids) for url, ids in self.page_ids.items()},
+            "fragment_links": [
+                [target, fragment, sorted(pages)]
+                for (target, fragment), pages in self.fragment_links.items()
+            ],
+        }
+
+    def save_checkpoint(self):
+        temp_file = f"{self.checkpoint_file}.{os.getpid()}"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint_state(), f)
+        os.replace(temp_file, self.checkpoint_file)
+        self.last_checkpoint = time.monotonic()
+
+    def load_checkpoint(self):
+        """
+        Carry on from the state in the checkpoint file, if there is one: returns
+        whether there was.
+        """
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            raise CheckpointError(f"Could not read checkpoint '{self.checkpoint_file}': {e}")
+        if state.get("version") != self.CHECKPOINT_VERSION:
+            raise CheckpointError(f"Checkpoint '{self.checkpoint_file}' is from another version")
+        if state.get("base_url") != self.base_url:
+            raise CheckpointError(
+                f"Checkpoint '{self.checkpoint_file}' is of a crawl of {state.get('base_url')}"
+            )
+        self.frontier = deque((url, depth) for url, depth in state["frontier"])
+        self.pages = set(state["pages"])
+        self.checked_links = {
+            link: tuple(result) for link, result in state["checked_links"].items()
+        }
+        for link, pages in state["broken_links"].items():
+            self.broken_links[link] = set(pages)
+        self.problematic_pages = set(state["problematic_pages"])
+        self.pages_processed = state["pages_processed"]
+        self.pages_failed = state["pages_failed"]
+        self.linked_pages = set(state["linked_pages"])
+        self.good_pages = set(state["good_pages"])
+        if state["sitemap_pages"] is not None:
+            self.sitemap_pages = set(state["sitemap_pages"])
+        self.sitemap_outside = state["sitemap_outside"]
+        for link, pages in state["external_links"].items():
+            self.external_links[link] = set(pages)
+        self.page_ids = {url: set(ids) for url, ids in state["page_ids"].items()}
+        for target, fragment, pages in state["fragment_links"]:
+            self.fragment_links[(target, fragment)] = set(pages)
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Resuming from {self.checkpoint_file}: "
+            f"{self.pages_processed + self.pages_failed} pages done, {len(self.frontier)} to go",
+            file=sys.stderr,
+        )
+        return True
+
+    async def crawl(self, session):
+        """
+        Crawl breadth first from the pages in the home page's navigation (or the
+        frontier of the checkpoint resumed from), checking each page's links, and
+        following those to other pages.
+        """
+        # A bounded queue feeds the workers; pages beyond it wait in the frontier
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.frontier_changed = asyncio.Event()
+        if not self.resumed and not await self.seed(session):
+            return
+        self.crawl_started = True
+        self.last_checkpoint = time.monotonic()
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Processing pages and checking links...",
+            file=sys.stderr,
+        )
+
+        workers = [
+            asyncio.create_task(self.crawl_worker(session, queue))
+            for _ in range(self.max_concurrent)
+        ]
+        try:
+            while True:
+                while self.frontier:
+                    page = self.frontier.popleft()
+                    self.pages_in_flight.add(page)
+                    # Waits while the queue is full
+                    await queue.put(page)
+                if not self.pages_in_flight:
+                    break
+                if (
+                    self.checkpoint_file
+                    and time.monotonic() - self.last_checkpoint >= self.CHECKPOINT_INTERVAL
+                ):
+                    self.save_checkpoint()
+                self.frontier_changed.clear()
+                await self.frontier_changed.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.crawl_complete = True
+        self.check_fragments()
+        self.show_progress(force=True)
+
+    def check_fragments(self):
+        """
+        Check that the fragment of each link to a page names an element of the
+        page, by the ids found in it when it was fetched. Links to pages not
+        fetched, such as those too deep, can't be checked.
+        """
+        for (target, fragment), pages in sorted(self.fragment_links.items()):
+            if not self.checked_links.get(target, (True,))[0]:
+                # A broken link already
+                continue
+            ids = self.page_ids.get(target)
+            if ids is None:
+                self.unverified_fragments += 1
+                continue
+            # Empty fragments, and "top", lead to the top of any page
+            if fragment in ids or unquote(fragment) in ids or fragment.lower() == "top":
+                continue
+            link = f"{target}#{fragment}"
+            self.broken_fragments[link] = pages
+            for page_url in sorted(pages - self.problematic_pages):
+                self.problematic_pages.add(page_url)
+                if self.output_handle:
+                    self.output_handle.write(f"{page_url}\n")
+        if self.output_handle:
+            self.output_handle.flush()
+
+    async def seed(self, session):
+        """
+        Add the pages in the home page's navigation to the frontier, and those in
+        the sitemap, if asked to. Returns whether the home page could be read.
+        """
+        # First, get the home page and extract all navigation pages
+        start_url = self.base_url
+        if not start_url.endswith("/"):
+            start_url += "/"
+
+        # Fetch navigation structure
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Fetching navigation structure...",
+            file=sys.stderr,
+        )
+        try:
+            status, pages = await self.fetch_links(session, start_url, "nav", timeout=30)
+            if pages is None:
                 print(
-                    f"[{datetime.now().strftime('%H:%M:%S')}] Found {len(self.pages)} pages in navigation",
+                    f"ERROR: Could not fetch home page: {status}",
                     file=sys.stderr,
                 )
+                return False
+        except Exception as e:
+            print(f"ERROR: Could not fetch home page: {e}", file=sys.stderr)
+            return False
 
-                # Process all pages concurrently
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Found {len(pages)} pages in navigation",
+            file=sys.stderr,
+        )
+        self.add_pages(pages, 0)
+        if self.sitemap:
+            sitemap_pages = await self.read_sitemap(session, start_url)
+            if sitemap_pages is not None:
                 print(
-                    f"[{datetime.now().strftime('%H:%M:%S')}] Processing pages and checking links...",
+                    f"[{datetime.now().strftime('%H:%M:%S')}] Found {len(sitemap_pages)} pages in the sitemap",
                     file=sys.stderr,
                 )
-                tasks = [
-                    self.process_page(session, page_url) for page_url in self.pages
-                ]
-
-                # Process in batches with progress
-                batch_size = 20
-                for i in range(0, len(tasks), batch_size):
-                    batch = tasks[i : i + batch_size]
-                    await asyncio.gather(*batch, return_exceptions=True)
-
-                    # Progress update
-                    print(
-                        f"[{datetime.now().strftime('%H:%M:%S')}] Progress: {min(i+batch_size, len(tasks))}/{len(tasks)} pages | "
-                        f"{len(self.checked_links)} links checked | "
-                        f"{len(self.problematic_pages)} pages with issues | "
-                        f"{len(self.broken_links)} broken links",
-                        file=sys.stderr,
-                    )
-        finally:
-            # Always close the file
-            if self.output_handle:
-                self.output_handle.close()
+                self.add_pages(sitemap_pages, 0, linked=False)
+        return True
+
+    async def read_sitemap(self, session, start_url):
+        """
+        The pages listed in the sitemap, and in the sitemaps of a sitemap index, or
+        None if there is none. "auto" looks for sitemap.xml.gz, then sitemap.xml.
+        """
+        if self.sitemap == "auto":
+            candidates = [start_url + "sitemap.xml.gz", start_url + "sitemap.xml"]
+        else:
+            candidates = [urljoin(start_url, self.sitemap)]
+        for sitemap_url in candidates:
+            sitemap = await self.stream_sitemap(session, sitemap_url)
+            if sitemap is not None:
+                break
+        else:
+            print("ERROR: No sitemap found", file=sys.stderr)
+            return None
+
+        pages = set()
+        seen = {sitemap_url}
+        sitemaps = deque()
+        while True:
+            if sitemap is not None:
+                for url in sitemap.urls:
+                    url = self.normalize_url(url)
+                    if self.is_internal_link(url):
+                        pages.add(url)
+                    else:
+                        self.sitemap_outside += 1
+                sitemaps.extend(url for url in sitemap.sitemaps if url not in seen)
+                seen.update(sitemap.sitemaps)
+            if not sitemaps:
+                break
+            sitemap = await self.stream_sitemap(session, sitemaps.popleft())
+        self.sitemap_pages = pages
+        return pages
+
+    async def stream_sitemap(self, session, url, chunk_size=65536):
+        """
+        Read the sitemap at url, parsing it as it arrives. None if there is none,
+        or it can't be read.
+        """
+        sitemap = SitemapParser()
+        try:
+            if self.site:
+                file_path = self.site.resolve(url)
+                if file_path is None:
+                    return None
+                with open(file_path, "rb") as f:
+                    while chunk := f.read(chunk_size):
+                        sitemap.feed(chunk)
+            else:
+                async with self.semaphore:
+                    started = time.monotonic()
+                    async with session.get(
+                        url, timeout=aiohttp.ClientTimeout(total=60)
+                    ) as response:
+                        ttfb = time.monotonic() - started
+                        size = 0
+                        if response.status < 400:
+                            async for chunk in response.content.iter_chunked(chunk_size):
+                                size += len(chunk)
+                                sitemap.feed(chunk)
+                        self.telemetry.record(
+                            url, "GET", response.status, started, ttfb, size, 0
+                        )
+                        if response.status >= 400:
+                            return None
+            sitemap.close()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ElementTree.ParseError, zlib.error) as e:
+            print(f"ERROR: Could not read sitemap {url}: {e}", file=sys.stderr)
+            return None
+        return sitemap
+
+    def sitemap_unlinked(self):
+        """Pages in the sitemap that no link leads to, apart from the home page."""
+        return sorted(self.sitemap_pages - self.linked_pages - {self.base_url + "/"})
+
+    def sitemap_missing(self):
+        """Pages linked to, and found, that are missing from the sitemap."""
+        return sorted((self.linked_pages & self.good_pages) - self.sitemap_pages)
+
+    async def crawl_worker(self, session, queue):
+        """
+        Process pages from the queue, until cancelled. A page cancelled part way
+        through stays in flight, to be checkpointed.
+        """
+        while True:
+            page_url, depth = await queue.get()
+            await self.process_page(session, page_url, depth)
+            self.pages_in_flight.discard((page_url, depth))
+            self.frontier_changed.set()
+            self.show_progress()
+
+    def show_progress(self, force=False):
+        """Print the progress of the crawl, at most once a second unless forced."""
+        now = time.monotonic()
+        if not force and now - self.last_progress < 1:
+            return
+        self.last_progress = now
+        done = self.pages_processed + self.pages_failed
+        label = f"{self.label}: " if self.label else ""
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] {label}Progress: {done}/{len(self.pages)} pages | "
+            f"{len(self.checked_links)} links checked | "
+            f"{len(self.problematic_pages)} pages with issues | "
+            f"{len(self.broken_links)} broken links",
+            file=sys.stderr,
+        )
 
     def report(self):
         """Show summary of the link check."""
@@ -288,11 +1223,261 @@ class LinkChecker:
             file=sys.stderr,
         )
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Summary:", file=sys.stderr)
+        self.print_summary()
+        if self.telemetry.requests:
+            self.telemetry.print_report()
+        print(
+            f"\n[{datetime.now().strftime('%H:%M:%S')}] Problematic pages written to: {self.output_file}",
+            file=sys.stderr,
+        )
+
+    def print_summary(self):
+        """Show the numbers of the link check."""
         print(f"  - Pages processed: {self.pages_processed}", file=sys.stderr)
         print(f"  - Failed pages: {self.pages_failed}", file=sys.stderr)
         print(f"  - Total links checked: {len(self.checked_links)}", file=sys.stderr)
         print(f"  - Broken links found: {len(self.broken_links)}", file=sys.stderr)
+        print(f"  - Links with fragments checked: {len(self.fragment_links)}", file=sys.stderr)
+        print(f"  - Broken fragments found: {len(self.broken_fragments)}", file=sys.stderr)
+        for link, pages in sorted(self.broken_fragments.items()):
+            print(f"      {link}", file=sys.stderr)
+            for page_url in sorted(pages):
+                print(f"          {page_url}", file=sys.stderr)
+        if self.unverified_fragments:
+            print(
+                f"  - Fragments of links to pages not crawled (unchecked): {self.unverified_fragments}",
+                file=sys.stderr,
+            )
         print(f"  - Pages with issues: {len(self.problematic_pages)}", file=sys.stderr)
+        if self.sitemap_pages is not None:
+            unlinked = self.sitemap_unlinked()
+            missing = self.sitemap_missing()
+            print(f"  - Pages in the sitemap: {len(self.sitemap_pages)}", file=sys.stderr)
+            if self.sitemap_outside:
+                print(
+                    f"  - Sitemap URLs outside the base URL (ignored): {self.sitemap_outside}",
+                    file=sys.stderr,
+                )
+            print(f"  - Sitemap pages no link leads to: {len(unlinked)}", file=sys.stderr)
+            for url in unlinked:
+                print(f"      {url}", file=sys.stderr)
+            print(f"  - Linked pages missing from the sitemap: {len(missing)}", file=sys.stderr)
+            for url in missing:
+                print(f"      {url}", file=sys.stderr)
+        if self.external_results:
+            broken = sorted(
+                link for link, (is_valid, _) in self.external_results.items() if not is_valid
+            )
+            print(
+                f"  - External links checked: {len(self.external_results)} "
+                f"({self.external.from_cache} from the cache)",
+                file=sys.stderr,
+            )
+            print(f"  - Broken external links: {len(broken)}", file=sys.stderr)
+            for link in broken:
+                print(f"      {self.external_results[link][1]}  {link}", file=sys.stderr)
+                for page_url in sorted(self.external_links[link]):
+                    print(f"          {page_url}", file=sys.stderr)
+
+
+class MultiVersionChecker:
+    """
+    Crawl several versions of a site deployed with mike at once, each with its own
+    LinkChecker, over one connection pool and one budget of concurrent requests,
+    sharing the parser processes and the cache. Versions given by an alias are
+    crawled once, and pages identical in several versions are parsed once. Reports
+    the broken links of each version, and the pages found in one version that are
+    missing from another.
+    """
+
+    def __init__(
+        self,
+        root_url,
+        versions,
+        max_concurrent=5,
+        output_file="broken_links.txt",
+        cache_file=None,
+        site_dir=None,
+        workers=None,
+        max_depth=None,
+        parser=None,
+        sitemap=None,
+        retries=0,
+        external=None,
+    ):
+        self.root_url = root_url.rstrip("/")
+        # The versions asked for: names or aliases, or "all" for those in versions.json
+        self.versions = versions
+        self.max_concurrent = max_concurrent
+        self.output_file = output_file
+        self.cache_file = cache_file
+        self.site_dir = site_dir
+        self.workers = workers
+        self.checker_options = dict(
+            max_depth=max_depth, parser=parser, sitemap=sitemap, retries=retries, external=external
+        )
+        self.aliases = {}  # Map of version -> the aliases of it asked for
+        self.checkers = {}  # Map of version -> its LinkChecker, in the order asked for
+        # Map of version -> (path, versions with it) of pages found in other
+        # versions and missing from it; and -> how many of those it does have,
+        # though not linked to
+        self.missing = {}
+        self.unreached = {}
+        self.telemetry = Telemetry(self.root_url)
+        self.output_handle = None
+
+    async def read_versions(self, session):
+        """The versions in versions.json at the root, as [(version, aliases)]."""
+        try:
+            if self.site_dir:
+                with open(os.path.join(self.site_dir, "versions.json"), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            else:
+                async with session.get(
+                    f"{self.root_url}/versions.json", timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    if response.status >= 400:
+                        return []
+                    data = await response.json(content_type=None)
+            return [(str(entry["version"]), entry.get("aliases", [])) for entry in data]
+        except (OSError, ValueError, KeyError, TypeError, aiohttp.ClientError, asyncio.TimeoutError):
+            return []
+
+    async def resolve_versions(self, session):
+        """
+        The versions to crawl: those asked for, with aliases resolved by
+        versions.json (where there is one), and each version once.
+        """
+        known = await self.read_versions(session)
+        alias_of = {}
+        for version, aliases in known:
+            alias_of[version] = version
+            for alias in aliases:
+                alias_of[alias] = version
+        asked = self.versions
+        if "all" in asked:
+            if not known:
+                print(f"ERROR: No versions.json found under {self.root_url}", file=sys.stderr)
+                return []
+            asked = [version for version, _ in known]
+        versions = []
+        for name in asked:
+            version = alias_of.get(name, name)
+            if version not in versions:
+                versions.append(version)
+            if name != version:
+                self.aliases.setdefault(version, []).append(name)
+        for version, aliases in self.aliases.items():
+            print(
+                f"[{datetime.now().strftime('%H:%M:%S')}] {', '.join(aliases)}: an alias of {version}, "
+                f"crawled once",
+                file=sys.stderr,
+            )
+        return versions
+
+    async def spider(self):
+        """Crawl the versions, concurrently, then compare them."""
+        self.output_handle = open(self.output_file, "w")
+        self.telemetry.start()
+        self.cache = ProbeCache(self.cache_file) if self.cache_file else None
+        self.executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers != 0 else None
+        try:
+            if self.site_dir:
+                await self.crawl(None)
+                return
+            connector = aiohttp.TCPConnector(limit=100)
+            async with aiohttp.ClientSession(
+                connector=connector, headers={"User-Agent": USER_AGENT}
+            ) as session:
+                await self.crawl(session)
+        finally:
+            self.telemetry.stop()
+            if self.executor:
+                self.executor.shutdown()
+                self.executor = None
+            self.output_handle.close()
+            if self.cache:
+                self.cache.save()
+
+    async def crawl(self, session):
+        # One budget of requests, and one table of pages parsed, for all versions
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        parsed = {}
+        for version in await self.resolve_versions(session):
+            checker = LinkChecker(
+                f"{self.root_url}/{version}",
+                self.max_concurrent,
+                self.output_file,
+                site_dir=self.site_dir,
+                **self.checker_options,
+            )
+            checker.label = version
+            checker.semaphore = semaphore
+            checker.cache = self.cache
+            checker.executor = self.executor
+            checker.parsed = parsed
+            checker.telemetry = self.telemetry
+            checker.output_handle = self.output_handle
+            self.checkers[version] = checker
+        if not self.checkers:
+            return
+        self.telemetry.is_page = next(iter(self.checkers.values())).is_page_url
+        await asyncio.gather(*(checker.run(session) for checker in self.checkers.values()))
+        await self.compare_versions(session)
+
+    async def compare_versions(self, session):
+        """
+        Find the pages crawled in one version and not in another, and check whether
+        they are in it nonetheless, just not linked to.
+        """
+        pages = {
+            version: {url[len(checker.base_url):] for url in checker.good_pages}
+            for version, checker in self.checkers.items()
+        }
+        all_pages = set().union(*pages.values())
+        for version, checker in self.checkers.items():
+            absent = sorted(all_pages - pages[version])
+            results = await asyncio.gather(
+                *(checker.check_url(session, checker.base_url + path) for path in absent)
+            )
+            self.missing[version] = [
+                (path, [other for other in self.checkers if path in pages[other]])
+                for path, (_, is_valid, _) in zip(absent, results)
+                if not is_valid
+            ]
+            self.unreached[version] = len(absent) - len(self.missing[version])
+
+    def report(self):
+        """Show the summary of each version's link check, and how the versions differ."""
+        print(
+            f"\n[{datetime.now().strftime('%H:%M:%S')}] Link check complete!",
+            file=sys.stderr,
+        )
+        for version, checker in self.checkers.items():
+            aliases = f" (also as {', '.join(self.aliases[version])})" if version in self.aliases else ""
+            print(
+                f"[{datetime.now().strftime('%H:%M:%S')}] Summary for {version}{aliases}:",
+                file=sys.stderr,
+            )
+            checker.print_summary()
+        if len(self.checkers) > 1:
+            print(
+                f"[{datetime.now().strftime('%H:%M:%S')}] Pages missing between versions:",
+                file=sys.stderr,
+            )
+            for version, missing in self.missing.items():
+                print(
+                    f"  - Missing from {version}: {len(missing)}"
+                    + (f" ({self.unreached[version]} more there, but not linked to)"
+                       if self.unreached[version] else ""),
+                    file=sys.stderr,
+                )
+                for path, versions in missing:
+                    print(f"      {path or '/'}  (in {', '.join(versions)})", file=sys.stderr)
+        reused = sum(checker.parses_reused for checker in self.checkers.values())
+        print(f"  - Pages identical to one parsed already: {reused}", file=sys.stderr)
+        if self.telemetry.requests:
+            self.telemetry.print_report()
         print(
             f"\n[{datetime.now().strftime('%H:%M:%S')}] Problematic pages written to: {self.output_file}",
             file=sys.stderr,
@@ -319,29 +1504,200 @@ def main():
         default="broken_links.txt",
         help="Output file for problematic pages (default: broken_links.txt)",
     )
+    parser.add_argument(
+        "--cache",
+        default=".link_cache.json",
+        help="File keeping each URL's status and validators between runs, so that "
+        "unchanged pages aren't downloaded again (default: .link_cache.json)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use or update the cache",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        help="How many links to follow from the pages in the navigation; "
+        "0 to check the navigation pages only (default: no limit)",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=HTMLLinkExtractor.BACKENDS,
+        default=HTMLLinkExtractor.DEFAULT_BACKEND,
+        help=f"HTML parser to extract links with (default: {HTMLLinkExtractor.DEFAULT_BACKEND})",
+    )
+    parser.add_argument(
+        "--sitemap",
+        nargs="?",
+        const="auto",
+        default=None,
+        help="Also crawl the pages in this sitemap (gzipped or not), and report "
+        "the pages in it no link leads to, and vice versa; without a URL, the "
+        "site's sitemap.xml.gz or sitemap.xml",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=0,
+        help="Times to retry a request that gets no response, or a 429, 502, 503 "
+        "or 504, waiting longer each time (default: 0)",
+    )
+    parser.add_argument(
+        "--telemetry",
+        help="Write the time, time to first byte, size and retries of each request "
+        "to this file: JSON, with a summary, if it ends in .json, otherwise CSV",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=".link_checkpoint.json",
+        help="File to checkpoint the crawl to, every so often and when interrupted; "
+        "removed when the crawl completes (default: .link_checkpoint.json)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Carry on from the checkpoint, reusing the results in it",
+    )
+    parser.add_argument(
+        "--external",
+        action="store_true",
+        help="Check the links to other sites too, once the crawl is done",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=2,
+        help="With --external, maximum concurrent requests to any one other site (default: 2)",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=1.0,
+        help="With --external, seconds between the starts of requests to any one "
+        "other site (default: 1)",
+    )
+    parser.add_argument(
+        "--external-cache",
+        default=".external_link_cache.json",
+        help="With --external, file keeping the results for external links for "
+        "--external-ttl hours (default: .external_link_cache.json)",
+    )
+    parser.add_argument(
+        "--external-ttl",
+        type=float,
+        default=7 * 24,
+        help="Hours an external link's result is kept for (default: 168)",
+    )
+    parser.add_argument(
+        "--versions",
+        nargs="+",
+        metavar="VERSION",
+        help="Crawl these versions (or aliases) of a site deployed with mike at once, "
+        "or all in its versions.json; --base-url is then the root the versions are under",
+    )
+    parser.add_argument(
+        "--site-dir",
+        help="Check the site built in this directory (as by mkdocs build, or a mike "
+        "checkout) as if deployed at the base URL, without any requests",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes parsing pages, apart from the requests made "
+        "(--max-concurrent); 0 to parse them in the same process "
+        "(defaults to the number of CPUs)",
+    )
 
     args = parser.parse_args()
 
+    if args.site_dir and not os.path.isdir(args.site_dir):
+        sys.exit(f"Error: '{args.site_dir}' is not a valid directory.")
+    if args.versions and args.resume:
+        sys.exit("Error: --resume can't be used with --versions.")
+
     # Start message
     print(
         f"[{datetime.now().strftime('%H:%M:%S')}] Starting link check for: {args.base_url}",
         file=sys.stderr,
     )
+    if args.site_dir:
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Reading the site from: {args.site_dir}",
+            file=sys.stderr,
+        )
     print(
         f"[{datetime.now().strftime('%H:%M:%S')}] Max concurrent requests: {args.max_concurrent}",
         file=sys.stderr,
     )
+    print(
+        f"[{datetime.now().strftime('%H:%M:%S')}] Parser processes: "
+        f"{args.workers if args.workers is not None else os.cpu_count()}",
+        file=sys.stderr,
+    )
     print(
         f"[{datetime.now().strftime('%H:%M:%S')}] Output file: {args.output}",
         file=sys.stderr,
     )
 
-    checker = LinkChecker(args.base_url, args.max_concurrent, args.output)
+    external = (
+        ExternalLinkChecker(
+            per_host=args.per_host,
+            delay=args.delay,
+            cache_file=None if args.no_cache else args.external_cache,
+            ttl=args.external_ttl * 3600,
+        )
+        if args.external
+        else None
+    )
+    cache_file = None if args.no_cache or args.site_dir else args.cache
+    if args.versions:
+        checker = MultiVersionChecker(
+            args.base_url,
+            args.versions,
+            args.max_concurrent,
+            args.output,
+            cache_file,
+            args.site_dir,
+            args.workers,
+            args.max_depth,
+            args.parser,
+            args.sitemap,
+            args.retries,
+            external,
+        )
+    else:
+        checker = LinkChecker(
+            args.base_url,
+            args.max_concurrent,
+            args.output,
+            cache_file,
+            args.site_dir,
+            args.workers,
+            args.max_depth,
+            args.parser,
+            args.sitemap,
+            args.retries,
+            args.checkpoint,
+            args.resume,
+            external,
+        )
 
     # Run the async spider
-    asyncio.run(checker.spider())
+    try:
+        asyncio.run(checker.spider())
+    except CheckpointError as e:
+        sys.exit(f"Error: {e}")
 
     checker.report()
+    if args.telemetry:
+        checker.telemetry.export(args.telemetry)
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] Request telemetry written to: {args.telemetry}",
+            file=sys.stderr,
+        )
 
 
 if __name__ == "__main__":
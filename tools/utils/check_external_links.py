@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Check the external links of the documentation: those to other sites.
+
+The links are found in the markdown sources, or, with check_deployed_links.py
+--external, in the pages of the built site as it is crawled.
+
+Other sites are treated politely: at most --per-host requests are made to a host
+at a time, over a pool of connections per host, each beginning at least --delay
+seconds after the one before. Requests that get no response, or a status asking
+to come back later, are retried, waiting longer each time. Results are kept in a
+cache file for --ttl hours, so that each URL is checked at most once in that time.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import urlparse, urlunparse
+
+import aiohttp
+
+from doc_utils import LinkExtractor, MkDocsRepo
+
+USER_AGENT = "Mozilla/5.0 (compatible; Dyalog Documentation Link Checker)"
+
+
+def is_external_link(url: str) -> bool:
+    """Whether a URL, as written in a link, is to another site."""
+    return LinkExtractor.categorise_link(url) == 'external'
+
+
+def normalize_external_url(url: str) -> str:
+    """A URL without its fragment, which the server never sees."""
+    parsed = urlparse(url)
+    return urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, parsed.query, ""))
+
+
+def find_external_links(root_dir: str) -> Dict[str, Set[Tuple[str, int]]]:
+    """The external links in the markdown sources, as a map of URL -> (file, line)s."""
+    links = defaultdict(set)
+    for file_path in MkDocsRepo(root_dir).iter_all_markdown_files():
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Error reading {file_path}: {e}", file=sys.stderr)
+            continue
+        for token in LinkExtractor.tokenize(content):
+            if token.kind not in ('link', 'image', 'definition') or not token.url.strip():
+                continue
+            # Drop a title, as in [text](url "title")
+            url = token.url.split()[0].strip('<>')
+            if is_external_link(url):
+                links[normalize_external_url(url)].add((file_path, token.line))
+    return links
+
+
+class ExternalCache:
+    """
+    The results of checking external URLs, kept in a JSON file between runs, each
+    for ttl seconds after it was checked.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data['urls']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def get(self, url: str) -> Optional[Tuple[bool, object]]:
+        """The (is_valid, status) of url, if checked within the TTL."""
+        entry = self.entries.get(url)
+        if entry is None or time.time() - entry['checked'] >= self.ttl:
+            return None
+        return entry['valid'], entry['status']
+
+    def put(self, url: str, is_valid: bool, status):
+        self.entries[url] = {'valid': is_valid, 'status': status, 'checked': time.time()}
+
+    def save(self):
+        # Forget what has expired
+        now = time.time()
+        entries = {url: entry for url, entry in self.entries.items()
+                   if now - entry['checked'] < self.ttl}
+        temp_file = f"{self.path}.{os.getpid()}"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'urls': entries}, f)
+        os.replace(temp_file, self.path)
+
+
+class HostThrottle:
+    """
+    The limits on requests to one host: how many may be made at a time, and how
+    soon after the one before each may begin. Use as an async context manager
+    around each request.
+    """
+
+    def __init__(self, limit: int, delay: float):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.delay = delay
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        now = time.monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+class ExternalLinkChecker:
+    """Check external URLs, politely, remembering the results for a while."""
+
+    # Statuses worth trying again after a while
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # Seconds before the first retry, doubled for each after it, unless the server
+    # says how long to wait with Retry-After (of at most MAX_RETRY_AFTER seconds)
+    RETRY_DELAY = 1.0
+    MAX_RETRY_AFTER = 60
+
+    def __init__(
+        self,
+        max_concurrent: int = 20,
+        per_host: int = 2,
+        delay: float = 1.0,
+        retries: int = 2,
+        timeout: float = 15,
+        cache_file: Optional[str] = None,
+        ttl: float = 7 * 24 * 3600,
+    ):
+        self.max_concurrent = max_concurrent
+        self.per_host = per_host
+        self.delay = delay
+        self.retries = retries
+        self.timeout = timeout
+        self.cache = ExternalCache(cache_file, ttl) if cache_file else None
+        self.throttles = {}  # (scheme, host) -> HostThrottle
+        self.results = {}  # url -> (is_valid, status)
+        self.pending = {}  # url -> future of its result, while it's being checked
+        self.from_cache = 0  # Results found in the cache
+        self.requests = 0  # Requests made, retries included
+
+    def throttle(self, url: str) -> HostThrottle:
+        """The throttle of the host of url."""
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc.lower())
+        if key not in self.throttles:
+            self.throttles[key] = HostThrottle(self.per_host, self.delay)
+        return self.throttles[key]
+
+    async def check_all(self, urls: Iterable[str]) -> Dict[str, Tuple[bool, object]]:
+        """
+        Check urls, sharing a pool of connections to each host; returns their
+        (is_valid, status).
+        """
+        urls = sorted(set(urls))
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent, limit_per_host=self.per_host)
+        try:
+            async with aiohttp.ClientSession(
+                connector=connector, headers={"User-Agent": USER_AGENT}
+            ) as session:
+                await asyncio.gather(*(self.check_url(session, url) for url in urls))
+        finally:
+            if self.cache:
+                self.cache.save()
+        return {url: self.results[url] for url in urls if url in self.results}
+
+    async def check_url(self, session: aiohttp.ClientSession, url: str) -> Tuple[bool, object]:
+        """
+        The (is_valid, status) of url; status is the error for a failed request.
+        A url already being checked, by another call of check_all, isn't checked again.
+        """
+        if url in self.results:
+            return self.results[url]
+        if url in self.pending:
+            return await self.pending[url]
+        cached = self.cache.get(url) if self.cache else None
+        if cached is not None:
+            self.from_cache += 1
+            self.results[url] = cached
+            return cached
+        future = self.pending[url] = asyncio.get_running_loop().create_future()
+        try:
+            status = await self.probe(session, url)
+            result = (status < 400, status)
+        except asyncio.TimeoutError:
+            result = (False, "Timeout")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            result = (False, str(e)[:50] or type(e).__name__)
+        finally:
+            del self.pending[url]
+        future.set_result(result)
+        self.results[url] = result
+        if self.cache:
+            self.cache.put(url, *result)
+        return result
+
+    async def probe(self, session: aiohttp.ClientSession, url: str) -> int:
+        """
+        The status of url, following redirects: HEAD first, then GET if that fails,
+        as many sites refuse HEAD, with one status or another. Not if it failed with
+        a status asking to come back later, as the retries already did.
+        """
+        status = await self.request(session, "HEAD", url)
+        if status >= 400 and status not in self.RETRY_STATUSES:
+            status = await self.request(session, "GET", url)
+        return status
+
+    async def request(self, session: aiohttp.ClientSession, method: str, url: str) -> int:
+        """The status of a request, retried when it's worth it, up to self.retries times."""
+        wait = self.RETRY_DELAY
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(wait)
+                wait *= 2
+            self.requests += 1
+            try:
+                async with self.throttle(url):
+                    async with session.request(
+                        method,
+                        url,
+                        allow_redirects=True,
+                        timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    ) as response:
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After", "")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                continue
+            if status not in self.RETRY_STATUSES or attempt == self.retries:
+                return status
+            if retry_after.isdigit():
+                wait = min(int(retry_after), self.MAX_RETRY_AFTER)
+        return status
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the external links in the markdown sources of the documentation"
+    )
+    parser.add_argument(
+        "--dir",
+        default=".",
+        help="Directory containing mkdocs.yml (defaults to current directory)",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=20,
+        help="Maximum concurrent requests, to all hosts (default: 20)",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=2,
+        help="Maximum concurrent requests to any one host (default: 2)",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=1.0,
+        help="Seconds between the starts of requests to any one host (default: 1)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="Times to retry a request that gets no response, or a status asking to "
+        "come back later (default: 2)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=15,
+        help="Seconds to wait for a response (default: 15)",
+    )
+    parser.add_argument(
+        "--cache",
+        default=".external_link_cache.json",
+        help="File keeping the results between runs (default: .external_link_cache.json)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use or update the cache",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=float,
+        default=7 * 24,
+        help="Hours a result is kept in the cache for (default: 168)",
+    )
+    parser.add_argument(
+        "--output", help="Write results to this file instead of console"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        sys.exit(f"Error: '{args.dir}' is not a valid directory.")
+
+    links = find_external_links(args.dir)
+    print(
+        f"[{datetime.now().strftime('%H:%M:%S')}] Checking {len(links)} external links...",
+        file=sys.stderr,
+    )
+    checker = ExternalLinkChecker(
+        args.max_concurrent,
+        args.per_host,
+        args.delay,
+        args.retries,
+        args.timeout,
+        None if args.no_cache else args.cache,
+        args.ttl * 3600,
+    )
+    results = asyncio.run(checker.check_all(links))
+    broken = sorted(url for url, (is_valid, _) in results.items() if not is_valid)
+    print(
+        f"[{datetime.now().strftime('%H:%M:%S')}] {len(results)} external links checked "
+        f"({checker.from_cache} from the cache, {checker.requests} requests), "
+        f"{len(broken)} broken",
+        file=sys.stderr,
+    )
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for url in broken:
+            print(f"{results[url][1]}  {url}", file=output)
+            for file_path, line in sorted(links[url]):
+                print(f"    {os.path.relpath(file_path, args.dir)}:{line}", file=output)
+    finally:
+        if args.output:
+            output.close()
+
+    # Exit with error code if broken links found
+    sys.exit(1 if broken else 0)
+
+
+if __name__ == "__main__":
+    main()
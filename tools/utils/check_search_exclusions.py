@@ -106,7 +106,16 @@ def check_file(filepath: str) -> Optional[Dict[str, any]]:
     """
     with open(filepath, 'r', encoding='utf-8') as f:
         content = f.read()
+    return check_content(filepath, content)
+
+
+def check_content(filepath: str, content: str) -> Optional[Dict[str, any]]:
+    """
+    Check the content of a markdown file for conflicts.
     
+    Returns:
+        Dictionary with conflict info if found, None otherwise
+    """
     has_exclude, exclude_line = has_search_exclude_front_matter(content)
     has_div, symbol, div_line = has_hidden_synonym_div(content)
     
@@ -1,61 +1,119 @@
 #!/usr/bin/env python3
 """
 Check for dangling local links in markdown files referenced in mkdocs.yml navigation.
+
+Each file is read and tokenised once. The files are checked by a pool of worker
+processes (--jobs), and the results gathered in file order, so that the report is
+the same whatever the number of jobs. The anchors of every page found on the way
+are indexed, and each #fragment link then checked against that index.
 """
 
 import os
 import sys
 import argparse
-from doc_utils import MkDocsRepo, LinkExtractor, LinkValidator, SummaryReporter
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Set, Tuple
+from doc_utils import AnchorIndex, MkDocsRepo, LinkExtractor, LinkValidator
+
+# Set in each worker process by _init_worker
+_context = None
 
 
-def is_internal_non_anchor_link(url):
-    """Check if a URL is internal and not just an anchor."""
+def is_internal_link(url):
+    """Check if a URL is internal, including links to anchors in the same page."""
     return (
-        not url.startswith(("http://", "https://", "#", "mailto:"))
+        not url.startswith(("http://", "https://", "mailto:"))
         and url != ""
         and not url.startswith("javascript:")
     )
 
 
-def check_file_links(file_path, root_dir, site_mappings, verbose=False):
-    """Check all links in a single markdown file."""
-    dangling_links = []
+class FileCheck(NamedTuple):
+    """The results of checking the links in one markdown file."""
+    links_found: int
+    # (link_text, link_url, line, column) of links to missing files
+    dangling_links: List[Tuple[str, str, int, int]]
+    # Ids the file's #fragments can link to
+    anchors: Set[str]
+    # (link_text, link_url, line, column, target_file, anchor) of links to markdown anchors
+    fragment_links: List[Tuple[str, str, int, int, str, str]]
 
+
+def check_file_links(
+    file_path, root_dir, site_mappings, verbose=False, path_index=None, subsite_index=None
+):
+    """Check all links in a single markdown file."""
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             content = f.read()
     except Exception as e:
         if verbose:
             print(f"Error reading {file_path}: {e}")
-        return dangling_links
+        return FileCheck(0, [], set(), [])
 
-    # Extract all links from the file
-    links = LinkExtractor.extract_markdown_links(content)
+    # Extract all links and anchors from the file
+    tokens = list(LinkExtractor.tokenize(content))
+    return check_tokens(file_path, tokens, root_dir, site_mappings, path_index, subsite_index)
 
-    for link_text, link_url in links:
-        # Skip external links, anchors, and special links
-        if not is_internal_non_anchor_link(link_url):
-            continue
 
-        # Remove anchor from URL if present
-        if "#" in link_url:
-            link_url_no_anchor = link_url.split("#")[0]
-        else:
-            link_url_no_anchor = link_url
+def check_tokens(file_path, tokens, root_dir, site_mappings, path_index=None, subsite_index=None):
+    """Check the links among the tokens of a markdown file."""
+    dangling_links = []
+    fragment_links = []
+    links = [token for token in tokens if token.kind == "link"]
 
-        # Remove query parameters
-        if "?" in link_url_no_anchor:
-            link_url_no_anchor = link_url_no_anchor.split("?")[0]
+    for token in links:
+        link_url = token.url
+        # Skip external links and special links
+        if not is_internal_link(link_url):
+            continue
 
         # Check if the link is valid
-        is_valid = LinkValidator.is_valid_relative_path(
-            file_path, link_url_no_anchor, root_dir, site_mappings
+        target, anchor = LinkValidator.resolve_link(
+            file_path, link_url, root_dir, site_mappings, path_index, subsite_index
         )
-        if not is_valid:
-            dangling_links.append((link_text, link_url))
+        if target is None:
+            dangling_links.append((token.text, link_url, token.line, token.column))
+        elif anchor and target.endswith(".md"):
+            fragment_links.append(
+                (token.text, link_url, token.line, token.column, target, anchor)
+            )
+
+    anchors = LinkExtractor.anchors_from_tokens(tokens)
+    return FileCheck(len(links), dangling_links, anchors, fragment_links)
 
-    return dangling_links
+
+def _init_worker(root_dir, site_mappings, path_index, subsite_index, verbose):
+    global _context
+    _context = (root_dir, site_mappings, verbose, path_index, subsite_index)
+
+
+def _check_file(file_path):
+    root_dir, site_mappings, verbose, path_index, subsite_index = _context
+    return check_file_links(
+        file_path, root_dir, site_mappings, verbose, path_index, subsite_index
+    )
+
+
+def check_files(
+    nav_files, root_dir, site_mappings, path_index, jobs, verbose=False, subsite_index=None
+):
+    """
+    Check the links in each file, spread over `jobs` processes. Yields a
+    FileCheck for each file, in order.
+    """
+    context = (root_dir, site_mappings, path_index, subsite_index, verbose)
+    if jobs <= 1 or len(nav_files) < 2:
+        _init_worker(*context)
+        yield from map(_check_file, nav_files)
+        return
+
+    chunksize = max(1, len(nav_files) // (jobs * 4))
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=context
+    ) as executor:
+        yield from executor.map(_check_file, nav_files, chunksize=chunksize)
 
 
 def check_dangling_links(
@@ -65,12 +123,16 @@ def check_dangling_links(
     stats_only=False,
     debug=False,
     verbose=False,
+    jobs=None,
+    as_json=False,
+    check_anchors=True,
 ):
     # Initialise repo
     repo = MkDocsRepo(directory)
+    path_index = repo.path_index
 
-    # Get navigation files to check
-    nav_files = []
+    # Get navigation files to check, in a stable order
+    nav_files = set()
     for base_path, file_ref in repo.iter_nav_files(target_subsite):
         file_path = repo.resolver.markdown_file_path(base_path, file_ref)
 
@@ -80,10 +142,11 @@ def check_dangling_links(
             if file_subsite != target_subsite:
                 continue
 
-        if os.path.exists(file_path):
-            nav_files.append(file_path)
+        if path_index.exists(file_path):
+            nav_files.add(file_path)
         elif debug:
             print(f"Warning: Navigation file does not exist: {file_path}")
+    nav_files = sorted(nav_files)
 
     # Get site mappings for cross-reference resolution
     site_mappings = repo.site_mappings
@@ -96,41 +159,69 @@ def check_dangling_links(
     total_links = 0
     dangling_links = []
     subsite_stats = {}
+    show_progress = not stats_only and not as_json
 
     # Check each file
-    for i, file_path in enumerate(nav_files, 1):
-        relative_path = os.path.relpath(file_path, directory)
-        if not stats_only:
+    results = check_files(
+        nav_files,
+        directory,
+        site_mappings,
+        path_index,
+        jobs or os.cpu_count() or 1,
+        verbose,
+        repo.subsite_index,
+    )
+    checked = []
+    anchor_index = AnchorIndex()
+    for i, (file_path, result) in enumerate(zip(nav_files, results), 1):
+        if show_progress:
+            relative_path = os.path.relpath(file_path, directory)
             print(f"Checking file [{i}/{total_files}]: {relative_path}", end="\r")
 
-        # Check links in this file
-        file_dangling = check_file_links(file_path, directory, site_mappings, verbose)
+        total_links += result.links_found
+        anchor_index.add(file_path, result.anchors)
+        checked.append((file_path, result))
 
-        # Count total links
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            all_links = LinkExtractor.extract_markdown_links(content)
-            total_links += len(all_links)
-        except:
-            pass
+    # With every page's anchors indexed, check the #fragment links
+    for file_path, result in checked:
+        # Each entry: (link_text, link_url, line, column, file with the missing anchor)
+        file_dangling = [entry + (None,) for entry in result.dangling_links]
+        if check_anchors:
+            for link_text, link_url, line, column, target, anchor in result.fragment_links:
+                if not anchor_index.has_anchor(target, anchor):
+                    file_dangling.append((link_text, link_url, line, column, target))
 
         if file_dangling:
+            file_dangling.sort(key=lambda entry: (entry[2], entry[3]))
             # Determine subsite
             subsite = repo.determine_file_subsite(file_path)
-
-            if stats_only:
-                # Just count for stats
-                if subsite not in subsite_stats:
-                    subsite_stats[subsite] = 0
-                subsite_stats[subsite] += len(file_dangling)
-            else:
-                # Full reporting
-                for link_text, link_url in file_dangling:
-                    dangling_links.append((file_path, link_text, link_url))
+            subsite_stats[subsite] = subsite_stats.get(subsite, 0) + len(file_dangling)
+            for entry in file_dangling:
+                dangling_links.append((file_path,) + entry)
 
     # Report results
-    if stats_only:
+    if as_json:
+        report = {
+            "files_checked": total_files,
+            "links_found": total_links,
+            "dangling_links_found": len(dangling_links),
+            "subsites": dict(sorted(subsite_stats.items())),
+            "dangling_links": [
+                {
+                    "file": os.path.relpath(source_file, directory),
+                    "line": line,
+                    "column": column,
+                    "text": link_text,
+                    "url": link_url,
+                    "missing": "file" if anchor_target is None else "anchor",
+                }
+                for source_file, link_text, link_url, line, column, anchor_target in dangling_links
+            ],
+        }
+        if stats_only:
+            del report["dangling_links"]
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    elif stats_only:
         print("\n\nSubsite Statistics:")
         print("-------------------")
         total_dangling = sum(subsite_stats.values())
@@ -155,13 +246,19 @@ def check_dangling_links(
         if dangling_links:
             print("\nDangling Links:")
             print("---------------")
-            for source_file, link_text, link_url in dangling_links:
+            for source_file, link_text, link_url, line, column, anchor_target in dangling_links:
                 rel_source = os.path.relpath(source_file, directory)
                 link_display = (
                     f"[{link_text}]({link_url})" if link_text else f"({link_url})"
                 )
-                print(f"File: {rel_source}")
+                print(f"File: {rel_source}:{line}:{column}")
                 print(f"  Raw link: {link_display}")
+                if anchor_target is not None:
+                    anchor = LinkValidator.extract_anchor(link_url)
+                    print(f"  Anchor not found: #{anchor} in "
+                          f"{os.path.relpath(anchor_target, directory)}")
+                    print()
+                    continue
                 # Try to show what path was checked
                 source_dir = os.path.dirname(source_file)
                 if "#" in link_url:
@@ -194,6 +291,20 @@ def main():
     parser.add_argument(
         "--stats", action="store_true", help="Show only statistics per subsite"
     )
+    parser.add_argument(
+        "--json", action="store_true", help="Write the results as JSON"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of files to check in parallel (defaults to the number of CPUs)",
+    )
+    parser.add_argument(
+        "--no-anchors",
+        action="store_true",
+        help="Don't check that the #fragments of links name an anchor in the target page",
+    )
     parser.add_argument(
         "--output", help="Write results to this file instead of console"
     )
@@ -233,12 +344,23 @@ def main():
                 args.stats,
                 args.debug,
                 args.verbose,
+                args.jobs,
+                args.json,
+                not args.no_anchors,
             )
             sys.stdout = original_stdout
         print(f"Results written to {args.output}")
     else:
         dangling_links = check_dangling_links(
-            args.dir, mkdocs_path, args.subsite, args.stats, args.debug, args.verbose
+            args.dir,
+            mkdocs_path,
+            args.subsite,
+            args.stats,
+            args.debug,
+            args.verbose,
+            args.jobs,
+            args.json,
+            not args.no_anchors,
         )
 
     # Exit with error code if dangling links found
@@ -4,30 +4,98 @@ Common utilities for processing mkdocs documentation.
 Provides shared functionality for scripts that analyse and validate documentation.
 """
 
+import hashlib
+import html
 import os
+import pickle
 import re
 import sys
-from typing import Dict, List, Set, Tuple, Optional, Iterator
+from html.parser import HTMLParser
+from typing import (
+    Any, Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple, Optional, Iterator
+)
 from urllib.parse import urlparse, unquote
-from bs4 import BeautifulSoup
+import yaml
+from bs4 import BeautifulSoup, Tag
+from markdown.extensions.toc import slugify, unique
 from ruamel.yaml import YAML
 
+try:
+    from lxml import etree
+except ImportError:  # HTML is parsed with html.parser instead
+    etree = None
+
+
+class _SafeLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    """PyYAML's safe loader, in C where available, keeping mkdocs !include tags."""
+
+
+_SafeLoader.add_constructor(
+    '!include', lambda loader, node: f'!include {loader.construct_scalar(node)}'
+)
+
 
 class YAMLLoader:
-    """Unified YAML loader with mkdocs custom tag support."""
+    """
+    Unified YAML loader with mkdocs custom tag support.
     
-    def __init__(self):
+    Files are parsed with PyYAML's safe loader, and each is parsed only once per
+    process while its mtime is unchanged, so the data is shared: don't modify it.
+    With a cache directory (cache_dir, or the DOC_UTILS_YAML_CACHE environment
+    variable), the data is also kept on disk for later runs.
+    """
+    
+    CACHE_DIR_ENV = 'DOC_UTILS_YAML_CACHE'
+    # Parsed data by (path, mtime, size)
+    _loaded: Dict[Tuple[str, int, int], Any] = {}
+    
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.environ.get(self.CACHE_DIR_ENV)
         self.yaml = YAML()
         self.yaml.preserve_quotes = True
     
     def load_file(self, filepath: str) -> Optional[Dict]:
         """Load a YAML file, handling mkdocs custom tags."""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return self.yaml.load(f)
+            stat = os.stat(filepath)
+            key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+            if key not in YAMLLoader._loaded:
+                YAMLLoader._loaded[key] = self._load_cached(key)
+            return YAMLLoader._loaded[key]
         except Exception as e:
             print(f"Error loading {filepath}: {e}", file=sys.stderr)
             return None
+    
+    def _load_cached(self, key: Tuple[str, int, int]) -> Any:
+        """Parse a file, or take it from the on-disk cache if it hasn't changed."""
+        path = key[0]
+        cache_file = None
+        if self.cache_dir:
+            name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+            cache_file = os.path.join(self.cache_dir, f'{name}.pickle')
+            try:
+                with open(cache_file, 'rb') as f:
+                    cached_key, data = pickle.load(f)
+                if cached_key == key:
+                    return data
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                pass
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        try:
+            data = yaml.load(text, Loader=_SafeLoader)
+        except yaml.YAMLError:
+            # Tags the safe loader doesn't know, such as !!python/name
+            return self.yaml.load(text)
+        
+        if cache_file:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_file = f'{cache_file}.{os.getpid()}'
+            with open(temp_file, 'wb') as f:
+                pickle.dump((key, data), f)
+            os.replace(temp_file, cache_file)
+        return data
 
 
 class NavTraverser:
@@ -97,13 +165,13 @@ class PathResolver:
         
         return os.path.abspath(os.path.join(base_path, include_path))
     
-    def markdown_file_path(self, subsite_dir: str, md_ref: str) -> str:
+    def markdown_file_path(self, subsite_dir: str, md_ref: str, docs_dir: str = 'docs') -> str:
         """Get the full path for a markdown file reference."""
         # Handle absolute paths
         if md_ref.startswith('/'):
             return os.path.join(subsite_dir, md_ref[1:])
         else:
-            return os.path.join(subsite_dir, 'docs', md_ref)
+            return os.path.join(subsite_dir, docs_dir, md_ref)
     
     def url_to_source_path(self, url: str, site_mappings: Dict[str, str]) -> Optional[str]:
         """Convert a documentation URL to source file path."""
@@ -138,41 +206,358 @@ class PathResolver:
         return levels
 
 
+class PathIndex:
+    """
+    Index of every file and directory under a root, built with a single walk.
+
+    Link validation tries many candidate paths per link; looking them up here
+    replaces a stat per candidate with a set lookup.
+    """
+
+    SKIP_DIRS = {'.git'}
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+        self.files: Set[str] = set()
+        self.dirs: Set[str] = {self.root_dir}
+        for root, dirs, files in os.walk(self.root_dir):
+            dirs[:] = [d for d in dirs if d not in self.SKIP_DIRS]
+            self.dirs.update(os.path.join(root, d) for d in dirs)
+            self.files.update(os.path.join(root, f) for f in files)
+
+    def exists(self, path: str) -> bool:
+        """
+        Drop-in for os.path.exists. Paths outside the indexed tree, or in a
+        skipped directory, are checked on disk.
+        """
+        full_path = os.path.abspath(path)
+        if full_path != self.root_dir:
+            if not full_path.startswith(self.root_dir + os.sep):
+                return os.path.exists(path)
+            top = full_path[len(self.root_dir) + 1:].split(os.sep, 1)[0]
+            if top in self.SKIP_DIRS:
+                return os.path.exists(path)
+        if path.endswith(os.sep):
+            return full_path in self.dirs
+        return full_path in self.files or full_path in self.dirs
+
+
+class SubsiteIndex:
+    """
+    Longest-prefix lookup of the subsite a path is in.
+
+    The subsites' directories, relative to the root, are held in a trie keyed by
+    path component, so a lookup walks the components of the path once, whatever
+    the number of subsites. Relative paths are taken from the current directory,
+    as os.path.relpath would.
+    """
+
+    def __init__(self, root_dir: str, site_mappings: Dict[str, str]):
+        self.root_dir = os.path.abspath(root_dir)
+        self.trie: Dict = {}
+        for name, site_dir in site_mappings.items():
+            node = self.trie
+            for part in os.path.normpath(site_dir).split(os.sep):
+                node = node.setdefault(part, {})
+            node[None] = name  # A subsite's directory ends here
+
+    def lookup(self, path: str) -> Optional[str]:
+        """The name of the innermost subsite containing path, or None."""
+        full_path = os.path.abspath(path)
+        if not full_path.startswith(self.root_dir + os.sep):
+            return None
+        parts = full_path[len(self.root_dir) + 1:].split(os.sep)
+        found = None
+        node = self.trie
+        for part in parts[:-1]:  # Only paths below a subsite's directory are in it
+            node = node.get(part)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+class LinkToken(NamedTuple):
+    """
+    A link, image, reference definition, heading or anchor found in markdown, at a
+    1-based line and column.
+    """
+    kind: str  # 'link', 'image', 'definition', 'heading' or 'anchor'
+    text: str  # Link text, image alt text, definition label, or heading text
+    url: str  # Link target, or the explicit id of a heading or anchor
+    line: int
+    column: int
+
+
 class LinkExtractor:
     """Extract links from markdown content."""
     
+    FENCE_RE = re.compile(r'(`{3,}|~{3,})')
+    CONTAINER_RE = re.compile(r'(?:!!!|\?\?\?\+?|===)\s|(?:[-*+]|\d+\.)\s')
+    # Definitions and headings must also start a line; that's checked on a match.
+    # The lookahead lets the search skip quickly to where a match can start.
+    INLINE_RE = re.compile(
+        r'(?=[`!\[#{i])(?:'
+        r'(?P<ticks>`+)'
+        r'|!\[(?P<alt>[^\]]*)\]\((?P<src>[^)]+)\)'
+        r'|\[(?P<label>[^\]]+)\]:[ \t]*(?P<target>\S+)'
+        r'|\[(?<!!\[)(?P<text>[^\]]+)\]\((?P<url>[^)]+)\)'
+        r'|#{1,6}(?=(?P<heading>[^\n]*))'
+        r'|\{(?=:?[ \t]*(?P<attrs>[^}\n]*#[^}\n]*)\})'
+        r'|id=(?<=\sid=)(?P<quote>["\'])(?P<html_id>[^"\'\n]+)(?P=quote)'
+        r')'
+    )
+    # What a text block needs for INLINE_RE to find anything in it
+    SCAN_HINT_RE = re.compile(r'[\[#]|\sid=')
+    # An attribute list, as written for attr_list, and the id in one
+    ATTR_LIST_RE = re.compile(
+        r'\s*(?:(?:[#.][^\s=}]+|[^\s=}]+=(?:"[^"]*"|\'[^\']*\'|\S+))\s*)+'
+    )
+    ATTR_ID_RE = re.compile(r'(?:^|\s)#([^\s=}]+)')
+    HEADING_ATTRS_RE = re.compile(r'[ \t]+\{:?[ \t]*([^}\n]*)\}[ \t]*$')
+    CODE_SPAN_RE = re.compile(r'(`+)(.+?)(?<!`)\1(?!`)')
+    BACKTICKS_RE = re.compile(r'`+')
+    # Lines that can end a paragraph, or open a container within one
+    PARAGRAPH_BREAK_RE = re.compile(
+        r'^(?:[^\S\n]*$|[ \t]*(?:`{3,}|~{3,}|(?:!!!|\?\?\?\+?|===)\s|(?:[-*+]|\d+\.)\s))',
+        re.MULTILINE
+    )
+    _closing_fences: Dict[str, re.Pattern] = {}
+    
     @staticmethod
     def extract_markdown_links(content: str) -> List[Tuple[str, str]]:
         """
-        Extract markdown links from content, excluding code blocks.
+        Extract markdown links from content, excluding code.
         Returns list of (text, url) tuples.
         """
-        # First, identify code blocks and create a mask to exclude them
-        code_block_pattern = re.compile(r'```.*?```', re.DOTALL)
-        code_blocks = [(m.start(), m.end()) for m in code_block_pattern.finditer(content)]
+        return [(token.text, token.url) for token in LinkExtractor.tokenize(content)
+                if token.kind == 'link']
+    
+    @staticmethod
+    def extract_image_refs(content: str) -> List[str]:
+        """Extract image references from markdown content, excluding code."""
+        return [token.url for token in LinkExtractor.tokenize(content) if token.kind == 'image']
+
+    @staticmethod
+    def extract_anchors(content: str) -> Set[str]:
+        """Extract the ids a fragment can link to in markdown content, excluding code."""
+        return LinkExtractor.anchors_from_tokens(LinkExtractor.tokenize(content))
+
+    @staticmethod
+    def anchors_from_tokens(tokens: Iterable[LinkToken]) -> Set[str]:
+        """The anchor ids given by heading and anchor tokens."""
+        return {anchor_id for _, anchor_id in LinkExtractor.anchor_ids(tokens)}
+
+    @staticmethod
+    def anchor_ids(tokens: Iterable[LinkToken]) -> List[Tuple[LinkToken, str]]:
+        """
+        The heading and anchor tokens, in order, each with the id it gives: its
+        explicit id, or for a heading its slug, made unique as the toc extension
+        does, with _1, _2... suffixes.
+        """
+        anchors = [token for token in tokens if token.kind in ('heading', 'anchor')]
+        ids = {token.url for token in anchors if token.url}
+        return [
+            (token, token.url or unique(slugify(LinkExtractor.heading_text(token.text), '-'), ids))
+            for token in anchors
+        ]
+
+    @staticmethod
+    def heading_text(text: str) -> str:
+        """
+        Approximate the text content of a heading, as rendered and slugified by the
+        toc extension: markup, footnote references and HTML tags are dropped,
+        outside code spans.
+        """
+        parts = []
+        pos = 0
+        for m in list(LinkExtractor.CODE_SPAN_RE.finditer(text)) + [None]:
+            plain = text[pos:m.start() if m else len(text)]
+            plain = re.sub(r'!\[[^\]]*\]\([^)]*\)|\[\^[^\]]*\]', '', plain)
+            plain = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', plain)
+            plain = re.sub(r'<[^>]*>', '', plain)
+            plain = re.sub(r'(?<![A-Za-z0-9])_+|_+(?![A-Za-z0-9])', '', plain)
+            plain = re.sub(r'\\(.)', r'\1', plain)
+            parts.append(html.unescape(plain))
+            if m:
+                parts.append(m.group(2).strip())
+                pos = m.end()
+        return ''.join(parts)
+
+    @staticmethod
+    def tokenize(content: str) -> Iterator[LinkToken]:
+        """
+        Yield the links, images, reference definitions, headings and anchors (ids
+        given by attribute lists or HTML) in markdown content, in order, skipping
+        code: fenced blocks (``` or ~~~), indented blocks, and inline code spans.
         
-        # Create a function to check if a position is inside a code block
-        def is_in_code_block(pos):
-            return any(start <= pos <= end for start, end in code_blocks)
+        A single pass over the lines splits the content into code and text blocks
+        (runs of non-blank lines); each text block is then scanned once. Within a
+        paragraph or a fenced block, only the lines that can end it are looked at.
+        Indentation follows Python-Markdown: the content of list items and
+        admonitions is indented by four spaces, so code in them by eight.
+        """
+        fence = None  # Closing fence characters while in a fenced block
+        containers: List[int] = []  # Content indents of open lists and admonitions
+        previous_blank = True
+        in_indented_code = False
+        block_start = block_line = None  # Offset and line number of the current text block
+        pos, number, end = 0, 1, len(content)
         
-        # Pattern to match markdown links [text](url) - excluding image links
-        md_link_pattern = re.compile(r'(?<!!)\[(?P<text>[^\]]+)\]\((?P<url>[^)]+)\)')
+        def scan(block_end):
+            if not LinkExtractor.SCAN_HINT_RE.search(content, block_start, block_end):
+                return ()
+            return LinkExtractor._scan_text(content, block_start, block_end, block_line)
         
-        # Find all markdown style links, excluding those in code blocks
-        md_links = []
-        for match in md_link_pattern.finditer(content):
-            if not is_in_code_block(match.start()):
-                md_links.append((match.group('text'), match.group('url')))
+        while pos < end:
+            eol = content.find('\n', pos)
+            next_pos = end if eol == -1 else eol + 1
+            line = content[pos:next_pos]
+            stripped = line.lstrip(' \t')
+            
+            if fence:
+                closing = stripped.rstrip()
+                if closing.startswith(fence) and not closing.strip(fence[0]):
+                    fence = None
+                    previous_blank = True  # What follows can't continue a paragraph
+            elif not stripped or stripped.isspace():
+                if block_start is not None:
+                    yield from scan(pos)
+                    block_start = None
+                previous_blank = True
+            else:
+                indent = len(line) - len(stripped)
+                if '\t' in line[:indent]:
+                    indent = len(line[:indent].expandtabs(4))
+                
+                # Less indented than the container's content, a new paragraph leaves it;
+                # a line continuing a paragraph doesn't
+                while containers and indent < containers[-1] and block_start is None:
+                    containers.pop()
+                base = containers[-1] if containers else 0
+                
+                is_code = False
+                if (m := LinkExtractor.FENCE_RE.match(stripped)) and not (
+                    m.group(1)[0] == '`' and '`' in stripped[m.end():]  # Inline code
+                ):
+                    fence = m.group(1)
+                    is_code = True
+                elif indent >= base + 4 and (previous_blank or in_indented_code):
+                    is_code = True
+                in_indented_code = is_code and not fence
+                previous_blank = False
+                
+                if is_code:
+                    if block_start is not None:
+                        yield from scan(pos)
+                        block_start = None
+                else:
+                    if LinkExtractor.CONTAINER_RE.match(stripped):
+                        containers.append(indent + 4)
+                    if block_start is None:
+                        block_start, block_line = pos, number
+            
+            # Skip ahead to the next line that can change any of the above
+            if fence:
+                m = LinkExtractor._closing_fence(fence).search(content, next_pos)
+            elif block_start is not None:
+                m = LinkExtractor.PARAGRAPH_BREAK_RE.search(content, next_pos)
+            else:
+                m = None
+            target = next_pos if m is None and not fence and block_start is None else (
+                m.start() if m else end)
+            number += content.count('\n', pos, target)
+            pos = target
         
-        return md_links
+        if block_start is not None:
+            yield from scan(end)
     
     @staticmethod
-    def extract_image_refs(content: str) -> List[str]:
-        """Extract image references from markdown content."""
-        # Match ![alt](url) pattern
-        pattern = r'!\[[^\]]*\]\(([^)]+)\)'
-        return re.findall(pattern, content)
+    def _closing_fence(fence: str) -> re.Pattern:
+        """Pattern for the line closing a fenced block opened by fence."""
+        if fence not in LinkExtractor._closing_fences:
+            LinkExtractor._closing_fences[fence] = re.compile(
+                rf'^[ \t]*{re.escape(fence)}{re.escape(fence[0])}*[^\S\n]*$', re.MULTILINE
+            )
+        return LinkExtractor._closing_fences[fence]
     
+    @staticmethod
+    def _scan_text(content: str, start: int, end: int, line: int) -> Iterator[LinkToken]:
+        """Scan content[start:end], a text block starting on the given line."""
+        # Where each backtick run of a given length is, to find the end of a code
+        # span without searching ahead from every opening run
+        runs: Optional[Dict[int, List[int]]] = None
+        next_run: Dict[int, int] = {}
+        
+        line_start = start
+        pos = start
+        while m := LinkExtractor.INLINE_RE.search(content, pos, end):
+            pos = m.end()
+            if ticks := m.group('ticks'):
+                # Skip to the closing run of the same length, if there is one
+                if runs is None:
+                    runs = {}
+                    for r in LinkExtractor.BACKTICKS_RE.finditer(content, m.start(), end):
+                        runs.setdefault(len(r.group()), []).append(r.start())
+                    next_run = dict.fromkeys(runs, 0)
+                n = len(ticks)
+                positions = runs[n]
+                i = next_run[n]
+                while i < len(positions) and positions[i] < pos:
+                    i += 1
+                next_run[n] = i
+                if i < len(positions):
+                    pos = positions[i] + n
+                    next_run[n] = i + 1
+                continue
+            
+            # Advance the line count to the match
+            while (newline := content.find('\n', line_start, m.start())) != -1:
+                line += 1
+                line_start = newline + 1
+            
+            indent = content[line_start:m.start()]
+            
+            if m.group('src') is not None:
+                yield LinkToken('image', m.group('alt'), m.group('src'), line,
+                                m.start() - line_start + 1)
+            elif m.group('target') is not None:
+                if len(indent) > 3 or indent.strip(' '):
+                    pos = m.start() + 1  # Not a definition; look for links in it
+                    continue
+                yield LinkToken('definition', m.group('label'), m.group('target'), line,
+                                m.start('label') - line_start)
+            elif m.group('url') is not None:
+                yield LinkToken('link', m.group('text'), m.group('url'), line,
+                                m.start() - line_start + 1)
+            elif (heading := m.group('heading')) is not None:
+                if indent.strip(' \t'):
+                    continue
+                # The heading's own attribute list, if any, is also found as an anchor
+                heading_id = ''
+                if attrs := LinkExtractor.HEADING_ATTRS_RE.search(heading):
+                    heading = heading[:attrs.start()]
+                    if id_match := LinkExtractor._attr_list_id(attrs.group(1)):
+                        heading_id = id_match
+                yield LinkToken('heading', heading.strip().rstrip('#').strip(), heading_id,
+                                line, m.start() - line_start + 1)
+            elif (attrs := m.group('attrs')) is not None:
+                if anchor_id := LinkExtractor._attr_list_id(attrs):
+                    yield LinkToken('anchor', '', anchor_id, line, m.start() - line_start + 1)
+            else:
+                yield LinkToken('anchor', '', m.group('html_id'), line,
+                                m.start() - line_start + 1)
+
+    @staticmethod
+    def _attr_list_id(attrs: str) -> Optional[str]:
+        """The id set by an attribute list's content, if it is one and sets an id."""
+        if not LinkExtractor.ATTR_LIST_RE.fullmatch(attrs):
+            return None
+        m = None
+        for m in LinkExtractor.ATTR_ID_RE.finditer(attrs):
+            pass  # The last id wins
+        return m.group(1) if m else None
+
     @staticmethod
     def categorise_link(url: str) -> str:
         """Categorise a link as internal, external, anchor, etc."""
@@ -186,17 +571,188 @@ class LinkExtractor:
             return 'internal'
 
 
+class LinkScope(NamedTuple):
+    """
+    Where in an HTML page to collect links: inside the elements with one of the
+    tags, and if classes are given, one of the classes; only inside the first
+    such element if first is set. With no tags, the whole page.
+    """
+    tags: FrozenSet[str] = frozenset()
+    classes: FrozenSet[str] = frozenset()
+    first: bool = False
+
+
+class _ScopedLinkCollector:
+    """
+    Collect the hrefs of <a> elements in each of a list of LinkScopes, from the
+    start and end tags of a page, as given by any of the parser backends, and the
+    ids a fragment can link to: those of all elements, and the names of <a>s.
+    """
+
+    def __init__(self, scopes: List[LinkScope]):
+        self.scopes = scopes
+        # A scope's links are None until an element of it is found
+        self.links: List[Optional[List[str]]] = [
+            None if scope.tags else [] for scope in scopes
+        ]
+        # The [tag, nesting depth] of the element each scope is collecting in
+        self.open: List[Optional[List]] = [None] * len(scopes)
+        self.finished = [False] * len(scopes)
+        self.tags = frozenset().union(*(scope.tags for scope in scopes))
+        self.ids: Set[str] = set()
+
+    def start(self, tag: str, attrs: Dict[str, Optional[str]]):
+        if 'id' in attrs:
+            self.ids.add(attrs['id'] or '')
+        if tag in self.tags:
+            for i, scope in enumerate(self.scopes):
+                state = self.open[i]
+                if state is not None:
+                    if state[0] == tag:
+                        state[1] += 1
+                elif tag in scope.tags and not self.finished[i] and (
+                    not scope.classes
+                    or not scope.classes.isdisjoint((attrs.get('class') or '').split())
+                ):
+                    self.open[i] = [tag, 1]
+                    if self.links[i] is None:
+                        self.links[i] = []
+        elif tag == 'a' and 'name' in attrs and 'href' not in attrs:
+            self.ids.add(attrs['name'] or '')
+        elif tag == 'a' and 'href' in attrs:
+            href = attrs['href'] or ''
+            for i, links in enumerate(self.links):
+                if links is not None and (self.open[i] is not None or not self.scopes[i].tags):
+                    links.append(href)
+
+    def end(self, tag: str):
+        if tag in self.tags:
+            for i, state in enumerate(self.open):
+                if state is not None and state[0] == tag:
+                    state[1] -= 1
+                    if not state[1]:
+                        self.open[i] = None
+                        self.finished[i] = self.scopes[i].first
+
+    def data(self, data: str):
+        pass
+
+    def close(self) -> List[Optional[List[str]]]:
+        return self.links
+
+
+class _StreamingLinkParser(HTMLParser):
+    """html.parser events, passed on to a _ScopedLinkCollector without building a tree."""
+
+    def __init__(self, collector: _ScopedLinkCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+
 class HTMLLinkExtractor:
-    """Extract links from HTML content using BeautifulSoup."""
-    
+    """
+    Extract links from HTML content.
+
+    Pages are parsed by one of the BACKENDS: with lxml's C parser where lxml is
+    installed, or otherwise with a streaming html.parser, neither of which builds
+    a tree; or with BeautifulSoup, as the reference.
+    """
+
+    BACKENDS = ('lxml', 'html.parser', 'bs4')
+    DEFAULT_BACKEND = 'lxml' if etree is not None else 'html.parser'
+
     @staticmethod
-    def extract_links(html_content: str) -> List[str]:
+    def extract_links(html_content: str, backend: Optional[str] = None) -> List[str]:
         """Extract all links from HTML content."""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        links = []
-        for a_tag in soup.find_all('a', href=True):
-            links.append(a_tag['href'])
-        return links
+        return HTMLLinkExtractor.extract_scoped_links(html_content, [LinkScope()], backend)[0]
+
+    @staticmethod
+    def extract_scoped_links(html_content: str, scopes: List[LinkScope],
+                             backend: Optional[str] = None) -> List[Optional[List[str]]]:
+        """
+        The hrefs of the <a> elements in each scope, in document order, or None
+        for a scope no element of the page is in.
+        """
+        return HTMLLinkExtractor._collect(html_content, scopes, backend).close()
+
+    @staticmethod
+    def extract_scoped_links_and_ids(
+        html_content: str, scopes: List[LinkScope], backend: Optional[str] = None
+    ) -> Tuple[List[Optional[List[str]]], Set[str]]:
+        """
+        The hrefs in each scope, as by extract_scoped_links, and the ids in the
+        whole page a #fragment can link to, from a single parse.
+        """
+        collector = HTMLLinkExtractor._collect(html_content, scopes, backend)
+        return collector.close(), collector.ids
+
+    @staticmethod
+    def _collect(html_content: str, scopes: List[LinkScope],
+                 backend: Optional[str] = None) -> _ScopedLinkCollector:
+        backend = backend or HTMLLinkExtractor.DEFAULT_BACKEND
+        collector = _ScopedLinkCollector(list(scopes))
+        if backend == 'lxml':
+            if etree is None:
+                raise ValueError("The lxml backend needs lxml installed")
+            parser = etree.HTMLParser(target=collector)
+            parser.feed(html_content)
+            parser.close()
+        elif backend == 'html.parser':
+            parser = _StreamingLinkParser(collector)
+            parser.feed(html_content)
+            parser.close()
+        elif backend == 'bs4':
+            HTMLLinkExtractor._walk_tree(BeautifulSoup(html_content, 'html.parser'), collector)
+        else:
+            raise ValueError(f"Unknown HTML parser backend: {backend}")
+        return collector
+
+    @staticmethod
+    def _walk_tree(element: Tag, collector: _ScopedLinkCollector):
+        for child in element.children:
+            if isinstance(child, Tag):
+                attrs = {
+                    name: ' '.join(value) if isinstance(value, list) else value
+                    for name, value in child.attrs.items()
+                }
+                collector.start(child.name, attrs)
+                HTMLLinkExtractor._walk_tree(child, collector)
+                collector.end(child.name)
+
+
+class AnchorIndex:
+    """
+    Anchor ids of markdown pages, by path, so that each #fragment link is checked
+    with a lookup. Pages not added beforehand are read when first looked up.
+    """
+
+    def __init__(self):
+        self.anchors: Dict[str, Set[str]] = {}
+
+    def add(self, path: str, anchors: Set[str]):
+        """Record the anchors of a page already tokenised."""
+        self.anchors[os.path.abspath(path)] = anchors
+
+    def get(self, path: str) -> Set[str]:
+        """The anchor ids of a page; none if it can't be read."""
+        full_path = os.path.abspath(path)
+        if full_path not in self.anchors:
+            try:
+                with open(full_path, 'r', encoding='utf-8') as f:
+                    self.anchors[full_path] = LinkExtractor.extract_anchors(f.read())
+            except (OSError, UnicodeDecodeError):
+                self.anchors[full_path] = set()
+        return self.anchors[full_path]
+
+    def has_anchor(self, path: str, anchor: str) -> bool:
+        """Check that a fragment names an anchor of a page. 'top' always does."""
+        return anchor == 'top' or anchor in self.get(path)
 
 
 class MkDocsRepo:
@@ -208,6 +764,9 @@ class MkDocsRepo:
         self.resolver = PathResolver(root_dir)
         self._main_config = None
         self._site_mappings = None
+        self._path_index = None
+        self._subsite_index = None
+        self._docs_dirs = {}
     
     @property
     def main_config(self) -> Dict:
@@ -227,6 +786,20 @@ class MkDocsRepo:
             self._build_site_mappings()
         return self._site_mappings
     
+    @property
+    def path_index(self) -> 'PathIndex':
+        """Index of the files and directories in the repo, built on first use."""
+        if self._path_index is None:
+            self._path_index = PathIndex(self.root_dir)
+        return self._path_index
+
+    @property
+    def subsite_index(self) -> 'SubsiteIndex':
+        """Lookup of the subsite a path is in, built on first use."""
+        if self._subsite_index is None:
+            self._subsite_index = SubsiteIndex(self.root_dir, self.site_mappings)
+        return self._subsite_index
+
     def _build_site_mappings(self):
         """Build subsite name to directory mappings from included subsites."""
         if 'nav' not in self.main_config:
@@ -265,19 +838,25 @@ class MkDocsRepo:
                     name = os.path.basename(os.path.dirname(include_path))
                     yield name, os.path.dirname(include_path), config
     
+    def docs_dir(self, site_dir: str) -> str:
+        """
+        The docs directory of the main site or a subsite: its mkdocs.yml's docs_dir,
+        relative to the site directory, or 'docs' when not set.
+        """
+        site_dir = os.path.abspath(site_dir)
+        if site_dir not in self._docs_dirs:
+            if site_dir == self.root_dir:
+                config = self.main_config
+            else:
+                config = self.loader.load_file(os.path.join(site_dir, 'mkdocs.yml')) or {}
+            self._docs_dirs[site_dir] = os.path.join(site_dir, config.get('docs_dir') or 'docs')
+        return self._docs_dirs[site_dir]
+    
     def iter_all_markdown_files(self) -> Iterator[str]:
         """Iterate over all markdown files in all subsites."""
-        # Main docs directory
-        main_docs = os.path.join(self.root_dir, 'docs')
-        if os.path.exists(main_docs):
-            for root, _, files in os.walk(main_docs):
-                for file in files:
-                    if file.endswith('.md'):
-                        yield os.path.join(root, file)
-        
-        # Subsite docs directories
-        for _, path, _ in self.iter_subsites():
-            docs_dir = os.path.join(path, 'docs')
+        site_dirs = [self.root_dir] + [path for _, path, _ in self.iter_subsites()]
+        for site_dir in site_dirs:
+            docs_dir = self.docs_dir(site_dir)
             if os.path.exists(docs_dir):
                 for root, _, files in os.walk(docs_dir):
                     for file in files:
@@ -341,16 +920,8 @@ class MkDocsRepo:
         Returns:
             Subsite name or 'root' if not in a subsite
         """
-        rel_path = os.path.relpath(file_path, self.root_dir)
-        
-        # Check against site directory mappings
-        for url_name, site_dir in self.site_mappings.items():
-            site_rel_path = os.path.relpath(site_dir, self.root_dir)
-            if rel_path.startswith(site_rel_path + os.sep):
-                # Return the directory name as the subsite identifier
-                return os.path.basename(site_dir)
-        
-        return 'root'
+        # Subsites are named after their directory
+        return self.subsite_index.lookup(file_path) or 'root'
 
 
 class LinkValidator:
@@ -359,18 +930,35 @@ class LinkValidator:
     @staticmethod
     def is_valid_relative_path(source_file: str, relative_link: str, 
                               root_dir: Optional[str] = None,
-                              site_mappings: Optional[Dict[str, str]] = None) -> bool:
+                              site_mappings: Optional[Dict[str, str]] = None,
+                              path_index: Optional[PathIndex] = None,
+                              subsite_index: Optional[SubsiteIndex] = None) -> bool:
         """
         Check if a relative link from source_file is valid.
         
         This is an exact port of the validate_links logic from the original dangling_links.py.
+        Candidate paths are looked up in path_index if given, rather than on disk,
+        and the source file's subsite in subsite_index, rather than in site_mappings.
         """
-        base_dir = os.path.dirname(source_file)
-        subsites = site_mappings or {}
-        
-        # Skip external links, anchor links, and mailto links
         if relative_link.startswith(('http://', 'https://', '#', 'mailto:')):
             return True
+        return LinkValidator.resolve_relative_path(
+            source_file, relative_link, root_dir, site_mappings, path_index, subsite_index
+        ) is not None
+    
+    @staticmethod
+    def resolve_relative_path(source_file: str, relative_link: str,
+                              root_dir: Optional[str] = None,
+                              site_mappings: Optional[Dict[str, str]] = None,
+                              path_index: Optional[PathIndex] = None,
+                              subsite_index: Optional[SubsiteIndex] = None) -> Optional[str]:
+        """
+        The path a relative link from source_file resolves to, or None if there is
+        no such file or directory. A link with no path resolves to source_file.
+        """
+        exists = path_index.exists if path_index is not None else os.path.exists
+        base_dir = os.path.dirname(source_file)
+        subsites = site_mappings or {}
         
         # Handle URLs with anchors or query parameters
         url_parts = relative_link.split('#')[0].split('?')[0]
@@ -380,20 +968,14 @@ class LinkValidator:
         path = unquote(parsed_url.path)
         
         if not path:  # Just an anchor
-            return True
+            return source_file
         
         # Determine which subsite the current file belongs to
         current_subsite = None
         if root_dir and subsites:
-            rel_file_path = os.path.relpath(source_file, root_dir)
-            for subsite_name, subsite_path in subsites.items():
-                if rel_file_path.startswith(subsite_path + os.sep):
-                    current_subsite = subsite_name
-                    break
-        
-        # Initialize variables to track if we found a valid target
-        target_found = False
-        checked_paths = []
+            if subsite_index is None:
+                subsite_index = SubsiteIndex(root_dir, subsites)
+            current_subsite = subsite_index.lookup(source_file)
         
         # Determine the target file path
         if os.path.isabs(path):
@@ -518,13 +1100,34 @@ class LinkValidator:
         
         # Check all possible paths
         for check_path in paths_to_check:
-            checked_paths.append(check_path)
-            if os.path.exists(check_path):
-                target_found = True
-                break
+            if exists(check_path):
+                return check_path
         
         # If still not found, report as invalid
-        return target_found
+        return None
+    
+    @staticmethod
+    def resolve_link(source_file: str, url: str,
+                     root_dir: Optional[str] = None,
+                     site_mappings: Optional[Dict[str, str]] = None,
+                     path_index: Optional[PathIndex] = None,
+                     subsite_index: Optional[SubsiteIndex] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Resolve a local link from source_file to (target path, anchor). The target
+        is None if there is no such file; a link to a directory is to its index
+        page, if it has one. The anchor is None if the link has no fragment.
+        """
+        exists = path_index.exists if path_index is not None else os.path.exists
+        target = LinkValidator.resolve_relative_path(
+            source_file, url.split('#')[0].split('?')[0], root_dir, site_mappings,
+            path_index, subsite_index
+        )
+        if target is not None and not target.endswith('.md'):
+            index_page = os.path.join(target, 'index.md')
+            if exists(index_page):
+                target = index_page
+        anchor = LinkValidator.extract_anchor(url)
+        return target, unquote(anchor) if anchor else None
     
     @staticmethod
     def extract_anchor(url: str) -> Optional[str]:
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Run the documentation health checks in one pass over the repo.
+
+The checks of check_yml_files.py, dangling_links.py, find_ghost_pages.py and
+check_search_exclusions.py each walk the tree, parse the mkdocs.yml files and
+read the markdown again. Here the tree is walked and the nav parsed once, each
+markdown file any check needs is read and tokenised once, by a pool of worker
+processes, and the results go to every check that asked for the file. The
+report covers all checks, with the time each took.
+
+Checks are classes registered with @register_check; see Check.
+
+Usage:
+    doccheck.py [--dir DIR] [--check NAME ...] [--json] [--jobs N]
+"""
+
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Add the utils directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import check_search_exclusions
+import dangling_links
+from doc_utils import AnchorIndex, LinkExtractor, LinkToken, MkDocsRepo, NavTraverser
+
+# Checks by name, in the order they run and are reported
+CHECKS: Dict[str, type] = {}
+
+# Set in each worker process by _init_worker
+_context = None
+
+
+class NavEntry(NamedTuple):
+    """A markdown file named in the nav of a mkdocs.yml."""
+    config: str  # The mkdocs.yml
+    base_path: str  # Its directory
+    file_ref: str  # As written in the nav
+    path: str  # Where mkdocs looks for it
+
+
+class Finding(NamedTuple):
+    """A problem found by a check."""
+    path: str  # Relative to the root
+    line: Optional[int]
+    column: Optional[int]
+    message: str
+
+
+class Tree:
+    """
+    What the checks share: the layout of the repo and its nav, found with a
+    single walk of the tree. Passed to the worker processes, so kept to plain data.
+    """
+
+    def __init__(self, root_dir: str):
+        repo = MkDocsRepo(root_dir)
+        self.root_dir = repo.root_dir
+        self.site_mappings = repo.site_mappings
+        self.path_index = repo.path_index
+        self.subsite_index = repo.subsite_index
+
+        # The docs directory of the main site and each subsite, with a trailing separator
+        site_dirs = [self.root_dir] + [
+            os.path.join(self.root_dir, site_dir) for site_dir in self.site_mappings.values()
+        ]
+        self.docs_roots = tuple(
+            os.path.join(repo.docs_dir(site_dir), '') for site_dir in site_dirs
+            if self.path_index.exists(os.path.join(repo.docs_dir(site_dir), ''))
+        )
+
+        def nav_path(base_path, file_ref):
+            docs_dir = os.path.relpath(repo.docs_dir(base_path), base_path)
+            return repo.resolver.markdown_file_path(base_path, file_ref, docs_dir)
+
+        # The main nav and each subsite's; then the subsites' print navs
+        self.nav: List[NavEntry] = []
+        for base_path, file_ref in repo.iter_nav_files():
+            config = os.path.join(base_path, 'mkdocs.yml')
+            self.nav.append(NavEntry(config, base_path, file_ref, nav_path(base_path, file_ref)))
+        self.print_nav: List[NavEntry] = []
+        for _, config_path in repo.find_print_configs():
+            config = repo.loader.load_file(config_path)
+            if config and 'nav' in config:
+                base_path = os.path.dirname(config_path)
+                for file_ref in sorted(NavTraverser.extract_markdown_files(config['nav'])):
+                    self.print_nav.append(NavEntry(
+                        config_path, base_path, file_ref, nav_path(base_path, file_ref)))
+
+        self.markdown_files = sorted(
+            path for path in self.path_index.files if path.endswith('.md')
+        )
+
+    def relpath(self, path: str) -> str:
+        if path.startswith(self.root_dir + os.sep):
+            return path[len(self.root_dir) + 1:]
+        return os.path.relpath(path, self.root_dir)
+
+
+class Page:
+    """A markdown file, read once for all the checks that look at it."""
+
+    def __init__(self, path: str, content: str):
+        self.path = path
+        self.content = content
+        self._tokens = None
+
+    @property
+    def tokens(self) -> List[LinkToken]:
+        """The page's links, images, headings and anchors, tokenised on first use."""
+        if self._tokens is None:
+            self._tokens = list(LinkExtractor.tokenize(self.content))
+        return self._tokens
+
+
+class Check(ABC):
+    """
+    A documentation health check.
+
+    A check names the markdown files it wants to look at in pages(). Each is
+    read once, whichever checks want it, and passed to check_page() in a worker
+    process; the results, which must pickle, are passed back to report(), in the
+    order pages() gave, to turn into findings. A check that only looks at the
+    tree as a whole just overrides report(), which every check must.
+    """
+
+    name = ''
+    description = ''
+    # Whether the check's findings fail the run, or are just for information
+    fails = True
+
+    def pages(self, tree: Tree) -> Iterable[str]:
+        """The markdown files to look at."""
+        return ()
+
+    def check_page(self, tree: Tree, page: Page) -> Any:
+        """Look at one file. Runs in a worker process."""
+        return None
+
+    @abstractmethod
+    def report(self, tree: Tree, results: Dict[str, Any]) -> List[Finding]:
+        """The findings, from the results of check_page by path."""
+
+
+def register_check(cls):
+    """Class decorator adding a Check to the ones doccheck runs."""
+    if inspect.isabstract(cls):
+        missing = ', '.join(sorted(cls.__abstractmethods__))
+        raise TypeError(f"Check {cls.__name__} does not implement {missing}")
+    CHECKS[cls.name] = cls
+    return cls
+
+
+@register_check
+class NavCheck(Check):
+    """The check of check_yml_files.py."""
+
+    name = 'nav'
+    description = 'Files named in a nav that do not exist'
+
+    def report(self, tree, results):
+        # Each file once, though it may be in both a subsite's nav and its print nav
+        entries = {(entry.base_path, entry.file_ref): entry
+                   for entry in reversed(tree.nav + tree.print_nav)}
+        findings = []
+        for _, entry in sorted(entries.items()):
+            if not tree.path_index.exists(entry.path):
+                findings.append(Finding(tree.relpath(entry.config), None, None,
+                                        f'Missing: {entry.file_ref} '
+                                        f'(expected at {tree.relpath(entry.path)})'))
+        return findings
+
+
+@register_check
+class LinkCheck(Check):
+    """The check of dangling_links.py."""
+
+    name = 'links'
+    description = 'Links from nav pages to missing files or anchors'
+
+    def pages(self, tree):
+        return sorted({entry.path for entry in tree.nav
+                       if tree.path_index.exists(entry.path)})
+
+    def check_page(self, tree, page):
+        return dangling_links.check_tokens(
+            page.path, page.tokens, tree.root_dir, tree.site_mappings,
+            tree.path_index, tree.subsite_index)
+
+    def report(self, tree, results):
+        anchor_index = AnchorIndex()
+        for path, result in results.items():
+            anchor_index.add(path, result.anchors)
+
+        findings = []
+        for path, result in results.items():
+            page_findings = [
+                (line, column, f'Target not found: {url}')
+                for _, url, line, column in result.dangling_links
+            ]
+            for _, url, line, column, target, anchor in result.fragment_links:
+                if not anchor_index.has_anchor(target, anchor):
+                    page_findings.append(
+                        (line, column, f'Anchor not found: #{anchor} in {tree.relpath(target)}'))
+            for line, column, message in sorted(page_findings):
+                findings.append(Finding(tree.relpath(path), line, column, message))
+        return findings
+
+
+@register_check
+class GhostCheck(Check):
+    """The check of find_ghost_pages.py."""
+
+    name = 'ghosts'
+    description = 'Pages under a docs directory that are in no nav'
+    fails = False
+
+    def report(self, tree, results):
+        nav_paths = set()
+        for entry in tree.nav:
+            path = entry.path
+            if not tree.path_index.exists(path) and not entry.file_ref.startswith('/'):
+                # Fall back to the site directory, as mkdocs does
+                path = os.path.join(entry.base_path, entry.file_ref)
+            nav_paths.add(os.path.normpath(path))
+
+        return [
+            Finding(tree.relpath(path), None, None, 'Not in any nav')
+            for path in tree.markdown_files
+            if path.startswith(tree.docs_roots) and path not in nav_paths
+        ]
+
+
+@register_check
+class SearchExclusionCheck(Check):
+    """The check of check_search_exclusions.py."""
+
+    name = 'search-exclusions'
+    description = 'Pages excluded from search that have a hidden synonym div'
+
+    def pages(self, tree):
+        return [path for path in tree.markdown_files
+                if tree.subsite_index.lookup(path) is not None]
+
+    def check_page(self, tree, page):
+        return check_search_exclusions.check_content(page.path, page.content)
+
+    def report(self, tree, results):
+        findings = []
+        for path, conflict in results.items():
+            if conflict is None:
+                continue
+            message = (f"Excluded from search, but has a hidden synonym div "
+                       f"at line {conflict['div_line']}")
+            if conflict['symbol']:
+                message += f" for '{conflict['symbol']}'"
+            if conflict['wrong_order']:
+                message += ', before the front matter'
+            findings.append(Finding(tree.relpath(path), conflict['exclude_line'], None, message))
+        return findings
+
+
+def _init_worker(tree, checks):
+    global _context
+    _context = (tree, {check.name: check for check in checks})
+
+
+def _check_page(item: Tuple[str, List[str]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Read a file and run the named checks on it. Returns results and timings by check."""
+    path, names = item
+    tree, checks = _context
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            page = Page(path, f.read())
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error reading {path}: {e}", file=sys.stderr)
+        return {}, {}
+
+    results = {}
+    timings = {}
+    for name in names:
+        start = time.perf_counter()
+        results[name] = checks[name].check_page(tree, page)
+        timings[name] = time.perf_counter() - start
+    return results, timings
+
+
+def run_checks(root_dir: str, names: Optional[List[str]] = None,
+               jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run the named checks, or all of them, over the repo. Returns the report:
+    the findings of each check and the time spent in it, summed over the worker
+    processes, and the time taken to scan the tree and in all.
+    """
+    start = time.perf_counter()
+    checks = [CHECKS[name]() for name in (names or CHECKS)]
+    tree = Tree(root_dir)
+
+    # The files each check wants, and the checks wanting each file
+    check_pages = {check.name: list(check.pages(tree)) for check in checks}
+    wanted: Dict[str, List[str]] = {}
+    for name, paths in check_pages.items():
+        for path in paths:
+            wanted.setdefault(path, []).append(name)
+    scan_seconds = time.perf_counter() - start
+
+    page_results = {}
+    timings = dict.fromkeys(check_pages, 0.0)
+    items = list(wanted.items())
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(items) < 2:
+        _init_worker(tree, checks)
+        results = map(_check_page, items)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(tree, checks))
+        results = executor.map(_check_page, items,
+                               chunksize=max(1, len(items) // (jobs * 4)))
+    try:
+        for (path, _), (page_result, page_timings) in zip(items, results):
+            page_results[path] = page_result
+            for name, seconds in page_timings.items():
+                timings[name] += seconds
+    finally:
+        if executor:
+            executor.shutdown()
+
+    report = {
+        'root': tree.root_dir,
+        'files_read': len(items),
+        'scan_seconds': round(scan_seconds, 3),
+        'checks': {},
+    }
+    for check in checks:
+        check_start = time.perf_counter()
+        results = {path: page_results[path][check.name]
+                   for path in check_pages[check.name] if check.name in page_results[path]}
+        findings = check.report(tree, results)
+        timings[check.name] += time.perf_counter() - check_start
+        report['checks'][check.name] = {
+            'description': check.description,
+            'fails': check.fails,
+            'seconds': round(timings[check.name], 3),
+            'problems': len(findings),
+            'findings': [finding._asdict() for finding in findings],
+        }
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def print_report(report: Dict[str, Any], summary_only: bool = False):
+    """Print a report as text."""
+    for name, check in report['checks'].items():
+        label = '' if check['fails'] else ' (for information)'
+        print(f"{name}: {check['description']}{label}")
+        print(f"  {check['problems']} found in {check['seconds']:.2f}s")
+        if not summary_only:
+            for finding in check['findings']:
+                location = ':'.join(
+                    str(part) for part in (finding['path'], finding['line'], finding['column'])
+                    if part is not None
+                )
+                print(f"  {location}: {finding['message']}")
+        print()
+    print(f"Read {report['files_read']} files; scanned the tree in "
+          f"{report['scan_seconds']:.2f}s, {report['seconds']:.2f}s in all")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the documentation health checks in one pass over the repo."
+    )
+    parser.add_argument(
+        "--dir",
+        default=".",
+        help="Directory containing mkdocs.yml (defaults to current directory)",
+    )
+    parser.add_argument(
+        "--check",
+        action="append",
+        choices=list(CHECKS),
+        help="Run only this check; may be repeated (defaults to all checks)",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Write the report as JSON"
+    )
+    parser.add_argument(
+        "--summary", action="store_true", help="Show only the number of problems per check"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of files to check in parallel (defaults to the number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(os.path.join(args.dir, "mkdocs.yml")):
+        sys.exit(f"Error: No mkdocs.yml found in '{args.dir}'")
+
+    report = run_checks(args.dir, args.check, args.jobs)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report, args.summary)
+
+    failed = any(check['problems'] and check['fails'] for check in report['checks'].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
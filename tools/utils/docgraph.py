@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+A persistent store of the documentation's link graph, in SQLite.
+
+The store holds every markdown page under the docs directories, which of them
+are in the nav, each page's headings and anchors, and its outgoing links and
+image references with their resolution status. Updates are incremental: only
+pages whose size or mtime have changed are read, and only those whose content
+has changed are tokenised again. Questions like "who links to this page" are
+then answered with a query rather than a re-parse of the tree.
+
+Usage:
+    docgraph.py update                  # Bring the store up to date
+    docgraph.py inbound PAGE            # Links to PAGE
+    docgraph.py orphans [--all]         # Nav pages no other page links to
+    docgraph.py ghosts                  # Pages not in the nav
+    docgraph.py dangling [--all]        # Links to missing files or anchors
+    docgraph.py links SUBSTRING         # Links whose URL contains SUBSTRING
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+# Add the utils directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from doc_utils import LinkExtractor, LinkValidator, MkDocsRepo, PathIndex, SubsiteIndex
+
+DEFAULT_DB = '.docgraph.sqlite'
+SCHEMA_VERSION = '1'
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE pages (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,  -- Relative to the root
+    subsite TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE nav (
+    path TEXT NOT NULL,  -- Relative to the root; the file may not exist
+    subsite TEXT NOT NULL,  -- Whose nav it is in
+    PRIMARY KEY (path, subsite)
+);
+CREATE TABLE anchors (
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    anchor TEXT NOT NULL,
+    kind TEXT NOT NULL,  -- 'heading' or 'anchor'
+    text TEXT NOT NULL,  -- Heading text
+    line INTEGER NOT NULL
+);
+CREATE TABLE links (
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    url TEXT NOT NULL,
+    target TEXT,  -- Resolved path, relative to the root
+    anchor TEXT,
+    status TEXT NOT NULL  -- 'ok', 'missing', 'missing-anchor' or 'external'
+);
+CREATE TABLE images (
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    alt TEXT NOT NULL,
+    url TEXT NOT NULL,
+    target TEXT,  -- Resolved path, relative to the root
+    status TEXT NOT NULL  -- 'ok', 'missing' or 'external'
+);
+CREATE INDEX anchors_page ON anchors(page_id, anchor);
+CREATE INDEX links_page ON links(page_id);
+CREATE INDEX links_target ON links(target);
+CREATE INDEX images_page ON images(page_id);
+"""
+
+# Links and images that aren't checked
+EXTERNAL_LINK_PREFIXES = ('http://', 'https://', 'mailto:', 'javascript:')
+EXTERNAL_IMAGE_PREFIXES = ('http://', 'https://', 'data:')
+
+
+class DocGraph:
+    """The link graph of the documentation, kept in an SQLite database."""
+
+    def __init__(self, root_dir: str, db_path: Optional[str] = None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.db_path = db_path or os.path.join(self.root_dir, DEFAULT_DB)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        try:
+            schema = self._get_meta('schema')
+        except sqlite3.OperationalError:
+            schema = None
+        if schema != SCHEMA_VERSION:
+            self._create()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _create(self):
+        """Create the tables, dropping any from another version of the schema."""
+        with self.conn:
+            tables = [row[0] for row in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")]
+            for table in tables:
+                self.conn.execute(f'DROP TABLE "{table}"')
+            self.conn.executescript(SCHEMA)
+            self._set_meta('schema', SCHEMA_VERSION)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _relpath(self, path: str) -> str:
+        if path.startswith(self.root_dir + os.sep):
+            return os.path.normpath(path[len(self.root_dir) + 1:])
+        return os.path.relpath(path, self.root_dir)
+
+    # Updating
+
+    def update(self) -> Dict[str, int]:
+        """
+        Bring the store up to date with the tree. Returns the number of pages
+        added, changed, removed and unchanged.
+        """
+        repo = MkDocsRepo(self.root_dir)
+        path_index = repo.path_index
+        counts = dict.fromkeys(('added', 'changed', 'removed', 'unchanged'), 0)
+
+        with self.conn:
+            # The nav only needs loading when a config file has changed
+            config_files = [os.path.join(self.root_dir, 'mkdocs.yml')] + [
+                os.path.join(self.root_dir, site_dir, 'mkdocs.yml')
+                for site_dir in sorted(repo.site_mappings.values())
+            ]
+            config_signature = json.dumps([
+                (self._relpath(path), os.stat(path).st_mtime_ns, os.stat(path).st_size)
+                for path in config_files if path_index.exists(path)
+            ])
+            config_changed = config_signature != self._get_meta('config')
+            if config_changed:
+                self._update_nav(repo, path_index)
+                self._set_meta('config', config_signature)
+
+            # Tokenise new and changed pages
+            stored = {
+                path: (page_id, mtime_ns, size, digest)
+                for page_id, path, mtime_ns, size, digest in self.conn.execute(
+                    'SELECT id, path, mtime_ns, size, hash FROM pages')
+            }
+            parsed = []
+            for full_path in self._iter_page_files(repo, path_index):
+                path = self._relpath(full_path)
+                stat = os.stat(full_path)
+                row = stored.pop(path, None)
+                if row and (row[1], row[2]) == (stat.st_mtime_ns, stat.st_size):
+                    counts['unchanged'] += 1
+                    continue
+
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha1(data).hexdigest()
+                if row and row[3] == digest:
+                    self.conn.execute('UPDATE pages SET mtime_ns = ?, size = ? WHERE id = ?',
+                                      (stat.st_mtime_ns, stat.st_size, row[0]))
+                    counts['unchanged'] += 1
+                    continue
+
+                subsite = repo.determine_file_subsite(full_path)
+                if row:
+                    page_id = row[0]
+                    self.conn.execute(
+                        'UPDATE pages SET subsite = ?, mtime_ns = ?, size = ?, hash = ? WHERE id = ?',
+                        (subsite, stat.st_mtime_ns, stat.st_size, digest, page_id))
+                    for table in ('anchors', 'links', 'images'):
+                        self.conn.execute(f'DELETE FROM {table} WHERE page_id = ?', (page_id,))
+                    counts['changed'] += 1
+                else:
+                    page_id = self.conn.execute(
+                        'INSERT INTO pages (path, subsite, mtime_ns, size, hash) VALUES (?, ?, ?, ?, ?)',
+                        (path, subsite, stat.st_mtime_ns, stat.st_size, digest)).lastrowid
+                    counts['added'] += 1
+                self._add_page_content(page_id, data.decode('utf-8', errors='replace'))
+                parsed.append((page_id, full_path))
+
+            for page_id, _, _, _ in stored.values():
+                self.conn.execute('DELETE FROM pages WHERE id = ?', (page_id,))
+                counts['removed'] += 1
+
+            # Where a link leads depends on which files exist, and on the site
+            # mappings; when neither has changed, only new links need resolving
+            tree_signature = hashlib.sha1('\n'.join(
+                sorted(path_index.files | path_index.dirs)).encode('utf-8')).hexdigest()
+            if config_changed or tree_signature != self._get_meta('tree'):
+                pages = [(page_id, os.path.join(self.root_dir, path))
+                         for page_id, path in self.conn.execute('SELECT id, path FROM pages')]
+                if config_changed:
+                    self.conn.executemany('UPDATE pages SET subsite = ? WHERE id = ?', [
+                        (repo.determine_file_subsite(full_path), page_id)
+                        for page_id, full_path in pages
+                    ])
+                self._set_meta('tree', tree_signature)
+            else:
+                pages = parsed
+            self._resolve_links(pages, repo.site_mappings, path_index, repo.subsite_index)
+            self._check_anchors()
+
+        return counts
+
+    def _iter_page_files(self, repo: MkDocsRepo, path_index: PathIndex):
+        """The markdown files under the docs directory of the main site and each subsite."""
+        docs_roots = self.docs_roots(repo)
+        for full_path in sorted(path_index.files):
+            if full_path.endswith('.md') and full_path.startswith(docs_roots):
+                yield full_path
+
+    def docs_roots(self, repo: Optional[MkDocsRepo] = None) -> Tuple[str, ...]:
+        """The docs directories of the main site and each subsite, with a trailing separator."""
+        repo = repo or MkDocsRepo(self.root_dir)
+        site_dirs = [self.root_dir] + [
+            os.path.join(self.root_dir, site_dir) for site_dir in repo.site_mappings.values()
+        ]
+        docs_dirs = [repo.docs_dir(site_dir) for site_dir in site_dirs]
+        return tuple(
+            os.path.join(docs_dir, '') for docs_dir in docs_dirs if os.path.isdir(docs_dir)
+        )
+
+    def _update_nav(self, repo: MkDocsRepo, path_index: PathIndex):
+        """Record the pages in the nav of the main site and each subsite."""
+        rows = set()
+        for base_path, file_ref in repo.iter_nav_files():
+            file_path = repo.resolver.markdown_file_path(
+                base_path, file_ref, os.path.relpath(repo.docs_dir(base_path), base_path))
+            if not path_index.exists(file_path) and not file_ref.startswith('/'):
+                # Fall back to the site directory, as mkdocs does
+                file_path = os.path.join(base_path, file_ref)
+            subsite = 'root' if base_path == repo.root_dir else os.path.basename(base_path)
+            rows.add((self._relpath(os.path.normpath(file_path)), subsite))
+        self.conn.execute('DELETE FROM nav')
+        self.conn.executemany('INSERT INTO nav (path, subsite) VALUES (?, ?)', sorted(rows))
+
+    def _add_page_content(self, page_id: int, content: str):
+        """Record the anchors, links and images of a page, for resolving afterwards."""
+        tokens = list(LinkExtractor.tokenize(content))
+        anchors = {}
+        for token, anchor_id in LinkExtractor.anchor_ids(tokens):
+            # A heading's attribute list is also found as an anchor; keep the heading
+            anchors.setdefault(anchor_id, (page_id, anchor_id, token.kind, token.text, token.line))
+        self.conn.executemany(
+            'INSERT INTO anchors (page_id, anchor, kind, text, line) VALUES (?, ?, ?, ?, ?)',
+            anchors.values())
+        self.conn.executemany(
+            "INSERT INTO links (page_id, line, col, text, url, status) VALUES (?, ?, ?, ?, ?, '')",
+            [(page_id, token.line, token.column, token.text, token.url)
+             for token in tokens if token.kind == 'link'])
+        self.conn.executemany(
+            "INSERT INTO images (page_id, line, col, alt, url, status) VALUES (?, ?, ?, ?, ?, '')",
+            [(page_id, token.line, token.column, token.text, token.url)
+             for token in tokens if token.kind == 'image'])
+
+    def _resolve_links(self, pages: List[Tuple[int, str]], site_mappings: Dict[str, str],
+                       path_index: PathIndex, subsite_index: SubsiteIndex):
+        """Resolve the links and images of the given (page id, full path) pages."""
+        # Where a link with a path leads only depends on the directory it's in
+        resolved = {}
+        for page_id, full_path in pages:
+            updates = []
+            for rowid, url in self.conn.execute(
+                    'SELECT rowid, url FROM links WHERE page_id = ?', (page_id,)).fetchall():
+                if not url or url.startswith(EXTERNAL_LINK_PREFIXES):
+                    updates.append((None, None, 'external', rowid))
+                    continue
+                if url.startswith(('#', '?')):
+                    key = (full_path, url)
+                else:
+                    key = (os.path.dirname(full_path), url)
+                if key not in resolved:
+                    target, anchor = LinkValidator.resolve_link(
+                        full_path, url, self.root_dir, site_mappings, path_index, subsite_index)
+                    resolved[key] = (None if target is None else self._relpath(target), anchor)
+                target, anchor = resolved[key]
+                updates.append((target, anchor, 'missing' if target is None else 'ok', rowid))
+            self.conn.executemany(
+                'UPDATE links SET target = ?, anchor = ?, status = ? WHERE rowid = ?', updates)
+
+            updates = []
+            for rowid, url in self.conn.execute(
+                    'SELECT rowid, url FROM images WHERE page_id = ?', (page_id,)).fetchall():
+                if url.startswith(EXTERNAL_IMAGE_PREFIXES):
+                    updates.append((None, 'external', rowid))
+                    continue
+                # Drop any title, and any query or fragment
+                path = unquote(url.split()[0].split('#')[0].split('?')[0])
+                if path.startswith('/'):
+                    target = os.path.join(self.root_dir, path.lstrip('/'))
+                else:
+                    target = os.path.normpath(os.path.join(os.path.dirname(full_path), path))
+                status = 'ok' if path_index.exists(target) else 'missing'
+                updates.append((self._relpath(target), status, rowid))
+            self.conn.executemany(
+                'UPDATE images SET target = ?, status = ? WHERE rowid = ?', updates)
+
+    def _check_anchors(self):
+        """Check the anchor of every link to a page; 'top' always exists."""
+        self.conn.execute("""
+            UPDATE links SET status = CASE
+                WHEN anchor = 'top' OR EXISTS (
+                    SELECT 1 FROM anchors JOIN pages ON pages.id = anchors.page_id
+                    WHERE pages.path = links.target AND anchors.anchor = links.anchor
+                ) THEN 'ok' ELSE 'missing-anchor' END
+            WHERE anchor IS NOT NULL AND status IN ('ok', 'missing-anchor')
+                AND target IN (SELECT path FROM pages)
+        """)
+
+    # Queries
+
+    def pages(self) -> List[str]:
+        """The markdown pages under the docs directories."""
+        return [row[0] for row in self.conn.execute('SELECT path FROM pages ORDER BY path')]
+
+    def nav_pages(self) -> List[str]:
+        """The paths in the nav of the main site or a subsite, whether they exist or not."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT DISTINCT path FROM nav ORDER BY path')]
+
+    def read_nav_pages(self) -> List[str]:
+        """The paths in the nav of the main site or a subsite that exist, and so were read."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT DISTINCT path FROM nav WHERE path IN (SELECT path FROM pages) ORDER BY path')]
+
+    def ghost_pages(self) -> List[str]:
+        """Pages that are in no nav."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT path FROM pages WHERE path NOT IN (SELECT path FROM nav) ORDER BY path')]
+
+    def orphan_pages(self, nav_only: bool = True) -> List[str]:
+        """Pages no other page links to; only pages in the nav, by default."""
+        query = """
+            SELECT path FROM pages WHERE NOT EXISTS (
+                SELECT 1 FROM links JOIN pages AS source ON source.id = links.page_id
+                WHERE links.target = pages.path AND source.id != pages.id
+                    AND links.status != 'missing'
+            )
+        """
+        if nav_only:
+            query += ' AND path IN (SELECT path FROM nav)'
+        return [row[0] for row in self.conn.execute(query + ' ORDER BY path')]
+
+    def inbound_links(self, page: str) -> List[Tuple[str, int, int, str, str]]:
+        """
+        The links to a page from other pages, as (source page, line, column, text,
+        url) tuples. The page is a path relative to the root.
+        """
+        return self.conn.execute("""
+            SELECT source.path, links.line, links.col, links.text, links.url
+            FROM links JOIN pages AS source ON source.id = links.page_id
+            WHERE links.target = ? AND source.path != links.target
+            ORDER BY source.path, links.line, links.col
+        """, (os.path.normpath(page),)).fetchall()
+
+    def dangling_links(self, nav_only: bool = True) -> List[Tuple[str, int, int, str, str, str]]:
+        """
+        Links to missing files or anchors, as (source page, line, column, text, url,
+        status) tuples; only from pages in the nav, by default.
+        """
+        query = """
+            SELECT source.path, links.line, links.col, links.text, links.url, links.status
+            FROM links JOIN pages AS source ON source.id = links.page_id
+            WHERE links.status IN ('missing', 'missing-anchor')
+        """
+        if nav_only:
+            query += ' AND source.path IN (SELECT path FROM nav)'
+        return self.conn.execute(
+            query + ' ORDER BY source.path, links.line, links.col').fetchall()
+
+    def links_matching(self, substring: str,
+                       nav_only: bool = True) -> List[Tuple[str, int, int, str, str]]:
+        """
+        Links whose URL contains a substring, as (source page, line, column, text,
+        url) tuples; only from pages in the nav, by default.
+        """
+        query = """
+            SELECT source.path, links.line, links.col, links.text, links.url
+            FROM links JOIN pages AS source ON source.id = links.page_id
+            WHERE instr(links.url, ?) > 0
+        """
+        if nav_only:
+            query += ' AND source.path IN (SELECT path FROM nav)'
+        return self.conn.execute(
+            query + ' ORDER BY source.path, links.line, links.col', (substring,)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep a store of the documentation's link graph, and query it."
+    )
+    parser.add_argument(
+        "--root",
+        default=".",
+        help="Root directory containing mkdocs.yml (default: current directory)",
+    )
+    parser.add_argument(
+        "--db", help=f"Path to the store (default: ROOT/{DEFAULT_DB})"
+    )
+    parser.add_argument(
+        "--no-update",
+        action="store_true",
+        help="Query the store as it is, without bringing it up to date first",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("update", help="Bring the store up to date")
+    inbound_parser = subparsers.add_parser("inbound", help="List the links to a page")
+    inbound_parser.add_argument("page", help="Path to the markdown page")
+    orphans_parser = subparsers.add_parser(
+        "orphans", help="List the pages in the nav that no other page links to"
+    )
+    orphans_parser.add_argument(
+        "--all", action="store_true", help="Include pages that aren't in the nav"
+    )
+    subparsers.add_parser("ghosts", help="List the pages that aren't in the nav")
+    dangling_parser = subparsers.add_parser(
+        "dangling", help="List the links to missing files or anchors"
+    )
+    dangling_parser.add_argument(
+        "--all", action="store_true", help="Include links from pages that aren't in the nav"
+    )
+    links_parser = subparsers.add_parser(
+        "links", help="List the links whose URL contains a substring"
+    )
+    links_parser.add_argument("substring", help="Substring to search for in URLs")
+
+    args = parser.parse_args()
+    root_dir = os.path.abspath(args.root)
+
+    mkdocs_path = os.path.join(root_dir, "mkdocs.yml")
+    if not os.path.exists(mkdocs_path):
+        sys.exit(f"Error: mkdocs.yml not found at {mkdocs_path}")
+
+    with DocGraph(root_dir, args.db) as graph:
+        if not args.no_update or args.command == "update":
+            start = time.perf_counter()
+            counts = graph.update()
+            if args.command == "update":
+                print(
+                    f"Updated {graph.db_path} in {time.perf_counter() - start:.2f}s: "
+                    + ", ".join(f"{count} {state}" for state, count in counts.items())
+                )
+
+        if args.command == "inbound":
+            page = os.path.relpath(os.path.abspath(args.page), root_dir)
+            for source, line, column, text, url in graph.inbound_links(page):
+                print(f"{source}:{line}:{column} : [{text}]({url})")
+        elif args.command == "orphans":
+            for path in graph.orphan_pages(nav_only=not args.all):
+                print(path)
+        elif args.command == "ghosts":
+            for path in graph.ghost_pages():
+                print(path)
+        elif args.command == "dangling":
+            dangling = graph.dangling_links(nav_only=not args.all)
+            for source, line, column, text, url, status in dangling:
+                print(f"{source}:{line}:{column} : [{text}]({url}) ({status})")
+            if dangling:
+                sys.exit(1)
+        elif args.command == "links":
+            for source, line, column, text, url in graph.links_matching(args.substring):
+                print(f"{source}:{line}:{column} : [{text}]({url})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,206 +0,0 @@
-#!/usr/bin/env python3
-"""
-Update the language-reference-guide/mkdocs.yml nav section for "The I-Beam Operator"
-by extracting I-Beam numbers from the H1 tags in the referenced markdown files
-and reordering numerically. Also updates all other references to the same files
-throughout the mkdocs.yml to maintain consistency.
-"""
-
-import re
-import argparse
-import sys
-from pathlib import Path
-from ruamel.yaml import YAML
-
-
-def extract_ibeam_number(file_path):
-    """Extract the I-Beam number from the H1 tag in a markdown file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Look for the specific H1 pattern
-        h1_pattern = r'<h1\s+class="heading">.*?<span\s+class="command">(.*?)</span>.*?</h1>'
-        match = re.search(h1_pattern, content, re.DOTALL)
-        
-        if match:
-            command = match.group(1).strip()
-            # Find the integer before the ⌶ symbol
-            ibeam_pattern = r'(\d+)⌶'
-            ibeam_match = re.search(ibeam_pattern, command)
-            if ibeam_match:
-                return int(ibeam_match.group(1))
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-    
-    return None
-
-
-def find_ibeam_operator_section(nav_data):
-    """Recursively find the 'The I-Beam Operator' section in the navigation."""
-    for item in nav_data:
-        if isinstance(item, dict):
-            for key, value in item.items():
-                if key == 'The I-Beam Operator':
-                    return value
-                elif isinstance(value, list):
-                    result = find_ibeam_operator_section(value)
-                    if result is not None:
-                        return result
-    return None
-
-
-def process_ibeam_operator(ibeam_list, base_path):
-    """Process the I-Beam Operator list and return updated entries and file mapping."""
-    preserved_entries = []
-    items_to_sort = []
-    file_path_mapping = {}  # Maps file paths to new titles
-    
-    # Special entries that shouldn't be processed
-    skip_titles = [
-        "Introduction",
-        "Ride and Experimental Features-related I-Beams"
-    ]
-    
-    for item in ibeam_list:
-        if isinstance(item, dict):
-            for title, path in item.items():
-                if title in skip_titles:
-                    preserved_entries.append(item)
-                elif isinstance(path, str) and path.startswith("the-i-beam-operator/") and path.endswith(".md"):
-                    file_path = base_path / "docs" / path
-                    ibeam_number = extract_ibeam_number(file_path)
-                    
-                    if ibeam_number is not None:
-                        # Create new title with I-Beam number prefix
-                        new_title = f"{ibeam_number}: {title}"
-                        new_item = {new_title: path}
-                        items_to_sort.append((ibeam_number, new_item))
-                        # Store the mapping for this file
-                        file_path_mapping[path] = new_title
-                    else:
-                        # If we couldn't extract a number, skip this file
-                        print(f"Warning: No I-Beam number found in {path}, skipping")
-                else:
-                    # Non-I-Beam entries
-                    preserved_entries.append(item)
-    
-    # Sort the items by I-Beam number (numeric sort)
-    items_to_sort.sort(key=lambda x: x[0])
-    
-    # Build the new list
-    new_list = preserved_entries + [item[1] for item in items_to_sort]
-    
-    return new_list, file_path_mapping
-
-
-def update_nav_recursively(nav_data, file_path_mapping):
-    """Recursively update all navigation entries based on the file path mapping."""
-    if isinstance(nav_data, list):
-        for i, item in enumerate(nav_data):
-            if isinstance(item, dict):
-                for key, value in list(item.items()):
-                    if isinstance(value, str) and value in file_path_mapping:
-                        # Update this entry with the new title
-                        del item[key]
-                        item[file_path_mapping[value]] = value
-                    elif isinstance(value, list):
-                        update_nav_recursively(value, file_path_mapping)
-    elif isinstance(nav_data, dict):
-        for key, value in nav_data.items():
-            if isinstance(value, list):
-                update_nav_recursively(value, file_path_mapping)
-
-
-def process_yaml_file(yaml_path, base_path, file_path_mapping, yaml, dry_run=False):
-    """Process a single YAML file with the given mappings."""
-    if not yaml_path.exists():
-        return False
-    
-    # Load the YAML file
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        data = yaml.load(f)
-    
-    # Find the I-Beam Operator section
-    ibeam_section = find_ibeam_operator_section(data['nav'])
-    
-    if ibeam_section is None:
-        print(f"Could not find 'The I-Beam Operator' section in {yaml_path.name}")
-        return False
-    
-    # If we're processing a secondary file, use existing mappings
-    if file_path_mapping:
-        # Update the section with existing mappings
-        for i, item in enumerate(ibeam_section):
-            if isinstance(item, dict):
-                for title, path in list(item.items()):
-                    if path in file_path_mapping:
-                        del item[title]
-                        item[file_path_mapping[path]] = path
-    else:
-        # This is the primary file, create new mappings
-        new_section, file_path_mapping = process_ibeam_operator(ibeam_section, base_path)
-        ibeam_section[:] = new_section
-    
-    # Update all references throughout the entire navigation
-    update_nav_recursively(data['nav'], file_path_mapping)
-    
-    if not dry_run:
-        # Write back the file
-        with open(yaml_path, 'w', encoding='utf-8') as f:
-            yaml.dump(data, f)
-        print(f"Successfully updated {yaml_path}")
-        print(f"Applied {len(file_path_mapping)} file path mappings throughout the navigation")
-    
-    return file_path_mapping
-
-
-def main():
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="Update The I-Beam Operator section in mkdocs.yml")
-    parser.add_argument("--dry-run", action="store_true", help="Show changes without modifying the file")
-    args = parser.parse_args()
-    
-    # Path to the mkdocs.yml file
-    base_path = Path(__file__).parent.parent.parent / "language-reference-guide"
-    mkdocs_path = base_path / "mkdocs.yml"
-    
-    # Set up YAML parser to preserve formatting
-    yaml = YAML()
-    yaml.preserve_quotes = True
-    yaml.default_flow_style = False
-    yaml.width = 4096
-    yaml.indent(mapping=2, sequence=4, offset=2)
-    
-    if args.dry_run:
-        # For dry run, just show what would be done
-        with open(mkdocs_path, 'r', encoding='utf-8') as f:
-            data = yaml.load(f)
-        
-        ibeam_section = find_ibeam_operator_section(data['nav'])
-        if ibeam_section is None:
-            print("Could not find 'The I-Beam Operator' section in mkdocs.yml")
-            return
-        
-        new_section, file_path_mapping = process_ibeam_operator(ibeam_section, base_path)
-        
-        print("File path mappings that will be applied:")
-        print("-" * 50)
-        for path, new_title in sorted(file_path_mapping.items(), key=lambda x: int(x[1].split(':')[0])):
-            print(f"{path} -> {new_title}")
-        print("-" * 50)
-        print(f"Total mappings: {len(file_path_mapping)}")
-        print("\nUpdated 'The I-Beam Operator' section:")
-        print("-" * 50)
-        yaml_temp = YAML()
-        yaml_temp.default_flow_style = False
-        yaml_temp.dump({'The I-Beam Operator': new_section}, sys.stdout)
-        print("-" * 50)
-        print("(Dry run - no changes made)")
-    else:
-        # Process mkdocs.yml
-        file_path_mapping = process_yaml_file(mkdocs_path, base_path, None, yaml, args.dry_run)
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Order the A-Z sections of the language-reference-guide/mkdocs.yml nav by the
+command each page documents, as given in the H1 tag of the page:
+
+    <h1 class="heading"><span class="name">Account Information</span> <span class="command">R←⎕AI</span></h1>
+
+Each page's nav title is prefixed with its command ("<code>⎕AI</code>: Account
+Information"), and the pages are sorted by it, after any entries that aren't
+such pages. Other nav entries for the same pages, elsewhere in the nav, get the
+same title. The sections are listed in SECTIONS; add one there to order another.
+
+All sections are ordered in one load and one dump of the YAML. The commands are
+read from the pages by a pool of worker processes, and kept in a cache file with
+the size and mtime of each page, so that a later run only reads the pages that
+have changed.
+
+With --check, nothing is written: the changes that would be made are shown,
+and the exit status is 1 if there are any, for CI.
+
+Usage:
+    order_nav.py [--config MKDOCS_YML] [--section TITLE ...] [--check | --dry-run] [--jobs N]
+"""
+
+import argparse
+import difflib
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ruamel.yaml import YAML
+
+H1_PATTERN = re.compile(
+    r'<h1\s+class="heading">.*?<span\s+class="command">(.*?)</span>.*?</h1>', re.DOTALL
+)
+
+
+class NavSection(NamedTuple):
+    """A nav section whose pages are ordered by the command in their H1."""
+    title: str  # Of the section in the nav
+    directory: str  # Of its pages, under docs/
+    key: str  # Pattern finding the sort key in the H1 command, as its first group
+    numeric: bool  # Whether keys sort as numbers
+    label: str  # Format of the prefix of a page's title, given the key
+    prefix: str  # Pattern matching a prefix already on a title, to be replaced
+    skip_titles: Tuple[str, ...] = ()  # Entries left as they are, before the pages
+    trailing_titles: Tuple[str, ...] = ()  # Entries left as they are, after the pages
+
+
+SECTIONS = [
+    NavSection(
+        title='System Functions (A-Z)',
+        directory='system-functions/',
+        key=r'⎕([A-Z]+)',
+        numeric=False,
+        label='<code>⎕{key}</code>: ',
+        prefix=r'<code>⎕[A-Z]+</code>: ',
+        skip_titles=(
+            'Introduction',
+            'Character Input Output',
+            'Evaluated Input Output',
+            'Underscored Alphabetic Characters',
+        ),
+    ),
+    NavSection(
+        title='The I-Beam Operator',
+        directory='the-i-beam-operator/',
+        key=r'(\d+)⌶',
+        numeric=True,
+        label='{key}: ',
+        prefix=r'\d+: ',
+        skip_titles=('Introduction', 'Ride and Experimental Features-related I-Beams'),
+        trailing_titles=('Other I-Beams',),
+    ),
+    NavSection(
+        title='System Commands (A-Z)',
+        directory='system-commands/',
+        key=r'\)([A-Z]+)',
+        numeric=False,
+        label='{key}: ',
+        prefix=r'[A-Z]+: ',
+        skip_titles=('Introduction',),
+    ),
+]
+
+
+def read_h1_command(path: str) -> Tuple[str, Optional[str]]:
+    """The path and the command in the H1 tag of a markdown file, if it has one."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error reading {path}: {e}", file=sys.stderr)
+        return path, None
+    match = H1_PATTERN.search(content)
+    return path, match.group(1).strip() if match else None
+
+
+class H1Index:
+    """
+    The commands in the H1 tags of markdown files, kept in a JSON file between
+    runs with the mtime and size of each file, so that a file is only read again
+    once it has changed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entries = {}  # path -> {'mtime_ns', 'size', 'command'}
+        self.reads = 0  # Files read, rather than found in the index
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.VERSION:
+                    self.entries = data['files']
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+
+    def commands(self, paths: Iterable[str], jobs: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """The H1 command of each of paths, reading those that have changed in parallel."""
+        paths = sorted(set(paths))
+        stats = {}
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                print(f"Error reading {path}: {e}", file=sys.stderr)
+                continue
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+            entry = self.entries.get(path)
+            if entry is None or (entry['mtime_ns'], entry['size']) != stats[path]:
+                stale.append(path)
+
+        jobs = jobs or os.cpu_count() or 1
+        if jobs <= 1 or len(stale) < 2:
+            results = list(map(read_h1_command, stale))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(read_h1_command, stale,
+                                            chunksize=max(1, len(stale) // (jobs * 4))))
+        self.reads += len(results)
+        for path, command in results:
+            mtime_ns, size = stats[path]
+            self.entries[path] = {'mtime_ns': mtime_ns, 'size': size, 'command': command}
+        return {path: self.entries[path]['command'] if path in stats else None for path in paths}
+
+    def save(self):
+        if not self.path:
+            return
+        # Forget files that are gone
+        entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+        temp_file = f"{self.path}.{os.getpid()}"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'files': entries}, f, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+
+
+def make_yaml() -> YAML:
+    """A round-trip YAML, set up to dump mkdocs.yml as it is written."""
+    yaml = YAML()
+    yaml.preserve_quotes = True
+    yaml.default_flow_style = False
+    yaml.width = 4096
+    yaml.indent(mapping=2, sequence=4, offset=2)
+    return yaml
+
+
+def find_sections(nav_data, titles: Iterable[str]) -> Dict[str, list]:
+    """The first entries of the nav with each of titles, in one walk of the nav."""
+    wanted = set(titles)
+    found = {}
+
+    def walk(items):
+        for item in items:
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    if key in wanted and key not in found and isinstance(value, list):
+                        found[key] = value
+                    elif isinstance(value, list):
+                        walk(value)
+
+    walk(nav_data)
+    return found
+
+
+def is_section_page(section: NavSection, title: str, path) -> bool:
+    """Whether a nav entry of section is one of the pages it orders."""
+    return (
+        title not in section.skip_titles
+        and title not in section.trailing_titles
+        and isinstance(path, str)
+        and path.startswith(section.directory)
+        and path.endswith('.md')
+    )
+
+
+def sort_key(section: NavSection, command: Optional[str]):
+    """The key to sort a page of section by, or None if its command has none."""
+    match = re.search(section.key, command) if command else None
+    if not match:
+        return None
+    return int(match.group(1)) if section.numeric else match.group(1)
+
+
+def order_section(
+    section: NavSection, entries: list, commands: Dict[str, Optional[str]]
+) -> Tuple[list, Dict[str, str]]:
+    """
+    The entries of a section in order, and the title each page should have, by
+    path. Pages without a sort key are left as they are, after the others and
+    before the section's trailing entries.
+    """
+    preserved = []
+    keyed = []
+    unkeyed = []
+    trailing = []
+    titles = {}
+    prefix = re.compile(section.prefix)
+    for item in entries:
+        if not isinstance(item, dict):
+            preserved.append(item)
+            continue
+        for title, path in list(item.items()):
+            if title in section.trailing_titles:
+                trailing.append(item)
+                continue
+            if not is_section_page(section, title, path):
+                preserved.append(item)
+                continue
+            key = sort_key(section, commands.get(path))
+            if key is None:
+                print(f"Warning: No sort key found in {path}, leaving it at the end of "
+                      f"'{section.title}'", file=sys.stderr)
+                unkeyed.append(item)
+                continue
+            new_title = section.label.format(key=key) + prefix.sub('', title, count=1)
+            titles[path] = new_title
+            keyed.append((key, item))
+    # Pages with the same key, like the two ⎕XT pages, stay in their order
+    keyed.sort(key=lambda entry: entry[0])
+    return preserved + [item for _, item in keyed] + unkeyed + trailing, titles
+
+
+def retitle_nav(nav_data, titles: Dict[str, str]):
+    """Give every entry for a page in titles that title, wherever it is in the nav."""
+    if isinstance(nav_data, list):
+        for item in nav_data:
+            retitle_nav(item, titles)
+    elif isinstance(nav_data, dict):
+        for key, value in list(nav_data.items()):
+            if isinstance(value, str) and value in titles and key != titles[value]:
+                # Keep any comment on the entry
+                comment = nav_data.ca.items.pop(key, None) if hasattr(nav_data, 'ca') else None
+                del nav_data[key]
+                nav_data[titles[value]] = value
+                if comment:
+                    nav_data.ca.items[titles[value]] = comment
+            elif isinstance(value, list):
+                retitle_nav(value, titles)
+
+
+def order_nav(
+    config_path: str,
+    sections: List[NavSection] = SECTIONS,
+    index: Optional[H1Index] = None,
+    jobs: Optional[int] = None,
+) -> Tuple[str, str, List[str]]:
+    """
+    Order sections of the nav of a mkdocs.yml. Returns the YAML as it is and as
+    it would be, and the titles of the sections not found; nothing is written.
+    """
+    yaml = make_yaml()
+    with open(config_path, 'r', encoding='utf-8') as f:
+        original = f.read()
+    data = yaml.load(original)
+    docs_dir = os.path.join(os.path.dirname(os.path.abspath(config_path)), 'docs')
+
+    found = find_sections(data['nav'], [section.title for section in sections])
+    missing = [section.title for section in sections if section.title not in found]
+
+    # The commands of the pages of all the sections, read in one go
+    paths = {}
+    for section in sections:
+        for item in found.get(section.title, []):
+            if isinstance(item, dict):
+                paths.update((path, os.path.join(docs_dir, path))
+                             for title, path in item.items() if is_section_page(section, title, path))
+    index = index or H1Index()
+    file_commands = index.commands(paths.values(), jobs)
+    commands = {path: file_commands.get(file_path) for path, file_path in paths.items()}
+
+    titles = {}
+    for section in sections:
+        if section.title in found:
+            entries, section_titles = order_section(section, found[section.title], commands)
+            found[section.title][:] = entries
+            titles.update(section_titles)
+    retitle_nav(data['nav'], titles)
+
+    stream = io.StringIO()
+    yaml.dump(data, stream)
+    return original, stream.getvalue(), missing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Order the A-Z sections of the nav in mkdocs.yml by the commands in the pages' H1 tags"
+    )
+    parser.add_argument(
+        "--config",
+        default=str(Path(__file__).parent.parent.parent / "language-reference-guide" / "mkdocs.yml"),
+        help="The mkdocs.yml to order (defaults to the Language Reference Guide's)",
+    )
+    parser.add_argument(
+        "--section",
+        action="append",
+        choices=[section.title for section in SECTIONS],
+        help="Order only this section; may be repeated (defaults to all sections)",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--check",
+        action="store_true",
+        help="Show the changes that would be made, and exit with 1 if there are any",
+    )
+    mode.add_argument(
+        "--dry-run", action="store_true", help="Show changes without modifying the file"
+    )
+    parser.add_argument(
+        "--cache",
+        help="File keeping the commands of the pages between runs "
+        "(default: .nav_order_cache.json beside mkdocs.yml)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't use or update the cache",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of pages to read in parallel (defaults to the number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.config):
+        sys.exit(f"Error: '{args.config}' not found")
+
+    sections = [section for section in SECTIONS if not args.section or section.title in args.section]
+    cache_file = None if args.no_cache else (
+        args.cache or os.path.join(os.path.dirname(os.path.abspath(args.config)), ".nav_order_cache.json"))
+    index = H1Index(cache_file)
+    original, updated, missing = order_nav(args.config, sections, index, args.jobs)
+    index.save()
+
+    for title in missing:
+        print(f"Could not find '{title}' section in {args.config}", file=sys.stderr)
+
+    if updated == original:
+        print(f"{args.config} is in order ({index.reads} pages read)")
+        sys.exit(0)
+
+    if args.check or args.dry_run:
+        sys.stdout.writelines(difflib.unified_diff(
+            original.splitlines(keepends=True), updated.splitlines(keepends=True),
+            args.config, f"{args.config} (ordered)"))
+        if args.check:
+            print(f"{args.config} is out of order; run order_nav.py to fix it", file=sys.stderr)
+            sys.exit(1)
+        print("(Dry run - no changes made)")
+        return
+
+    with open(args.config, 'w', encoding='utf-8') as f:
+        f.write(updated)
+    print(f"Successfully updated {args.config} ({index.reads} pages read)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Tests for check_deployed_links module, against a local HTTP stand-in for the site.
+"""
+
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from check_deployed_links import (
+    CheckpointError, LinkChecker, MultiVersionChecker, SiteDir, SitemapParser, Telemetry)
+from check_external_links import ExternalLinkChecker
+
+PAGES = {
+    '/docs/': '<nav class="md-nav"><a href="a/">A</a> <a href="b/">B</a></nav>',
+    '/docs/a/': '<article><a href="../b/">B</a> <a href="../missing/">Missing</a> '
+                '<a href="../nohead/">No HEAD</a></article>',
+    '/docs/b/': '<article><a href="../a/#top">A</a> <a href="../c/">C</a></article>',
+    '/docs/c/': '<article>Only linked from content <a href="../d/">D</a></article>',
+    '/docs/d/': '<article>Two links from the navigation</article>',
+    '/docs/nohead/': '<article>Served to GET only</article>',
+}
+
+
+
+def sitemap_xml(urls, index=False):
+    """A sitemap listing urls, or a sitemap index listing sitemaps at urls."""
+    root, entry = ('sitemapindex', 'sitemap') if index else ('urlset', 'url')
+    entries = ''.join(f'<{entry}><loc>{url}</loc><lastmod>2025-01-01</lastmod></{entry}>'
+                      for url in urls)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<{root} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</{root}>')
+
+
+def versioned_pages():
+    """
+    PAGES as deployed with mike, as version 20.0, aliased as latest, and 19.0,
+    which has no page d, and a page old that 20.0 hasn't.
+    """
+    pages = {'/docs/versions.json': json.dumps([
+        {'version': '20.0', 'title': '20.0', 'aliases': ['latest']},
+        {'version': '19.0', 'title': '19.0', 'aliases': []},
+    ]).encode('utf-8')}
+    for path, html in PAGES.items():
+        pages[path.replace('/docs/', '/docs/20.0/')] = html
+        if path != '/docs/d/':
+            pages[path.replace('/docs/', '/docs/19.0/')] = html
+    pages['/docs/19.0/b/'] = '<article><a href="../a/#top">A</a> <a href="../old/">Old</a></article>'
+    pages['/docs/19.0/old/'] = '<article><a href="../c/">C</a></article>'
+    return pages
+
+
+class Site:
+    """
+    A local HTTP server for pages (by default, PAGES), with ETags, recording each
+    request it answers. Pages given as bytes are served as files, not HTML.
+    """
+
+    def __init__(self, pages=PAGES):
+        self.requests = []  # (method, path, status, body bytes sent)
+        self.unavailable = {}  # path -> how many more requests for it to answer with 503
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.respond(send_body=True)
+
+            def do_HEAD(self):
+                if self.path == '/docs/nohead/':
+                    self.send(405, b'')
+                else:
+                    self.respond(send_body=False)
+
+            def respond(self, send_body):
+                if site.unavailable.get(self.path):
+                    site.unavailable[self.path] -= 1
+                    self.send(503, b'')
+                    return
+                if self.path not in pages:
+                    self.send(404, b'Not found' if send_body else b'')
+                    return
+                body = pages[self.path]
+                content_type = 'application/octet-stream'
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                    content_type = 'text/html; charset=utf-8'
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send(304, b'', {'ETag': etag})
+                else:
+                    self.send(200, body if send_body else b'', {
+                        'ETag': etag, 'Content-Type': content_type})
+
+            def send(self, status, body, headers=None):
+                site.requests.append((self.command, self.path, status, len(body)))
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}/docs'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def write_site(site_dir):
+    """PAGES as a built site, in a directory per page."""
+    for path, html in PAGES.items():
+        page_dir = os.path.join(site_dir, *path.split('/')[2:])
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+
+
+def crawl(site, tmpdir, cache=True, checker_class=LinkChecker, **kwargs):
+    checker = checker_class(
+        site.base_url,
+        output_file=os.path.join(tmpdir, 'broken_links.txt'),
+        cache_file=os.path.join(tmpdir, 'cache.json') if cache else None,
+        **kwargs,
+    )
+    asyncio.run(checker.spider())
+    return checker
+
+
+class TestLinkChecker:
+    """Test crawling a site and checking its links."""
+    
+    def test_probing(self):
+        """Test that links are checked with HEAD, falling back to GET where it isn't allowed."""
+        site = Site()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = crawl(site, tmpdir, cache=False)
+                assert dict(checker.broken_links) == {
+                    site.base_url + '/missing/': {site.base_url + '/a/'}
+                }
+                assert checker.checked_links[site.base_url + '/nohead/'] == (True, 200)
+                assert ('GET', '/docs/b/', 200, len(PAGES['/docs/b/'])) in site.requests
+                assert ('HEAD', '/docs/nohead/', 405, 0) in site.requests
+                assert ('GET', '/docs/nohead/', 200, len(PAGES['/docs/nohead/'])) in site.requests
+                assert not any(method == 'GET' and path == '/docs/missing/'
+                               for method, path, _, _ in site.requests)
+        finally:
+            site.close()
+    
+    def test_self_link(self):
+        """Test that a page linked only from itself isn't probed after it was fetched."""
+        site = Site({
+            '/docs/': '<nav class="md-nav"><a href="a/">A</a></nav>',
+            '/docs/a/': '<article><a href="#x">X</a></article>',
+        })
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = crawl(site, tmpdir, cache=False)
+                assert site.requests == [('GET', '/docs/', 200, 44), ('GET', '/docs/a/', 200, 37)]
+                assert checker.checked_links == {site.base_url + '/a/': (True, 200)}
+        finally:
+            site.close()
+    
+    def test_crawl_depth(self):
+        """Test that pages only linked from content are crawled, as deep as allowed."""
+        site = Site()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                for max_depth, crawled in [
+                    (0, {'a', 'b'}),
+                    (1, {'a', 'b', 'c', 'nohead'}),
+                    (None, {'a', 'b', 'c', 'd', 'nohead'}),
+                ]:
+                    checker = crawl(site, tmpdir, cache=False, max_depth=max_depth)
+                    assert checker.pages == {f'{site.base_url}/{page}/' for page in crawled}
+                    assert checker.pages_processed == len(crawled)
+                    assert not checker.frontier and not checker.pages_in_flight
+        finally:
+            site.close()
+    
+    def test_parser_workers(self, monkeypatch):
+        """Test that pages parsed in a process pool give the results of parsing in the event loop."""
+        calls = []
+        run_in_executor = asyncio.BaseEventLoop.run_in_executor
+        
+        def recording(loop, executor, func, *args):
+            calls.append((type(executor), func.__name__))
+            return run_in_executor(loop, executor, func, *args)
+        
+        monkeypatch.setattr(asyncio.BaseEventLoop, 'run_in_executor', recording)
+        site = Site()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                in_loop = crawl(site, tmpdir, cache=False, workers=0)
+                assert (ProcessPoolExecutor, '_extract_hrefs') not in calls
+                in_pool = crawl(site, tmpdir, cache=False, workers=2)
+                # Every page, and the navigation, was parsed in the pool
+                assert calls.count((ProcessPoolExecutor, '_extract_hrefs')) >= len(in_pool.pages)
+                assert in_pool.executor is None
+                assert in_pool.pages == in_loop.pages
+                assert in_pool.checked_links == in_loop.checked_links
+                assert in_pool.broken_links == in_loop.broken_links
+        finally:
+            site.close()
+    
+    def test_conditional_requests(self):
+        """Test that a second crawl of an unchanged site downloads no pages, with the same results."""
+        site = Site()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                first = crawl(site, tmpdir)
+                site.requests.clear()
+                second = crawl(site, tmpdir)
+                
+                assert second.checked_links == first.checked_links
+                assert second.broken_links == first.broken_links
+                assert second.pages_processed == first.pages_processed == 5
+                assert {status for _, _, status, _ in site.requests} <= {304, 404, 405}
+                assert sum(size for _, _, _, size in site.requests) == 0
+        finally:
+            site.close()
+
+    
+    def test_sitemap(self):
+        """Test seeding the crawl from a gzipped sitemap, and comparing it with the pages linked to."""
+        pages = dict(PAGES)
+        pages['/docs/orphan/'] = '<article>In the sitemap only</article>'
+        site = Site(pages)
+        try:
+            listed = ['', 'a/', 'b/', 'c/', 'orphan/']
+            pages['/docs/sitemap.xml.gz'] = gzip.compress(sitemap_xml(
+                [f'{site.base_url}/{page}' for page in listed] + ['https://example.com/a/']
+            ).encode('utf-8'))
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = crawl(site, tmpdir, cache=False, sitemap='auto')
+                base_url = site.base_url
+                assert checker.sitemap_pages == {f'{base_url}/{page}' for page in listed}
+                assert checker.sitemap_outside == 1
+                assert f'{base_url}/orphan/' in checker.good_pages
+                assert checker.sitemap_unlinked() == [f'{base_url}/orphan/']
+                assert checker.sitemap_missing() == [f'{base_url}/d/', f'{base_url}/nohead/']
+                # Links from the sitemap's pages are followed as before
+                assert dict(checker.broken_links) == {base_url + '/missing/': {base_url + '/a/'}}
+        finally:
+            site.close()
+
+    
+    def test_retries(self):
+        """Test that requests answered with 503 are retried, and the retries recorded."""
+        site = Site()
+        site.unavailable = {'/docs/c/': 1, '/docs/d/': 5}
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = crawl(site, tmpdir, cache=False, retries=2)
+                assert checker.checked_links[site.base_url + '/c/'] == (True, 200)
+                assert checker.checked_links[site.base_url + '/d/'] == (False, 503)
+                requests = [(request.method, request.url, request.status, request.retries)
+                            for request in checker.telemetry.requests]
+                assert ('HEAD', site.base_url + '/c/', 503, 0) in requests
+                assert ('HEAD', site.base_url + '/c/', 200, 1) in requests
+                assert ('HEAD', site.base_url + '/d/', 503, 2) in requests
+                assert len(requests) == len(site.requests)
+        finally:
+            site.close()
+
+    
+    def test_resume(self):
+        """Test that an interrupted crawl, resumed, reuses what was done and ends as an uninterrupted one."""
+        class InterruptedChecker(LinkChecker):
+            async def process_page(self, session, page_url, depth=0):
+                if page_url.endswith('/c/'):
+                    raise KeyboardInterrupt
+                return await super().process_page(session, page_url, depth)
+        
+        site = Site()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                uninterrupted = crawl(site, tmpdir, cache=False, workers=0)
+                with open(os.path.join(tmpdir, 'broken_links.txt')) as f:
+                    problematic = f.read()
+                
+                checkpoint = os.path.join(tmpdir, 'checkpoint.json')
+                with pytest.raises(KeyboardInterrupt):
+                    crawl(site, tmpdir, cache=False, workers=0, checkpoint_file=checkpoint,
+                          checker_class=InterruptedChecker)
+                with open(checkpoint) as f:
+                    state = json.load(f)
+                assert [site.base_url + '/c/', 1] in state['frontier']
+                done = set(state['good_pages'])
+                assert done and site.base_url + '/c/' not in done
+                
+                site.requests.clear()
+                resumed = crawl(site, tmpdir, cache=False, workers=0,
+                                checkpoint_file=checkpoint, resume=True)
+                assert resumed.resumed
+                assert resumed.pages == uninterrupted.pages
+                assert resumed.checked_links == uninterrupted.checked_links
+                assert resumed.broken_links == uninterrupted.broken_links
+                assert resumed.pages_processed == uninterrupted.pages_processed
+                # Pages done before aren't fetched again
+                assert not any(method == 'GET' and site.base_url.rsplit('/', 1)[0] + path in done
+                               for method, path, _, _ in site.requests)
+                assert not os.path.exists(checkpoint)
+                with open(os.path.join(tmpdir, 'broken_links.txt')) as f:
+                    assert f.read() == problematic
+                
+                with open(checkpoint, 'w') as f:
+                    json.dump(dict(state, base_url='https://example.com/docs'), f)
+                with pytest.raises(CheckpointError):
+                    crawl(site, tmpdir, cache=False, checkpoint_file=checkpoint, resume=True)
+        finally:
+            site.close()
+
+    
+    def test_external(self):
+        """Test that links to other sites are checked once, politely, when asked, and only then."""
+        pages = dict(PAGES)
+        site = Site(pages)
+        try:
+            # The stand-in is another site when reached as localhost
+            other = site.base_url.replace('127.0.0.1', 'localhost')
+            pages['/docs/c/'] = (f'<article><a href="../d/">D</a> <a href="{other}/b/#x">Other B</a> '
+                                 f'<a href="{other}/gone/">Gone</a> <a href="mailto:a@b.c">Mail</a></article>')
+            pages['/docs/d/'] = f'<article><a href="{other}/b/">Other B</a></article>'
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = crawl(site, tmpdir, cache=False)
+                assert not checker.external_links
+                assert len(checker.checked_links) == 6
+                
+                external = ExternalLinkChecker(delay=0, cache_file=os.path.join(tmpdir, 'ext.json'))
+                checker = crawl(site, tmpdir, cache=False, external=external)
+                assert dict(checker.external_links) == {
+                    f'{other}/b/': {f'{site.base_url}/c/', f'{site.base_url}/d/'},
+                    f'{other}/gone/': {f'{site.base_url}/c/'},
+                }
+                assert checker.external_results == {
+                    f'{other}/b/': (True, 200),
+                    f'{other}/gone/': (False, 404),
+                }
+                # External links aren't crawled, or checked as internal ones
+                assert len(checker.checked_links) == 6
+                assert f'{site.base_url}/c/' in checker.problematic_pages
+                with open(os.path.join(tmpdir, 'broken_links.txt')) as f:
+                    assert f'{site.base_url}/c/\n' in f.read()
+                
+                site.requests.clear()
+                external = ExternalLinkChecker(delay=0, cache_file=os.path.join(tmpdir, 'ext.json'))
+                checker = crawl(site, tmpdir, cache=False, external=external)
+                assert external.from_cache == 2
+                assert checker.external_results[f'{other}/gone/'] == (False, 404)
+        finally:
+            site.close()
+
+    
+    def test_fragments(self):
+        """Test that fragments are checked against the ids of the pages crawled, without more requests."""
+        pages = dict(PAGES)
+        pages['/docs/a/'] = ('<article id="a-top"><h2 id="here">Here</h2> <a href="#here">Here</a> '
+                             '<a href="#gone">Gone</a> <a href="../b/#section">B</a> '
+                             '<a href="../b/#renamed">Renamed</a> <a href="../c/#%E2%8E%95WA">WA</a> '
+                             '<a href="../missing/#x">Missing</a></article>')
+        pages['/docs/b/'] = ('<header id="header"></header><article><h2 id="section">S</h2>'
+                             '<a href="../a/#top">A</a> <a href="../c/#nowhere">C</a></article>')
+        pages['/docs/c/'] = '<article><h3 id="⎕WA">⎕WA</h3> <a href="../d/#d">D</a></article>'
+        site = Site(pages)
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                base_url = site.base_url
+                checker = crawl(site, tmpdir)
+                assert dict(checker.broken_fragments) == {
+                    f'{base_url}/a/#gone': {f'{base_url}/a/'},
+                    f'{base_url}/b/#renamed': {f'{base_url}/a/'},
+                    f'{base_url}/c/#nowhere': {f'{base_url}/b/'},
+                    f'{base_url}/d/#d': {f'{base_url}/c/'},
+                }
+                assert checker.problematic_pages == {
+                    f'{base_url}/a/', f'{base_url}/b/', f'{base_url}/c/'}
+                # A broken link is reported as such, whatever its fragment
+                assert dict(checker.broken_links) == {base_url + '/missing/': {base_url + '/a/'}}
+                # Each page fetched once, and no more
+                gets = [path for method, path, _, _ in site.requests if method == 'GET']
+                assert sorted(gets) == sorted(set(gets))
+                assert not any('#' in path for _, path, _, _ in site.requests)
+                
+                # Ids come from the cache when pages haven't changed
+                again = crawl(site, tmpdir)
+                assert again.broken_fragments == checker.broken_fragments
+                
+                # Pages too deep aren't fetched, so fragments of links to them aren't checked
+                shallow = crawl(site, tmpdir, cache=False, max_depth=0)
+                assert set(shallow.broken_fragments) == {
+                    f'{base_url}/a/#gone', f'{base_url}/b/#renamed'}
+                assert shallow.unverified_fragments == 2
+        finally:
+            site.close()
+
+
+
+class TestMultiVersionChecker:
+    """Test crawling several versions of a site at once."""
+    
+    def check(self, base_url, tmpdir, **kwargs):
+        checker = MultiVersionChecker(
+            base_url, ['19.0', 'latest', '20.0'],
+            output_file=os.path.join(tmpdir, 'broken_links.txt'), workers=0, **kwargs)
+        asyncio.run(checker.spider())
+        return checker
+    
+    def assert_results(self, checker, base_url):
+        assert list(checker.checkers) == ['19.0', '20.0']
+        assert checker.aliases == {'20.0': ['latest']}
+        old, new = checker.checkers['19.0'], checker.checkers['20.0']
+        assert dict(old.broken_links) == {
+            f'{base_url}/19.0/missing/': {f'{base_url}/19.0/a/'},
+            f'{base_url}/19.0/d/': {f'{base_url}/19.0/c/'},
+        }
+        assert dict(new.broken_links) == {f'{base_url}/20.0/missing/': {f'{base_url}/20.0/a/'}}
+        assert checker.missing == {'19.0': [('/d/', ['20.0'])], '20.0': [('/old/', ['19.0'])]}
+        assert checker.unreached == {'19.0': 0, '20.0': 0}
+        # The home page, and pages a, c and nohead are the same in both versions
+        assert sum(checker.parses_reused for checker in checker.checkers.values()) == 4
+    
+    def test_versions(self):
+        """Test that versions are crawled once each, sharing one budget of requests, and compared."""
+        site = Site(versioned_pages())
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = self.check(site.base_url, tmpdir, cache_file=os.path.join(tmpdir, 'cache.json'))
+                self.assert_results(checker, site.base_url)
+                old, new = checker.checkers['19.0'], checker.checkers['20.0']
+                assert old.semaphore is new.semaphore and old.telemetry is new.telemetry
+                assert not any('/latest/' in path for _, path, _, _ in site.requests)
+                gets = [path for method, path, _, _ in site.requests if method == 'GET']
+                assert sorted(gets) == sorted(set(gets))
+                assert set(checker.telemetry.summary()['subsites']) == {'19.0', '20.0'}
+                with open(os.path.join(tmpdir, 'broken_links.txt')) as f:
+                    assert sorted(f.read().split()) == [
+                        f'{site.base_url}/19.0/a/', f'{site.base_url}/19.0/c/', f'{site.base_url}/20.0/a/']
+        finally:
+            site.close()
+    
+    def test_site_dir(self):
+        """Test comparing the versions of a mike checkout on disk."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            site_dir = os.path.join(tmpdir, 'site')
+            for path, content in versioned_pages().items():
+                if isinstance(content, bytes):
+                    file_path = os.path.join(site_dir, *path.split('/')[2:])
+                else:
+                    file_path = os.path.join(site_dir, *path.split('/')[2:], 'index.html')
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, 'wb') as f:
+                    f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+            base_url = 'https://example.com/docs'
+            self.assert_results(self.check(base_url, tmpdir, site_dir=site_dir), base_url)
+
+
+class TestTelemetry:
+    """Test the report of how the site performed under a crawl."""
+    
+    def test_summary(self):
+        """Test the percentiles per subsite, and the slowest and largest pages."""
+        telemetry = Telemetry('https://example.com/docs', lambda url: url.endswith('/'))
+        for i in range(1, 11):
+            telemetry.record(f'https://example.com/docs/guide/{i}/', 'GET', 200,
+                             telemetry.started, 0.001, i * 100, 0)
+        telemetry.record('https://example.com/docs/', 'GET', 200, telemetry.started, 0.001, 5000, 1)
+        telemetry.record('https://example.com/docs/sitemap.xml', 'GET', 200,
+                         telemetry.started, 0.001, 9000, 0)
+        telemetry.record('https://example.com/docs/guide/x.png', 'HEAD', 'TimeoutError',
+                         telemetry.started, None, 0, 0)
+        # Make the times known
+        telemetry.requests = [request._replace(seconds=float(i))
+                              for i, request in enumerate(telemetry.requests, 1)]
+        telemetry.stop()
+        
+        summary = telemetry.summary(top=3)
+        assert summary['requests'] == 13
+        assert summary['retries'] == 1 and summary['errors'] == 1
+        assert summary['bytes'] == 5500 + 5000 + 9000
+        guide = summary['subsites']['guide']
+        assert guide['requests'] == 11
+        assert (guide['p50'], guide['p90'], guide['p99'], guide['max']) == (6.0, 10.0, 13.0, 13.0)
+        assert guide['ttfb_p50'] == 0.001
+        assert set(summary['subsites']) == {'guide', 'root'}
+        assert [page['url'] for page in summary['slowest']] == [
+            'https://example.com/docs/', 'https://example.com/docs/guide/10/',
+            'https://example.com/docs/guide/9/']
+        assert [page['size'] for page in summary['largest']] == [5000, 1000, 900]
+    
+    def test_export(self):
+        """Test exporting the requests made by a crawl as CSV and as JSON."""
+        site = Site()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                checker = crawl(site, tmpdir, cache=False)
+                requests = checker.telemetry.requests
+                
+                checker.telemetry.export(os.path.join(tmpdir, 'requests.csv'))
+                with open(os.path.join(tmpdir, 'requests.csv'), newline='') as f:
+                    rows = list(csv.DictReader(f))
+                assert len(rows) == len(requests) == len(site.requests)
+                assert {row['subsite'] for row in rows} == {
+                    'root', 'a', 'b', 'c', 'd', 'missing', 'nohead'}
+                
+                checker.telemetry.export(os.path.join(tmpdir, 'requests.json'))
+                with open(os.path.join(tmpdir, 'requests.json')) as f:
+                    data = json.load(f)
+                assert data['summary']['requests'] == len(requests)
+                # Bodies read: all those sent, but for that of the GET probing nohead/
+                assert sum(row['size'] for row in data['requests']) == sum(
+                    size for method, _, _, size in site.requests if method == 'GET'
+                ) - len(PAGES['/docs/nohead/'])
+        finally:
+            site.close()
+
+
+class TestSitemapParser:
+    """Test parsing sitemaps as they arrive."""
+    
+    def test_incremental(self):
+        """Test that a gzipped sitemap fed a byte at a time gives the URLs it lists."""
+        urls = [f'https://example.com/docs/page-{i}/' for i in range(200)]
+        data = gzip.compress(sitemap_xml(urls).encode('utf-8'))
+        sitemap = SitemapParser()
+        for i in range(len(data)):
+            sitemap.feed(data[i:i + 1])
+        sitemap.close()
+        assert sitemap.urls == urls
+        assert sitemap.sitemaps == []
+    
+    def test_index(self):
+        """Test that the sitemaps of a sitemap index are read, on disk as well as deployed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            site_dir = os.path.join(tmpdir, 'site')
+            write_site(site_dir)
+            base_url = 'https://example.com/docs'
+            with open(os.path.join(site_dir, 'sitemap.xml'), 'w', encoding='utf-8') as f:
+                f.write(sitemap_xml([f'{base_url}/part.xml', f'{base_url}/part.xml',
+                                     f'{base_url}/gone.xml'], index=True))
+            with open(os.path.join(site_dir, 'part.xml'), 'w', encoding='utf-8') as f:
+                f.write(sitemap_xml([f'{base_url}/a/', f'{base_url}/d/']))
+            checker = LinkChecker(
+                base_url,
+                output_file=os.path.join(tmpdir, 'broken_links.txt'),
+                site_dir=site_dir,
+                workers=0,
+                sitemap='sitemap.xml',
+            )
+            asyncio.run(checker.spider())
+            assert checker.sitemap_pages == {f'{base_url}/a/', f'{base_url}/d/'}
+            assert checker.sitemap_unlinked() == []
+            assert checker.sitemap_missing() == [f'{base_url}/b/', f'{base_url}/c/',
+                                                 f'{base_url}/nohead/']
+
+
+class TestSiteDir:
+    """Test checking a site built on disk, without requests."""
+    
+    def test_resolve(self):
+        """Test mapping URLs to files of a mike checkout, through a version alias."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_site(os.path.join(tmpdir, '20.0'))
+            with open(os.path.join(tmpdir, 'versions.json'), 'w') as f:
+                json.dump([{'version': '20.0', 'title': '20.0', 'aliases': ['latest']}], f)
+            
+            site = SiteDir(tmpdir, 'https://example.com/docs/latest')
+            a_page = os.path.join(tmpdir, '20.0', 'a', 'index.html')
+            assert site.resolve('https://example.com/docs/latest/a/') == a_page
+            assert site.resolve('https://example.com/docs/latest/a') == a_page
+            assert site.resolve('https://example.com/docs/20.0/a/index.html') == a_page
+            assert site.resolve('https://example.com/docs/latest') == os.path.join(
+                tmpdir, '20.0', 'index.html')
+            assert site.resolve('https://example.com/docs/latest/missing/') is None
+            assert site.resolve('https://example.com/other/a/') is None
+    
+    def test_crawl(self):
+        """Test that checking a built site finds what checking it deployed does."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_site(os.path.join(tmpdir, 'site'))
+            base_url = 'https://example.com/docs'
+            checker = LinkChecker(
+                base_url,
+                output_file=os.path.join(tmpdir, 'broken_links.txt'),
+                site_dir=os.path.join(tmpdir, 'site'),
+                workers=2,
+            )
+            asyncio.run(checker.spider())
+            assert dict(checker.broken_links) == {base_url + '/missing/': {base_url + '/a/'}}
+            assert checker.pages_processed == 5
+            assert checker.checked_links[base_url + '/nohead/'] == (True, 200)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tests for check_external_links module, against a local HTTP stand-in for other sites.
+"""
+
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from check_external_links import ExternalCache, ExternalLinkChecker, find_external_links
+from test_docgraph import make_repo, write
+
+
+class Hosts:
+    """
+    A local HTTP server standing in for other sites, reached as two hosts,
+    127.0.0.1 and localhost. Records each request it answers, with when it began
+    and ended, and how many requests to its host were being answered at the time.
+    """
+
+    def __init__(self, delay=0.0):
+        self.requests = []  # (host, method, path, status, start, end, concurrent)
+        self.unavailable = {}  # path -> how many more requests for it to answer with 503
+        self.active = defaultdict(int)  # host -> requests being answered
+        self.lock = threading.Lock()
+        hosts = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.respond()
+
+            def do_HEAD(self):
+                self.respond()
+
+            def respond(self):
+                host = self.headers.get('Host', '').rsplit(':', 1)[0]
+                start = time.monotonic()
+                with hosts.lock:
+                    hosts.active[host] += 1
+                    concurrent = hosts.active[host]
+                time.sleep(delay)
+                headers = {}
+                if hosts.unavailable.get(self.path):
+                    hosts.unavailable[self.path] -= 1
+                    status = 503
+                    headers['Retry-After'] = '0'
+                elif self.path.startswith('/ok'):
+                    status = 200
+                elif self.path.startswith('/nohead'):
+                    status = 403 if self.command == 'HEAD' else 200
+                else:
+                    status = 404
+                with hosts.lock:
+                    hosts.active[host] -= 1
+                    hosts.requests.append(
+                        (host, self.command, self.path, status, start, time.monotonic(), concurrent))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path, host='127.0.0.1'):
+        return f'http://{host}:{self.port}{path}'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def check(urls, **kwargs):
+    checker = ExternalLinkChecker(**dict({'delay': 0, 'timeout': 5}, **kwargs))
+    checker.RETRY_DELAY = 0.01
+    return checker, asyncio.run(checker.check_all(urls))
+
+
+class TestFindExternalLinks:
+    """Test finding the external links in the markdown sources."""
+
+    def test_find(self):
+        """Test that links, images and definitions to other sites are found, without titles or fragments."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            page = os.path.join(tmpdir, 'guide', 'docs', 'start.md')
+            write(page, """\
+                # Start
+
+                See [Dyalog](https://www.dyalog.com/ "Dyalog Ltd") and [local](other.md).
+
+                ![Logo](https://example.com/logo.png) and [the forum][forum].
+
+                ```
+                [not a link](https://example.com/in-code)
+                ```
+
+                [forum]: https://forums.dyalog.com/viewforum.php?f=30#top
+                """)
+            links = find_external_links(tmpdir)
+            assert links == {
+                'https://www.dyalog.com/': {(page, 3)},
+                'https://example.com/logo.png': {(page, 5)},
+                'https://forums.dyalog.com/viewforum.php?f=30': {(page, 11)},
+            }
+
+
+class TestExternalLinkChecker:
+    """Test checking external links politely."""
+
+    def test_check(self):
+        """Test the results for good, missing, HEAD-refusing, flaky and unreachable URLs."""
+        hosts = Hosts()
+        hosts.unavailable = {'/ok/flaky': 2, '/ok/down': 5}
+        try:
+            unreachable = f'http://127.0.0.1:{unused_port()}/ok'
+            checker, results = check(
+                [hosts.url('/ok'), hosts.url('/gone'), hosts.url('/nohead'),
+                 hosts.url('/ok/flaky'), hosts.url('/ok/down'), unreachable],
+                retries=2)
+            assert results[hosts.url('/ok')] == (True, 200)
+            assert results[hosts.url('/gone')] == (False, 404)
+            assert results[hosts.url('/nohead')] == (True, 200)
+            assert results[hosts.url('/ok/flaky')] == (True, 200)
+            assert results[hosts.url('/ok/down')] == (False, 503)
+            assert results[unreachable][0] is False
+            flaky = [request[3] for request in hosts.requests if request[2] == '/ok/flaky']
+            assert flaky == [503, 503, 200]
+            assert checker.requests == len(hosts.requests) + 3
+        finally:
+            hosts.close()
+
+    def test_per_host_limits(self):
+        """Test that each host gets at most per_host requests at a time, delay apart, while hosts go in parallel."""
+        hosts = Hosts(delay=0.05)
+        try:
+            urls = [hosts.url(f'/ok/{i}', host) for i in range(6) for host in ('127.0.0.1', 'localhost')]
+            _, results = check(urls, per_host=2, delay=0.05)
+            assert all(is_valid for is_valid, _ in results.values())
+
+            for host in ('127.0.0.1', 'localhost'):
+                requests = [request for request in hosts.requests if request[0] == host]
+                assert len(requests) == 6
+                assert max(request[6] for request in requests) <= 2
+                starts = sorted(request[4] for request in requests)
+                assert all(b - a >= 0.03 for a, b in zip(starts, starts[1:]))
+            # The two hosts aren't made to wait for each other: each gets its first
+            # request before either gets its second
+            starts = {host: sorted(request[4] for request in hosts.requests if request[0] == host)
+                      for host in ('127.0.0.1', 'localhost')}
+            assert max(starts[host][0] for host in starts) < min(starts[host][1] for host in starts)
+        finally:
+            hosts.close()
+
+    def test_cache(self):
+        """Test that results are reused from the cache until they expire."""
+        hosts = Hosts()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                cache_file = os.path.join(tmpdir, 'cache.json')
+                urls = [hosts.url('/ok'), hosts.url('/gone')]
+                _, first = check(urls, cache_file=cache_file, ttl=3600)
+                made = len(hosts.requests)
+
+                checker, second = check(urls, cache_file=cache_file, ttl=3600)
+                assert second == first
+                assert checker.from_cache == 2 and checker.requests == 0
+                assert len(hosts.requests) == made
+
+                # Expire one of them
+                cache = ExternalCache(cache_file, 3600)
+                cache.entries[hosts.url('/ok')]['checked'] -= 3600
+                cache.save()
+                checker, third = check(urls, cache_file=cache_file, ttl=3600)
+                assert third == first
+                assert checker.from_cache == 1
+                assert [request[2] for request in hosts.requests[made:]] == ['/ok']
+        finally:
+            hosts.close()
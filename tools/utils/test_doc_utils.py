@@ -6,10 +6,13 @@ Tests for doc_utils module.
 import os
 import pytest
 import tempfile
+import textwrap
+import time
 import shutil
+import doc_utils
 from doc_utils import (
-    YAMLLoader, NavTraverser, PathResolver, LinkExtractor,
-    HTMLLinkExtractor, LinkValidator, SummaryReporter
+    YAMLLoader, NavTraverser, PathResolver, PathIndex, SubsiteIndex, LinkExtractor,
+    LinkToken, HTMLLinkExtractor, LinkScope, AnchorIndex, LinkValidator, SummaryReporter
 )
 
 
@@ -62,6 +65,46 @@ nav:
             
             os.unlink(f.name)
 
+    
+    def test_load_include_tag(self):
+        """Test that an unquoted !include tag loads as the quoted form does."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'mkdocs.yml')
+            with open(path, 'w') as f:
+                f.write('nav:\n  - Guide: !include ./guide/mkdocs.yml\n')
+            
+            config = YAMLLoader().load_file(path)
+            assert config['nav'][0]['Guide'] == '!include ./guide/mkdocs.yml'
+    
+    def test_load_once(self):
+        """Test that a file is parsed once, and again when it changes."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'mkdocs.yml')
+            with open(path, 'w') as f:
+                f.write('site_name: One\n')
+            
+            config = YAMLLoader().load_file(path)
+            assert YAMLLoader().load_file(path) is config
+            
+            with open(path, 'w') as f:
+                f.write('site_name: Second\n')
+            assert YAMLLoader().load_file(path)['site_name'] == 'Second'
+    
+    def test_disk_cache(self, monkeypatch):
+        """Test that a later run takes unchanged files from the disk cache, unparsed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'mkdocs.yml')
+            with open(path, 'w') as f:
+                f.write('site_name: Cached\n')
+            cache_dir = os.path.join(tmpdir, 'cache')
+            YAMLLoader(cache_dir=cache_dir).load_file(path)
+            
+            # As in a new process
+            monkeypatch.setattr(YAMLLoader, '_loaded', {})
+            monkeypatch.setattr(doc_utils.yaml, 'load', None)
+            config = YAMLLoader(cache_dir=cache_dir).load_file(path)
+            assert config == {'site_name': 'Cached'}
+
 
 class TestNavTraverser:
     """Test navigation traversal functionality."""
@@ -171,10 +214,10 @@ class TestLinkExtractor:
     
     def test_extract_markdown_links(self):
         """Test extracting markdown links."""
-        content = """
+        content = textwrap.dedent("""
         This is a [test link](test.md) and another [external](https://example.com).
         Here's an [anchor link](#section) too.
-        """
+        """)
         
         links = LinkExtractor.extract_markdown_links(content)
         
@@ -185,11 +228,11 @@ class TestLinkExtractor:
     
     def test_extract_image_refs(self):
         """Test extracting image references."""
-        content = """
+        content = textwrap.dedent("""
         ![Alt text](image.png)
         ![](another.jpg)
         Regular [link](test.md) should not be included.
-        """
+        """)
         
         images = LinkExtractor.extract_image_refs(content)
         
@@ -208,7 +251,7 @@ class TestLinkExtractor:
     
     def test_extract_links_excludes_code_blocks(self):
         """Test that links in code blocks are excluded."""
-        content = """
+        content = textwrap.dedent("""
         Regular [link](test.md) here.
         
         ```
@@ -224,7 +267,7 @@ class TestLinkExtractor:
         ```
         
         And [final link](final.md).
-        """
+        """)
         
         links = LinkExtractor.extract_markdown_links(content)
         
@@ -236,6 +279,91 @@ class TestLinkExtractor:
         assert 'final.md' in link_urls
         assert 'code.md' not in link_urls
         assert '.5' not in link_urls
+    
+    def test_tokenize_skips_all_code(self):
+        """Test that links in ~~~ fences, indented code and inline code are excluded."""
+        content = textwrap.dedent("""
+        Inline `[code](code1.md)` and ``a ` [b](code2.md)`` but [text](text1.md).
+        
+        ~~~apl
+        [tilde fence](code3.md)
+        ~~~
+        
+            [indented](code4.md)
+        
+        - List item [text](text2.md)
+        
+            Continued [text](text3.md)
+        
+                [indented in list](code5.md)
+        
+        !!! note
+            In an admonition [text](text4.md)
+        """)
+        
+        urls = [url for _, url in LinkExtractor.extract_markdown_links(content)]
+        
+        assert urls == ['text1.md', 'text2.md', 'text3.md', 'text4.md']
+    
+    def test_tokenize_positions(self):
+        """Test that tokens are yielded in order, with their line and column."""
+        content = textwrap.dedent("""\
+        # Title
+        
+        A [link](page.md) and ![image](img/a.png),
+        then [another](other.md#anchor).
+        
+        [label]: https://example.com
+        """)
+        
+        assert list(LinkExtractor.tokenize(content)) == [
+            LinkToken('heading', 'Title', '', 1, 1),
+            LinkToken('link', 'link', 'page.md', 3, 3),
+            LinkToken('image', 'image', 'img/a.png', 3, 23),
+            LinkToken('link', 'another', 'other.md#anchor', 4, 6),
+            LinkToken('definition', 'label', 'https://example.com', 6, 1),
+        ]
+    
+    def test_extract_anchors(self):
+        """Test extracting heading slugs, attribute list ids and HTML ids, excluding code."""
+        content = textwrap.dedent("""\
+        # Rho & `⍴` *Reshape*
+        
+        ## Rho & Reshape
+        
+        ## Options { #opts .example }
+        
+        A paragraph.
+        {: #para }
+        
+        <a id="html-id"></a> and `<a id="not-an-id">`
+        
+        ```
+        # Not a heading
+        ```
+        """)
+        
+        assert LinkExtractor.extract_anchors(content) == {
+            'rho-reshape', 'rho-reshape_1', 'opts', 'para', 'html-id'
+        }
+    
+    def test_tokenize_scales_linearly(self):
+        """Test that tokenizing takes linear time in the number of code blocks and links."""
+        unit = "Some [link](page.md) and `code`.\n\n```apl\n[x](y) 1 2 3\n```\n\n"
+        
+        def best_time(content):
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                list(LinkExtractor.tokenize(content))
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+        
+        small = best_time(unit * 1000)
+        large = best_time(unit * 8000)
+        
+        # Linear: about 8 times as long. Quadratic would be 64 times.
+        assert large < small * 20
 
 
 class TestHTMLLinkExtractor:
@@ -260,6 +388,158 @@ class TestHTMLLinkExtractor:
         assert 'page1.html' in links
         assert 'https://example.com' in links
         assert '#section' in links
+    
+    @pytest.mark.parametrize('backend', HTMLLinkExtractor.BACKENDS)
+    def test_scoped_links(self, backend):
+        """Test collecting the links in parts of a page, with each parser backend."""
+        if backend == 'lxml':
+            pytest.importorskip('lxml')
+        html = """<!doctype html>
+        <HTML><body>
+        <a href="top.html">Top</a>
+        <div class="md-sidebar"><nav class="md-nav x"><A HREF="one/">1</A>
+            <div><p>Unclosed <a href="two/?a=1&amp;b=2">2</a></div></nav>
+            <a href="three/">3</a></div>
+        <div class="md-content"><main><a href>Empty</a></main>
+            <main><a href="second-main/">Not first</a></main></div>
+        <nav class="other"><a href="not-nav/">No</a></nav>
+        </body></HTML>"""
+        scopes = [
+            LinkScope(frozenset({'nav', 'div'}), frozenset({'md-nav', 'md-sidebar'})),
+            LinkScope(frozenset({'main'}), first=True),
+            LinkScope(frozenset({'article'}), first=True),
+            LinkScope(),
+        ]
+        assert HTMLLinkExtractor.extract_scoped_links(html, scopes, backend) == [
+            ['one/', 'two/?a=1&b=2', 'three/'],
+            [''],
+            None,
+            ['top.html', 'one/', 'two/?a=1&b=2', 'three/', '', 'second-main/', 'not-nav/'],
+        ]
+    
+    @pytest.mark.parametrize('backend', HTMLLinkExtractor.BACKENDS)
+    def test_ids(self, backend):
+        """Test collecting the ids fragments can link to along with the links, with each parser backend."""
+        if backend == 'lxml':
+            pytest.importorskip('lxml')
+        html = """<html><body><header ID="top-bar"></header>
+        <article><h2 id="first-steps">First <a class="headerlink" href="#first-steps">¶</a></h2>
+        <a name="legacy"></a><a name="not-an-anchor" href="elsewhere/">Elsewhere</a>
+        <h3 id="%e2%8e%95wa">⎕WA</h3><h3 id="⎕DL">⎕DL</h3></article></body></html>"""
+        links, ids = HTMLLinkExtractor.extract_scoped_links_and_ids(
+            html, [LinkScope(frozenset({'article'}), first=True)], backend)
+        assert links == [['#first-steps', 'elsewhere/']]
+        assert ids == {'top-bar', 'first-steps', 'legacy', '%e2%8e%95wa', '⎕DL'}
+
+
+class TestPathIndex:
+    """Test the in-memory file and directory index."""
+    
+    def test_exists(self):
+        """Test that lookups agree with os.path.exists."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'docs', 'guide'))
+            with open(os.path.join(tmpdir, 'docs', 'guide', 'test.md'), 'w') as f:
+                f.write('# Test')
+            
+            index = PathIndex(tmpdir)
+            for path in [
+                tmpdir,
+                os.path.join(tmpdir, 'docs'),
+                os.path.join(tmpdir, 'docs', 'guide') + os.sep,
+                os.path.join(tmpdir, 'docs', 'guide', 'test.md'),
+                os.path.join(tmpdir, 'docs', 'guide', 'test.md') + os.sep,
+                os.path.join(tmpdir, 'docs', 'guide', '..', 'guide', 'test.md'),
+                os.path.join(tmpdir, 'docs', 'missing.md'),
+                os.path.dirname(tmpdir),
+            ]:
+                assert index.exists(path) == os.path.exists(path), path
+    
+    def test_snapshot(self):
+        """Test that the index reflects the tree when it was built."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index = PathIndex(tmpdir)
+            new_file = os.path.join(tmpdir, 'new.md')
+            with open(new_file, 'w') as f:
+                f.write('# New')
+            
+            assert not index.exists(new_file)
+            assert PathIndex(tmpdir).exists(new_file)
+    
+    def test_validator_with_index(self):
+        """Test that link validation gives the same results with an index."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'language-reference-guide', 'docs', 'primitive-operators'))
+            os.makedirs(os.path.join(tmpdir, 'language-reference-guide', 'docs', 'the-i-beam-operator'))
+            with open(os.path.join(tmpdir, 'language-reference-guide', 'docs', 'the-i-beam-operator', 'i-beam.md'), 'w') as f:
+                f.write('# I-Beam')
+            source_file = os.path.join(tmpdir, 'language-reference-guide', 'docs', 'primitive-operators', 'i-beam-short.md')
+            with open(source_file, 'w') as f:
+                f.write('# I-Beam Short')
+            site_mappings = {'language-reference-guide': 'language-reference-guide'}
+            
+            index = PathIndex(tmpdir)
+            for link in ['../../the-i-beam-operator/i-beam', '../the-i-beam-operator/i-beam.md',
+                         '../the-i-beam-operator/', '../missing', 'i-beam-short.md']:
+                assert LinkValidator.is_valid_relative_path(
+                    source_file, link, tmpdir, site_mappings, index
+                ) == LinkValidator.is_valid_relative_path(
+                    source_file, link, tmpdir, site_mappings
+                ), link
+
+
+class TestSubsiteIndex:
+    """Test the lookup of the subsite a path is in."""
+    
+    def test_lookup(self):
+        """Test that the innermost subsite containing a path is found."""
+        root = os.path.abspath(os.path.join('docs-root'))
+        index = SubsiteIndex(root, {
+            'language-reference-guide': 'language-reference-guide',
+            'guide': os.path.join('release-notes', 'guide'),
+            'release-notes': 'release-notes',
+        })
+        for path, expected in [
+            (os.path.join(root, 'language-reference-guide', 'docs', 'rho.md'), 'language-reference-guide'),
+            (os.path.join(root, 'release-notes', 'docs', 'index.md'), 'release-notes'),
+            (os.path.join(root, 'release-notes', 'guide', 'docs', 'index.md'), 'guide'),
+            (os.path.join('docs-root', 'release-notes', 'mkdocs.yml'), 'release-notes'),
+            (os.path.join(root, 'language-reference-guide'), None),
+            (os.path.join(root, 'language-reference-guide-extra', 'docs', 'x.md'), None),
+            (os.path.join(root, 'docs', 'index.md'), None),
+            (os.path.join(os.path.dirname(root), 'language-reference-guide', 'x.md'), None),
+        ]:
+            assert index.lookup(path) == expected, path
+
+
+class TestAnchorIndex:
+    """Test the index of page anchors."""
+    
+    def test_fragment_links(self):
+        """Test resolving links to pages and checking their fragments."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'docs', 'guide'))
+            source = os.path.join(tmpdir, 'docs', 'source.md')
+            target = os.path.join(tmpdir, 'docs', 'guide', 'index.md')
+            with open(target, 'w') as f:
+                f.write('# Guide\n\n## Getting Started\n')
+            
+            index = AnchorIndex()
+            index.add(source, {'local'})
+            
+            for link, expected in [
+                ('#local', True),
+                ('#missing', False),
+                ('#top', True),
+                ('guide/#getting-started', True),
+                ('guide/index.md#guide', True),
+                ('guide/#Getting-Started', False),
+            ]:
+                path, anchor = link.split('#')
+                resolved = LinkValidator.resolve_relative_path(source, path, tmpdir)
+                if os.path.isdir(resolved):
+                    resolved = os.path.join(resolved, 'index.md')
+                assert index.has_anchor(resolved, anchor) == expected, link
 
 
 class TestLinkValidator:
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for doccheck module.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+from doccheck import CHECKS, Check, register_check, run_checks
+from docgraph import DocGraph
+from test_docgraph import make_repo, write
+
+
+def findings(report, name):
+    return [(finding['path'], finding['message']) for finding in report['checks'][name]['findings']]
+
+
+class TestDocCheck:
+    """Test the one-pass health check."""
+    
+    def test_checks(self):
+        """Test the findings of each check for a small repo."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            write(os.path.join(tmpdir, 'guide', 'print_mkdocs.yml'), """\
+                nav:
+                  - Start: start.md
+                  - Appendix: appendix.md
+                """)
+            write(os.path.join(tmpdir, 'guide', 'docs', 'excluded.md'), """\
+                ---
+                search:
+                  exclude: true
+                ---
+                <div style="display: none;">
+                ⍴
+                </div>
+                """)
+            
+            report = run_checks(tmpdir, jobs=1)
+            assert list(report['checks']) == ['nav', 'links', 'ghosts', 'search-exclusions']
+            assert report['files_read'] == 4
+            
+            start = os.path.join('guide', 'docs', 'start.md')
+            assert findings(report, 'nav') == [(
+                os.path.join('guide', 'print_mkdocs.yml'),
+                f"Missing: appendix.md (expected at {os.path.join('guide', 'docs', 'appendix.md')})",
+            )]
+            assert findings(report, 'links') == [
+                (os.path.join('docs', 'index.md'), f'Anchor not found: #nowhere in {start}'),
+                (start, 'Target not found: missing.md'),
+            ]
+            assert findings(report, 'ghosts') == [
+                (os.path.join('guide', 'docs', 'excluded.md'), 'Not in any nav'),
+                (os.path.join('guide', 'docs', 'ghost.md'), 'Not in any nav'),
+            ]
+            assert findings(report, 'search-exclusions') == [(
+                os.path.join('guide', 'docs', 'excluded.md'),
+                "Excluded from search, but has a hidden synonym div at line 5 for '⍴'",
+            )]
+    
+    def test_jobs(self):
+        """Test that the findings are the same whatever the number of jobs, for chosen checks."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            serial = run_checks(tmpdir, ['links', 'ghosts'], jobs=1)
+            parallel = run_checks(tmpdir, ['links', 'ghosts'], jobs=2)
+            assert list(parallel['checks']) == ['links', 'ghosts']
+            for name in ('links', 'ghosts'):
+                assert findings(parallel, name) == findings(serial, name)
+    
+    def test_docs_dir(self):
+        """Test that a subsite's docs_dir is honoured, as find_ghost_pages.py does."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            write(os.path.join(tmpdir, 'guide', 'mkdocs.yml'), """\
+                docs_dir: src
+                nav:
+                  - Start: start.md
+                """)
+            os.rename(os.path.join(tmpdir, 'guide', 'docs'), os.path.join(tmpdir, 'guide', 'src'))
+            
+            report = run_checks(tmpdir, ['nav', 'ghosts'], jobs=1)
+            assert findings(report, 'nav') == []
+            assert findings(report, 'ghosts') == [
+                (os.path.join('guide', 'src', 'ghost.md'), 'Not in any nav'),
+            ]
+            with DocGraph(tmpdir) as graph:
+                graph.update()
+                assert graph.ghost_pages() == [path for path, _ in findings(report, 'ghosts')]
+    
+    def test_incomplete_check(self):
+        """Test that a check without report() can be neither registered nor made."""
+        class Incomplete(Check):
+            name = 'incomplete'
+            
+            def pages(self, tree):
+                return ['index.md']
+        
+        with pytest.raises(TypeError, match='does not implement report'):
+            register_check(Incomplete)
+        assert 'incomplete' not in CHECKS
+        with pytest.raises(TypeError):
+            Incomplete()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for docgraph module.
+"""
+
+import os
+import tempfile
+import textwrap
+from docgraph import DocGraph
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(textwrap.dedent(content))
+
+
+def make_repo(root):
+    """A main site and one subsite, with a page in neither nav."""
+    write(os.path.join(root, 'mkdocs.yml'), """\
+        nav:
+          - Home: index.md
+          - Guide: "!include ./guide/mkdocs.yml"
+        """)
+    write(os.path.join(root, 'docs', 'index.md'), """\
+        # Home
+        
+        See [the guide](../guide/docs/start.md#first-steps) and [more](../guide/docs/start.md#nowhere).
+        """)
+    write(os.path.join(root, 'guide', 'mkdocs.yml'), """\
+        nav:
+          - Start: start.md
+        """)
+    write(os.path.join(root, 'guide', 'docs', 'start.md'), """\
+        # Start
+        
+        ## First Steps
+        
+        ![Diagram](img/diagram.png) and [a missing page](missing.md).
+        """)
+    write(os.path.join(root, 'guide', 'docs', 'ghost.md'), """\
+        # Ghost
+        
+        Back to [start](start.md).
+        """)
+
+
+class TestDocGraph:
+    """Test the link graph store."""
+    
+    def test_queries(self):
+        """Test the store's answers for a small repo."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            with DocGraph(tmpdir) as graph:
+                assert graph.update() == {'added': 3, 'changed': 0, 'removed': 0, 'unchanged': 0}
+                
+                start = os.path.join('guide', 'docs', 'start.md')
+                assert graph.nav_pages() == [os.path.join('docs', 'index.md'), start]
+                assert graph.ghost_pages() == [os.path.join('guide', 'docs', 'ghost.md')]
+                assert [link[0] for link in graph.inbound_links(start)] == [
+                    os.path.join('docs', 'index.md'),
+                    os.path.join('docs', 'index.md'),
+                    os.path.join('guide', 'docs', 'ghost.md'),
+                ]
+                assert graph.orphan_pages() == [os.path.join('docs', 'index.md')]
+                assert [(link[4], link[5]) for link in graph.dangling_links()] == [
+                    ('../guide/docs/start.md#nowhere', 'missing-anchor'),
+                    ('missing.md', 'missing'),
+                ]
+                assert graph.conn.execute('SELECT status FROM images').fetchall() == [('missing',)]
+    
+    def test_incremental_update(self):
+        """Test that updates only re-read what has changed, and re-resolve links."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            with DocGraph(tmpdir) as graph:
+                graph.update()
+                assert graph.update() == {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 3}
+                
+                # A new page resolves a link that was missing
+                write(os.path.join(tmpdir, 'guide', 'docs', 'missing.md'), "# Found\n")
+                os.remove(os.path.join(tmpdir, 'guide', 'docs', 'ghost.md'))
+                assert graph.update() == {'added': 1, 'changed': 0, 'removed': 1, 'unchanged': 2}
+                assert [link[4] for link in graph.dangling_links()] == [
+                    '../guide/docs/start.md#nowhere'
+                ]
+                
+                # A changed page changes the anchors that links to it find
+                write(os.path.join(tmpdir, 'guide', 'docs', 'start.md'),
+                      "# Start\n\n## First Steps\n\n## Nowhere\n")
+                assert graph.update() == {'added': 0, 'changed': 1, 'removed': 0, 'unchanged': 2}
+                assert graph.dangling_links() == []
+    
+    def test_docs_dir(self):
+        """Test that a subsite's docs_dir is honoured, and that only existing nav pages are read."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_repo(tmpdir)
+            write(os.path.join(tmpdir, 'guide', 'mkdocs.yml'), """\
+                docs_dir: src
+                nav:
+                  - Start: start.md
+                  - Gone: gone.md
+                """)
+            os.rename(os.path.join(tmpdir, 'guide', 'docs'), os.path.join(tmpdir, 'guide', 'src'))
+            with DocGraph(tmpdir) as graph:
+                assert graph.update() == {'added': 3, 'changed': 0, 'removed': 0, 'unchanged': 0}
+                
+                start = os.path.join('guide', 'src', 'start.md')
+                # A missing page falls back to the site directory
+                assert graph.nav_pages() == [
+                    os.path.join('docs', 'index.md'), os.path.join('guide', 'gone.md'), start
+                ]
+                assert graph.read_nav_pages() == [os.path.join('docs', 'index.md'), start]
+                assert graph.ghost_pages() == [os.path.join('guide', 'src', 'ghost.md')]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for order_nav module.
+"""
+
+import os
+import tempfile
+from order_nav import H1Index, SECTIONS, order_nav
+from test_docgraph import write
+
+
+def h1(name, command):
+    return f'<h1 class="heading"><span class="name">{name}</span> <span class="command">{command}</span></h1>\n'
+
+
+def make_guide(root):
+    """A guide with out-of-order sections of each kind, and a page named in two places."""
+    config = os.path.join(root, 'mkdocs.yml')
+    write(config, """\
+        site_name: Language Reference Guide
+        nav:
+          - The I-Beam Operator:
+              - Introduction: the-i-beam-operator/i-beam.md
+              - '120: Generate UUID': the-i-beam-operator/generate-uuid.md
+              - Inverted Table Index Of: the-i-beam-operator/inverted-table-index-of.md
+              - Other I-Beams: the-i-beam-operator/supplementary-i-beam-functions.md
+          - System Functions:
+              - By Category:
+                  - Index Origin: system-functions/io.md  # Kept
+              - System Functions (A-Z):
+                  - Introduction: system-functions/introduction.md
+                  - '<code>⎕IO</code>: Index Origin': system-functions/io.md
+                  - Account Information: system-functions/ai.md
+                  - Unknown: system-functions/unknown.md
+          - System Commands:
+              - System Commands (A-Z):
+                  - 'COPY: Copy Workspace': system-commands/copy.md
+                  - Clear Workspace: system-commands/clear.md
+        """)
+    docs = os.path.join(root, 'docs')
+    write(os.path.join(docs, 'the-i-beam-operator', 'generate-uuid.md'), h1('Generate UUID', 'R←120⌶Y'))
+    write(os.path.join(docs, 'the-i-beam-operator', 'inverted-table-index-of.md'),
+          h1('Inverted Table Index Of', 'R←X(8⌶)Y'))
+    write(os.path.join(docs, 'system-functions', 'io.md'), h1('Index Origin', '⎕IO'))
+    write(os.path.join(docs, 'system-functions', 'ai.md'), h1('Account Information', 'R←⎕AI'))
+    write(os.path.join(docs, 'system-functions', 'unknown.md'), '# No command here\n')
+    write(os.path.join(docs, 'system-commands', 'copy.md'), h1('Copy Workspace', ')COPY {ws {nms}}'))
+    write(os.path.join(docs, 'system-commands', 'clear.md'), h1('Clear Workspace', ')CLEAR'))
+    return config
+
+
+class TestOrderNav:
+    """Test ordering the nav sections by the commands in the pages."""
+
+    def test_order(self):
+        """Test that every section is ordered and titled in one pass, and that a second pass changes nothing."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = make_guide(tmpdir)
+            original, updated, missing = order_nav(config)
+            assert missing == []
+            assert updated == original.replace("""\
+      - '120: Generate UUID': the-i-beam-operator/generate-uuid.md
+      - Inverted Table Index Of: the-i-beam-operator/inverted-table-index-of.md
+""", """\
+      - '8: Inverted Table Index Of': the-i-beam-operator/inverted-table-index-of.md
+      - '120: Generate UUID': the-i-beam-operator/generate-uuid.md
+""").replace("""\
+          - Index Origin: system-functions/io.md  # Kept
+""", """\
+          - '<code>⎕IO</code>: Index Origin': system-functions/io.md # Kept
+""").replace("""\
+          - '<code>⎕IO</code>: Index Origin': system-functions/io.md
+          - Account Information: system-functions/ai.md
+""", """\
+          - '<code>⎕AI</code>: Account Information': system-functions/ai.md
+          - '<code>⎕IO</code>: Index Origin': system-functions/io.md
+""").replace("""\
+          - 'COPY: Copy Workspace': system-commands/copy.md
+          - Clear Workspace: system-commands/clear.md
+""", """\
+          - 'CLEAR: Clear Workspace': system-commands/clear.md
+          - 'COPY: Copy Workspace': system-commands/copy.md
+""")
+
+            with open(config, 'w', encoding='utf-8') as f:
+                f.write(updated)
+            original, again, _ = order_nav(config)
+            assert again == original == updated
+
+    def test_sections(self):
+        """Test that only the sections asked for are ordered, and missing ones are reported."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = make_guide(tmpdir)
+            write(os.path.join(tmpdir, 'docs', 'system-functions', 'unknown.md'), h1('Unknown', '⎕U'))
+            commands = [section for section in SECTIONS if section.title == 'System Commands (A-Z)']
+            original, updated, missing = order_nav(config, commands)
+            assert missing == []
+            assert "- Inverted Table Index Of: the-i-beam-operator" in updated
+            assert "- Account Information: system-functions/ai.md" in updated
+            assert "'CLEAR: Clear Workspace'" in updated
+
+            others = [section._replace(title='Nowhere') for section in commands]
+            _, updated, missing = order_nav(config, others)
+            assert missing == ['Nowhere']
+            assert updated == original
+
+    def test_index(self):
+        """Test that the index only reads pages that have changed since it was saved."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = make_guide(tmpdir)
+            cache_file = os.path.join(tmpdir, 'cache.json')
+            index = H1Index(cache_file)
+            order_nav(config, index=index, jobs=2)
+            index.save()
+            assert index.reads == 7
+
+            index = H1Index(cache_file)
+            order_nav(config, index=index)
+            assert index.reads == 0
+
+            write(os.path.join(tmpdir, 'docs', 'system-commands', 'clear.md'), h1('Clear Workspace', ')ZAP'))
+            index = H1Index(cache_file)
+            _, updated, _ = order_nav(config, index=index)
+            assert index.reads == 1
+            assert updated.index("'COPY: Copy Workspace'") < updated.index("'ZAP: Clear Workspace'")